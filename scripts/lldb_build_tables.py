@@ -0,0 +1,486 @@
+#!/usr/bin/env python
+
+"""Generate C++ register tables for several architectures at once.
+
+The Python successor of build_tables.pl.  For each architecture it reads
+gdb's register dump,
+
+  (gdb) maint print raw-registers
+
+and lldb's DWARF register number header for the architecture, and writes
+RegisterTables_<arch>.h with every register's gdb and DWARF numbers,
+offset, size, encoding, format and register set, the slices and
+composites of aliased (cooked) registers, and the g packet size.
+
+The per-architecture rules (register aliases, formats, register sets and
+how the DWARF header names its enumerators) are in ARCHES rather than in
+the parsing code.
+
+Parsed inputs are memoized by content hash in ~/.cache/lldb-build-tables,
+and an architecture's header is only regenerated when its inputs (or the
+rules, or this script) changed; the hashes are kept in
+.lldb_build_tables.json in the output dir.
+
+Usage:
+  lldb_build_tables.py -o OUTPUT_DIR \\
+      --arch armhf armhf-raw-registers.txt ARM_DWARF_Registers.h \\
+      --arch arm64 arm64-raw-registers.txt ARM64_DWARF_Registers.h \\
+      --arch x86_64 x86_64-raw-registers.txt RegisterContext_x86.h
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+
+# Bump when parsing or the generated code changes, to invalidate caches.
+_VERSION = "2"
+
+_CACHE_DIR = os.path.join("~", ".cache", "lldb-build-tables")
+_STAMP_FILE = ".lldb_build_tables.json"
+
+# Per architecture:
+#   dwarf_entry: pattern of the DWARF header's enumerators; group 1 is
+#     the register name.
+#   aliases: prefix of cooked registers -> (prefix of the registers they
+#     alias, layout).  "packed" registers pack into the bigger ones (arm
+#     s3 is d1[63:32]), "overlay" ones are the low bits of the register
+#     with the same number (arm64 s3 is v3[31:0]).
+#   named_aliases: cooked register name -> alias, for the ones whose
+#     names don't follow a prefix rule (x86 eax is rax[31:0]).
+#   skip: pattern of cooked registers to leave out of the table.
+#   formats: (pattern, format, encoding), the first match wins; the
+#     default is hex/uint.
+#   sets: (pattern, register set), the first match wins; the default is 0.
+
+
+def _X86_64NamedAliases():
+  """Return gdb's amd64 pseudo registers, as slices and composites."""
+  aliases = {}
+  for letter in "abcd":
+    full = "r%sx" % letter
+    aliases.update({letter + "l": full + "[7:0]", letter + "h": full + "[15:8]",
+                    letter + "x": full + "[15:0]",
+                    "e%sx" % letter: full + "[31:0]"})
+  for name in ("si", "di", "bp", "sp"):
+    # gdb has no word register for sp
+    aliases.update({name + "l": "r%s[7:0]" % name,
+                    name: "r%s[15:0]" % name, "e" + name: "r%s[31:0]" % name})
+  for number in range(8, 16):
+    full = "r%d" % number
+    aliases.update({full + "l": full + "[7:0]", full + "w": full + "[15:0]",
+                    full + "d": full + "[31:0]"})
+  aliases["eip"] = "rip[31:0]"
+  for number in range(16):
+    # most significant first: the upper half is gdb's raw ymm<N>h
+    aliases["ymm%d" % number] = "ymm%dh,xmm%d" % (number, number)
+  return aliases
+
+
+ARCHES = {
+    "armhf": {
+        "dwarf_entry": r"dwarf_(\w+)",
+        "aliases": {"q": ("d", "packed"), "s": ("d", "packed")},
+        "named_aliases": {},
+        "skip": None,
+        "formats": [(r"^q\d", "eFormatVectorOfUInt8", "eEncodingVector"),
+                    (r"^d\d", "eFormatFloat", "eEncodingIEEE754"),
+                    (r"^s[^p]", "eFormatFloat", "eEncodingIEEE754")],
+        "sets": [(r"^[sq]\d", 1)],
+    },
+    "arm64": {
+        # arm64_dwarf::x0, v0, sp, ...: bare lower case names
+        "dwarf_entry": r"(?!(?:enum|namespace)\b)([a-z][a-z0-9_]*)",
+        "aliases": {"q": ("v", "overlay"), "d": ("v", "overlay"),
+                    "s": ("v", "overlay"), "h": ("v", "overlay"),
+                    "b": ("v", "overlay")},
+        "named_aliases": {},
+        "skip": None,
+        "formats": [(r"^[vq]\d", "eFormatVectorOfUInt8", "eEncodingVector"),
+                    (r"^[dsh]\d", "eFormatFloat", "eEncodingIEEE754")],
+        "sets": [(r"^([vqdshb]\d|fpsr$|fpcr$)", 1)],
+    },
+    "x86_64": {
+        # dwarf_rax_x86_64, gcc_dwarf_rax_x86_64 in older lldb
+        "dwarf_entry": r"(?:gcc_)?dwarf_(\w+)_x86_64",
+        "aliases": {},
+        "named_aliases": _X86_64NamedAliases(),
+        # AVX-512 and MPX pseudo registers, which lldb doesn't have
+        "skip": r"^(zmm\d+|bnd\d+)$",
+        "formats": [(r"^[xy]mm\d", "eFormatVectorOfUInt8", "eEncodingVector"),
+                    (r"^st\d", "eFormatFloat", "eEncodingIEEE754")],
+        "sets": [(r"^(st\d|[xy]mm\d|f[a-z]+$|mxcsr$)", 1)],
+    },
+}
+
+# e.g. "  r0    0    0      0     4  00000000"
+#      "  s3   91   91    468     4  <cooked>"
+_RAW_LINE_RE = re.compile(
+    r"^\s*(\S+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s+(\S+)(?:\s+(\S+))?")
+_INDEXED_NAME_RE = re.compile(r"^([a-z]+)(\d+)$")
+
+
+def _Digest(*parts):
+  digest = hashlib.sha1()
+  for part in parts:
+    digest.update(part if isinstance(part, bytes) else part.encode("utf-8"))
+    digest.update(b"\0")
+  return digest.hexdigest()
+
+
+def _Memoized(kind, content, parse, cache_dir):
+  """Return parse(content), from the cache if it was parsed before."""
+  path = None
+  if cache_dir:
+    path = os.path.join(cache_dir, "%s-%s.json"
+                        % (kind, _Digest(_VERSION, kind, content)))
+    try:
+      with open(path) as f:
+        return json.load(f)
+    except (IOError, ValueError):
+      pass
+  result = parse(content)
+  if path:
+    if not os.path.isdir(cache_dir):
+      os.makedirs(cache_dir)
+    with open(path + ".tmp", "w") as f:
+      json.dump(result, f)
+    os.rename(path + ".tmp", path)
+  return result
+
+
+def ParseRawRegisters(text):
+  """Parse maint print raw-registers output.
+
+  Returns:
+    A list of [name, gdb regnum, byte offset, byte size, cooked] lists in
+    dump order.
+
+  Raises:
+    ValueError: for lines that aren't registers.
+
+  """
+  registers = []
+  for line in text.splitlines():
+    stripped = line.strip()
+    if (not stripped or stripped.startswith("#") or
+        stripped.startswith("Name") or stripped.startswith("''")):
+      continue
+    match = _RAW_LINE_RE.match(line)
+    if not match:
+      raise ValueError("not a register line: " + line)
+    name, regnum, _, offset, size, _, value = match.groups()
+    registers.append([name, int(regnum), int(offset), int(size),
+                      value == "<cooked>"])
+  return registers
+
+
+def ParseDwarfHeader(text, entry_pattern):
+  """Parse the enumerators of a DWARF register number header.
+
+  Enumerators without a value get the previous one's plus one, as in C.
+
+  Returns:
+    A list of [name, DWARF regnum] lists in header order.
+
+  """
+  entry_re = re.compile(r"^\s*%s\s*(?:=\s*(\w+))?\s*(?:,|$|//)"
+                        % entry_pattern)
+  name_re = re.compile(entry_pattern + "$")
+  entries = []
+  counter = 0
+  for line in text.splitlines():
+    match = entry_re.match(line)
+    if not match:
+      continue
+    if match.group(2):
+      try:
+        counter = int(match.group(2), 0)
+      except ValueError:
+        # set to another enumerator, e.g. "dwarf_sp = dwarf_r13"
+        other = name_re.match(match.group(2))
+        previous = dict(entries).get(other.group(1)) if other else None
+        if previous is None:
+          continue
+        counter = previous
+    entries.append([match.group(1), counter])
+    counter += 1
+  return entries
+
+
+def _FirstMatch(rules, name, default):
+  for rule in rules:
+    if re.search(rule[0], name):
+      return rule[1:] if len(rule) > 2 else rule[1]
+  return default
+
+
+def BuildTable(arch, registers, dwarf_entries):
+  """Combine the parsed inputs of one architecture into table rows.
+
+  Returns:
+    (rows, g packet size).  Each row is a dict with name,
+    gdb_regnum, dwarf_regnum (-1 if none), byte_offset (-1 for aliases),
+    bit_size, encoding, format, set and alias ("" or e.g. "d1[63:32]" or
+    "d2,d3").
+
+  Raises:
+    ValueError: if the registers don't fit the architecture's rules.
+
+  """
+  rules = ARCHES[arch]
+  sizes = {}
+  for name, _, _, size, _ in registers:
+    match = _INDEXED_NAME_RE.match(name)
+    if match:
+      prefix = match.group(1)
+      if sizes.setdefault(prefix, size) != size:
+        raise ValueError("%s: registers with prefix %s have sizes %d and %d"
+                         % (arch, prefix, sizes[prefix], size))
+
+  known = set(r[0] for r in registers)
+  dwarf_regnums = dict((name, regnum) for name, regnum in dwarf_entries
+                       if name in known)
+
+  rows = []
+  packet_size = 0
+  for name, regnum, offset, size, cooked in sorted(registers,
+                                                   key=lambda r: r[2]):
+    match = _INDEXED_NAME_RE.match(name)
+    prefix, index = (match.group(1), int(match.group(2))) if match \
+        else (None, None)
+    alias = ""
+    if cooked and name in rules["named_aliases"]:
+      alias = rules["named_aliases"][name]
+      for aliasee in alias.split(","):
+        if aliasee.split("[", 1)[0] not in known:
+          raise ValueError("%s: no register %s for %s to alias"
+                           % (arch, aliasee, name))
+    elif cooked and rules["skip"] and re.search(rules["skip"], name):
+      continue
+    elif cooked:
+      if prefix not in rules["aliases"]:
+        raise ValueError("%s: cooked register %s has no alias rule"
+                         % (arch, name))
+      aliasee, layout = rules["aliases"][prefix]
+      if aliasee not in sizes:
+        raise ValueError("%s: no %s registers for %s to alias"
+                         % (arch, aliasee, name))
+      aliasee_size = sizes[aliasee]
+      if layout == "overlay":
+        alias = "%s%d[%d:0]" % (aliasee, index, size * 8 - 1)
+      elif size < aliasee_size:
+        factor = aliasee_size // size
+        if factor * size != aliasee_size:
+          raise ValueError("%s: %s isn't a multiple of %s"
+                           % (arch, prefix, aliasee))
+        low_bit = (index % factor) * size * 8
+        alias = "%s%d[%d:%d]" % (aliasee, index // factor,
+                                 low_bit + size * 8 - 1, low_bit)
+      elif size > aliasee_size:
+        factor = size // aliasee_size
+        if factor * aliasee_size != size:
+          raise ValueError("%s: %s isn't a multiple of %s"
+                           % (arch, prefix, aliasee))
+        # most significant first
+        alias = ",".join("%s%d" % (aliasee, index * factor + i)
+                         for i in reversed(range(factor)))
+      else:
+        # build_tables.pl refuses equal sizes; it's the whole register
+        alias = "%s%d[%d:0]" % (aliasee, index, size * 8 - 1)
+    else:
+      packet_size = max(packet_size, offset + size)
+    format_name, encoding = _FirstMatch(rules["formats"], name,
+                                        ("eFormatHex", "eEncodingUint"))
+    rows.append({"name": name, "gdb_regnum": regnum,
+                 "dwarf_regnum": dwarf_regnums.get(name, -1),
+                 "byte_offset": -1 if cooked else offset,
+                 "bit_size": size * 8, "encoding": encoding,
+                 "format": format_name,
+                 "set": _FirstMatch(rules["sets"], name, 0),
+                 "alias": alias})
+  return rows, packet_size
+
+
+_COMMON_HEADER = """\
+// Generated by lldb_build_tables.py; do not edit.
+
+#ifndef LLDB_BUILD_TABLES_REGISTER_TABLES_H
+#define LLDB_BUILD_TABLES_REGISTER_TABLES_H
+
+#include "lldb/lldb-enumerations.h"
+
+namespace lldb_build_tables {
+
+struct RegisterTableEntry {
+  const char *name;
+  int gdb_regnum;
+  int dwarf_regnum;   // -1: no DWARF number
+  int byte_offset;    // -1: aliases other registers
+  int bit_size;
+  lldb::Encoding encoding;
+  lldb::Format format;
+  int set;
+  const char *alias;  // "d1[63:32]" slice or "d2,d3" composite, or ""
+};
+
+} // namespace lldb_build_tables
+
+#endif // LLDB_BUILD_TABLES_REGISTER_TABLES_H
+"""
+
+
+def FormatTable(arch, rows, packet_size, inputs):
+  """Return the C++ header for one architecture's table."""
+  ident = re.sub(r"\W", "_", arch)
+  guard = "LLDB_BUILD_TABLES_REGISTER_TABLES_%s_H" % ident.upper()
+  lines = ["// Generated by lldb_build_tables.py from %s; do not edit."
+           % ", ".join(os.path.basename(i) for i in inputs),
+           "",
+           "#ifndef " + guard,
+           "#define " + guard,
+           "",
+           '#include "RegisterTables.h"',
+           "",
+           "namespace lldb_build_tables {",
+           "namespace %s {" % ident,
+           "",
+           "static const RegisterTableEntry g_register_table[] = {"]
+  for row in rows:
+    lines.append('    {%-10s %4d, %4d, %5d, %4d, lldb::%s, lldb::%s, %d, "%s"},'
+                 % ('"%s",' % row["name"], row["gdb_regnum"],
+                    row["dwarf_regnum"], row["byte_offset"], row["bit_size"],
+                    row["encoding"], row["format"], row["set"], row["alias"]))
+  lines += ["};",
+            "",
+            "static const unsigned g_register_count = %d;" % len(rows),
+            "static const unsigned g_packet_size = %d;" % packet_size,
+            "",
+            "} // namespace %s" % ident,
+            "} // namespace lldb_build_tables",
+            "",
+            "#endif // " + guard,
+            ""]
+  return "\n".join(lines)
+
+
+def _WriteIfChanged(path, text):
+  try:
+    with open(path) as f:
+      if f.read() == text:
+        return
+  except IOError:
+    pass
+  with open(path + ".tmp", "w") as f:
+    f.write(text)
+  os.rename(path + ".tmp", path)
+
+
+def GenerateTables(arch_inputs, output_dir, cache_dir=None, force=False):
+  """Write the register tables of several architectures.
+
+  Args:
+    arch_inputs: a list of (arch, raw registers file, DWARF header).
+    output_dir: where to write RegisterTables*.h.
+    cache_dir: where to memoize parsed inputs, or None.
+    force: regenerate even architectures whose inputs didn't change.
+
+  Returns:
+    A list of (arch, number of registers or None if unchanged).
+
+  Raises:
+    ValueError: for unknown architectures or inputs that don't parse.
+
+  """
+  if not os.path.isdir(output_dir):
+    os.makedirs(output_dir)
+  _WriteIfChanged(os.path.join(output_dir, "RegisterTables.h"),
+                  _COMMON_HEADER)
+  stamp_path = os.path.join(output_dir, _STAMP_FILE)
+  try:
+    with open(stamp_path) as f:
+      stamps = json.load(f)
+  except (IOError, ValueError):
+    stamps = {}
+
+  with open(os.path.realpath(__file__), "rb") as f:
+    script = f.read()
+  results = []
+  for arch, raw_path, header_path in arch_inputs:
+    if arch not in ARCHES:
+      raise ValueError("unknown architecture %s (known: %s)"
+                       % (arch, ", ".join(sorted(ARCHES))))
+    with open(raw_path, "rb") as f:
+      raw_text = f.read().decode("utf-8", "replace")
+    with open(header_path, "rb") as f:
+      header_text = f.read().decode("utf-8", "replace")
+    output_path = os.path.join(output_dir, "RegisterTables_%s.h" % arch)
+    key = _Digest(script, raw_text, header_text)
+    if not force and stamps.get(arch) == key and os.path.exists(output_path):
+      results.append((arch, None))
+      continue
+
+    registers = _Memoized("raw", raw_text, ParseRawRegisters, cache_dir)
+    entry_pattern = ARCHES[arch]["dwarf_entry"]
+    dwarf_entries = _Memoized(
+        "dwarf-" + arch, header_text,
+        lambda text: ParseDwarfHeader(text, entry_pattern), cache_dir)
+    rows, packet_size = BuildTable(arch, registers, dwarf_entries)
+    _WriteIfChanged(output_path, FormatTable(arch, rows, packet_size,
+                                             [raw_path, header_path]))
+    stamps[arch] = key
+    results.append((arch, len(rows)))
+
+  with open(stamp_path + ".tmp", "w") as f:
+    json.dump(stamps, f, indent=1, sort_keys=True)
+  os.rename(stamp_path + ".tmp", stamp_path)
+  return results
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Generate C++ register tables from gdb register dumps.")
+  parser.add_argument(
+      "--arch", action="append", nargs=3, dest="arches", required=True,
+      metavar=("ARCH", "RAW_REGISTERS", "DWARF_HEADER"),
+      help=("an architecture (%s), its maint print raw-registers output and "
+            "its DWARF register header; repeat for more"
+            % ", ".join(sorted(ARCHES))))
+  parser.add_argument(
+      "-o", "--output-dir", action="store", dest="output_dir", default=".",
+      help="where to write the tables (default: current dir)")
+  parser.add_argument(
+      "--cache-dir", action="store", dest="cache_dir", default=_CACHE_DIR,
+      help="parsed input cache (default: %(default)s)")
+  parser.add_argument(
+      "--no-cache", action="store_const", const=None, dest="cache_dir",
+      help="don't memoize parsed inputs")
+  parser.add_argument(
+      "-f", "--force", action="store_true",
+      help="regenerate all tables, even unchanged ones")
+  args = parser.parse_args()
+
+  cache_dir = (os.path.expanduser(args.cache_dir) if args.cache_dir
+               else None)
+  try:
+    results = GenerateTables(args.arches, args.output_dir, cache_dir,
+                             args.force)
+  except (IOError, ValueError) as e:
+    print("Error: %s" % e, file=sys.stderr)
+    exit(1)
+  for arch, count in results:
+    if count is None:
+      print("%-8s unchanged" % arch)
+    else:
+      print("%-8s %4d registers" % (arch, count))
+
+
+if __name__ == "__main__":
+  main()
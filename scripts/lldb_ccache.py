@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+
+"""Shared ccache configuration and hit-rate reporting for lldb builds.
+
+LauncherSettings -- env settings for running ccache as compiler launcher.
+SetMaxSize -- Set the size limit of a ccache cache.
+BuildCacheDir -- Return the ccache dir a cmake build dir was set up with.
+Snapshot -- Read ccache's statistics counters.
+ReportBuild -- Print the hit rate between two snapshots.
+
+Used as a command, it runs a build and reports how well ccache did for
+that build, e.g. from the build directory:
+
+  lldb_ccache.py ninja lldb
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+import lldb_utils
+
+
+# Counters we report, and the lines that carry them in the "ccache -s"
+# output of ccache versions that don't have --print-stats.
+_COUNTERS = ("direct_cache_hit", "preprocessed_cache_hit", "cache_miss")
+_STATS_LINE_RE = re.compile(
+    r"^(cache hit \(direct\)|cache hit \(preprocessed\)|cache miss)\s+(\d+)")
+_STATS_LINE_COUNTERS = {
+    "cache hit (direct)": "direct_cache_hit",
+    "cache hit (preprocessed)": "preprocessed_cache_hit",
+    "cache miss": "cache_miss",
+}
+
+
+def LauncherSettings(base_dir, cache_dir=None, use_clang=False,
+                     use_pch=False):
+  """Return the ccache settings to pass to the launcher through env(1).
+
+  They're given to every compile rather than written to ccache.conf, as
+  base_dir differs between checkouts that share one cache.
+
+  Args:
+    base_dir: the root of the checkout.  Paths below it are hashed
+      relative to it, so other checkouts of the same sources get hits.
+    cache_dir: the cache to use (default: ccache's own default).
+    use_clang: whether the compiler is clang.
+    use_pch: whether the build uses precompiled headers.
+
+  Returns:
+    A list of NAME=VALUE strings.
+
+  """
+  settings = ["CCACHE_BASEDIR=" + base_dir,
+              # Don't hash the build dir into -g compiles either, so debug
+              # builds can share the cache too.
+              "CCACHE_NOHASHDIR=1",
+              "CCACHE_COMPRESS=1"]
+  if cache_dir:
+    settings.append("CCACHE_DIR=" + cache_dir)
+  if use_clang:
+    # Compile the original source rather than the preprocessor output, so
+    # that clang's warnings (and -Qunused-arguments) behave as uncached.
+    settings.append("CCACHE_CPP2=yes")
+  if use_pch:
+    # Without these ccache refuses to cache compiles that use a PCH.
+    settings.append("CCACHE_SLOPPINESS=pch_defines,time_macros,"
+                    "include_file_mtime,include_file_ctime")
+  return settings
+
+
+def _CcacheEnv(cache_dir):
+  env = dict(os.environ)
+  if cache_dir:
+    env["CCACHE_DIR"] = cache_dir
+  return env
+
+
+def SetMaxSize(size, cache_dir=None):
+  """Set the size limit (e.g. "20G") of the cache.
+
+  Returns:
+    The ccache command status.
+
+  """
+  return subprocess.call(["ccache", "-M", size], env=_CcacheEnv(cache_dir))
+
+
+def BuildCacheDir(build_dir):
+  """Return the CCACHE_DIR a cmake build dir compiles with, if any."""
+  try:
+    with open(os.path.join(build_dir, "CMakeCache.txt")) as cache:
+      for line in cache:
+        if line.startswith("CMAKE_CXX_COMPILER_LAUNCHER"):
+          match = re.search(r"CCACHE_DIR=([^;]+)", line)
+          return match.group(1).strip() if match else None
+  except IOError:
+    pass
+  return None
+
+
+def Snapshot(cache_dir=None):
+  """Read the ccache statistics counters.
+
+  Args:
+    cache_dir: the cache to read (default: ccache's own default).
+
+  Returns:
+    A dict of counter name to value, or None if ccache isn't available.
+
+  """
+  if not lldb_utils.FindInExecutablePath("ccache"):
+    return None
+  env = _CcacheEnv(cache_dir)
+  counters = dict((name, 0) for name in _COUNTERS)
+  try:
+    output = subprocess.check_output(["ccache", "--print-stats"], env=env,
+                                     stderr=subprocess.STDOUT)
+    for line in output.decode("utf-8", "replace").splitlines():
+      fields = line.split("\t")
+      if len(fields) == 2 and fields[0] in counters:
+        counters[fields[0]] = int(fields[1])
+  except subprocess.CalledProcessError:
+    # ccache before 3.7 only has the human-readable statistics.
+    output = subprocess.check_output(["ccache", "-s"], env=env)
+    for line in output.decode("utf-8", "replace").splitlines():
+      match = _STATS_LINE_RE.match(line.strip())
+      if match:
+        counters[_STATS_LINE_COUNTERS[match.group(1)]] = int(match.group(2))
+  return counters
+
+
+def ReportBuild(before, after, out=sys.stdout):
+  """Print the ccache hits and misses between two snapshots.
+
+  The counters are per cache, so builds sharing the cache at the same
+  time are counted too.
+  """
+  if before is None or after is None:
+    return
+  delta = dict((name, after[name] - before[name]) for name in _COUNTERS)
+  hits = delta["direct_cache_hit"] + delta["preprocessed_cache_hit"]
+  total = hits + delta["cache_miss"]
+  if total == 0:
+    print("ccache: no cacheable compiles in this build", file=out)
+    return
+  print("ccache: %d hits (%d direct, %d preprocessed), %d misses, "
+        "hit rate %.1f%%" % (hits, delta["direct_cache_hit"],
+                             delta["preprocessed_cache_hit"],
+                             delta["cache_miss"], 100.0 * hits / total),
+        file=out)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Run a build and report its ccache hit rate.")
+  parser.add_argument(
+      "--cache-dir", action="store", dest="cache_dir",
+      help="ccache dir to report on (default: the one the build dir uses)")
+  parser.add_argument("command", nargs=argparse.REMAINDER,
+                      help="the build command, e.g. ninja")
+  args = parser.parse_args()
+  if not args.command:
+    parser.error("no build command given")
+
+  cache_dir = args.cache_dir or BuildCacheDir(os.getcwd())
+  before = Snapshot(cache_dir)
+  status = subprocess.call(args.command)
+  ReportBuild(before, Snapshot(cache_dir))
+  exit(status)
+
+
+if __name__ == "__main__":
+  main()
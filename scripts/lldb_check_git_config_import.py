@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""Check that importing support/git_config.py stays within a time budget.
+
+repo imports git_config.py for every subcommand, so its import time is
+paid on every repo invocation.  This imports it in fresh interpreters,
+with the repo checkout's own modules (pyversion, error, trace,
+git_command) on the path, and fails if the fastest import takes longer
+than the budget.  It also fails if the import loaded a module that
+git_config.py only loads on demand (the network stack and git_command),
+which is what usually makes the import slow again.
+
+Run it after changing git_config.py, from within a repo checkout or with
+--repo-dir:
+
+  lldb_check_git_config_import.py --budget-ms 60
+
+See lldb_check_git_config_import.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+
+import lldb_utils
+
+
+# modules git_config.py imports lazily, see _LazyModule there
+_LAZY_MODULES = ("urllib.request", "urllib.error", "http.client", "urllib2",
+                 "httplib", "git_command")
+
+_CHILD = """
+import sys, time
+sys.path[:0] = [%r, %r]
+start = time.time()
+import git_config
+print(time.time() - start)
+print(" ".join(name for name in %r if name in sys.modules))
+"""
+
+
+def _ParseCommandLine():
+  parser = argparse.ArgumentParser(
+      description="Time the import of git_config.py against a budget.")
+  parser.add_argument(
+      "--repo-dir", action="store", dest="repo_dir",
+      help="directory with repo's own modules (default: the .repo/repo of "
+           "the checkout containing the working directory)")
+  parser.add_argument(
+      "--budget-ms", action="store", dest="budget_ms", type=float,
+      default=60.0,
+      help="fail if the fastest import takes longer (default: 60)")
+  parser.add_argument(
+      "-n", "--runs", action="store", type=int, default=5,
+      help="number of fresh interpreters to time (default: 5)")
+  parser.add_argument(
+      "--python", action="store", default=sys.executable,
+      help="interpreter to import with (default: this one)")
+  return parser.parse_args()
+
+
+def TimeImport(python, support_dir, repo_dir):
+  """Import git_config in a fresh interpreter.
+
+  Returns:
+    (seconds the import took, list of lazy modules it loaded).
+
+  """
+  process = subprocess.Popen(
+      [python, "-c", _CHILD % (support_dir, repo_dir, _LAZY_MODULES)],
+      stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+  output = process.communicate()[0].decode("utf-8", "replace")
+  if process.returncode != 0:
+    raise RuntimeError("importing git_config failed:\n" + output)
+  lines = output.splitlines()
+  return float(lines[0]), lines[1].split() if len(lines) > 1 else []
+
+
+def main():
+  args = _ParseCommandLine()
+  support_dir = os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])),
+                             "support")
+  repo_dir = args.repo_dir
+  if not repo_dir:
+    repo_parent_dir = lldb_utils.FindParentInParentChain(".repo")
+    if not repo_parent_dir:
+      print("Error: no .repo in parent directory chain; use --repo-dir")
+      exit(1)
+    repo_dir = os.path.join(repo_parent_dir, ".repo", "repo")
+
+  try:
+    runs = [TimeImport(args.python, support_dir, os.path.abspath(repo_dir))
+            for _ in range(args.runs)]
+  except RuntimeError as e:
+    print("Error: %s" % e)
+    exit(1)
+
+  best = min(seconds for seconds, _ in runs) * 1000
+  loaded = sorted(set(name for _, names in runs for name in names))
+  print("import git_config: best %.1f ms, worst %.1f ms of %d runs "
+        "(budget %.1f ms)" % (best, max(s for s, _ in runs) * 1000,
+                              len(runs), args.budget_ms))
+  failed = False
+  if best > args.budget_ms:
+    print("FAILED: over budget")
+    failed = True
+  if loaded:
+    print("FAILED: eagerly imported %s" % ", ".join(loaded))
+    failed = True
+  if failed:
+    exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+"""Check support/git_config.py's review server cache against a stand-in.
+
+repo upload asks each review server for <review>/ssh_info, and
+git_config.py keeps the answers on disk (~/.repopickle_review), so later
+invocations skip the request, and coalesces concurrent lookups of one
+server into one request.  This serves ssh_info from a local HTTP server
+that counts its requests, runs lookups in fresh interpreters with a temp
+HOME, as separate repo invocations would, and fails unless:
+
+  - concurrent lookups of one server make one request,
+  - a later invocation makes none, for ssh and NOT_AVAILABLE answers,
+  - an HTML answer (a login page) isn't cached,
+  - an expired entry is fetched again,
+  - an unreadable cache file is a cache miss, and is rewritten.
+
+Run it after changing git_config.py, from within a repo checkout or with
+--repo-dir:
+
+  lldb_check_review_cache.py
+
+See lldb_check_review_cache.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import pickle
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+  from http.server import BaseHTTPRequestHandler, HTTPServer
+  from socketserver import ThreadingMixIn
+except ImportError:
+  from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+  from SocketServer import ThreadingMixIn
+
+import lldb_utils
+
+
+# what the stand-in answers for /<server>/ssh_info
+_ANSWERS = {"ssh": b"review.example.com 29418",
+            "none": b"NOT_AVAILABLE",
+            "html": b"<html>Sign in</html>"}
+
+# long enough for concurrent lookups to overlap
+_ANSWER_DELAY = 0.2
+
+_CACHE_FILE = ".repopickle_review"
+
+# Looks up the review url of each (server, project) in its own thread,
+# through git_config.Remote, and prints them as JSON.
+_CHILD = """
+import json, sys, threading
+sys.path[:0] = [%r, %r]
+import git_config
+git_config.init_ssh()
+
+class Config(object):
+  def __init__(self, values):
+    self.values = values
+  def GetString(self, name, all_keys=False):
+    value = self.values.get(name)
+    if all_keys:
+      return [value] if value else []
+    return value
+
+lookups = %r
+urls = [None] * len(lookups)
+def Lookup(i):
+  server, project = lookups[i]
+  remote = git_config.Remote(Config({
+      "remote.origin.review": %r + server,
+      "remote.origin.projectname": project}), "origin")
+  urls[i] = remote.ReviewUrl("me@example.com")
+threads = [threading.Thread(target=Lookup, args=(i,))
+           for i in range(len(lookups))]
+for thread in threads:
+  thread.start()
+for thread in threads:
+  thread.join()
+print(json.dumps(urls))
+"""
+
+# Makes every entry of a cache file look expired.
+_EXPIRE = """
+import pickle
+with open(%r, "rb") as f:
+  cache = pickle.load(f)
+for url, (_, info) in list(cache.items()):
+  cache[url] = (0, info)
+with open(%r, "wb") as f:
+  pickle.dump(cache, f, 2)
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+  def do_GET(self):
+    server = self.path.strip("/").split("/")[0]
+    with self.server.lock:
+      self.server.requests[server] = self.server.requests.get(server, 0) + 1
+    time.sleep(_ANSWER_DELAY)
+    answer = _ANSWERS.get(server)
+    if answer is None:
+      self.send_error(404)
+      return
+    self.send_response(200)
+    self.send_header("Content-Length", str(len(answer)))
+    self.end_headers()
+    self.wfile.write(answer)
+
+  def log_message(self, *args):
+    pass
+
+
+class _StandIn(ThreadingMixIn, HTTPServer):
+  """The review servers, counting the requests each one gets."""
+
+  daemon_threads = True
+
+  def __init__(self):
+    HTTPServer.__init__(self, ("127.0.0.1", 0), _Handler)
+    self.lock = threading.Lock()
+    self.requests = {}
+
+  def Url(self):
+    return "http://127.0.0.1:%d/" % self.server_address[1]
+
+  def TakeRequests(self):
+    with self.lock:
+      requests, self.requests = self.requests, {}
+    return requests
+
+
+def _ParseCommandLine():
+  parser = argparse.ArgumentParser(
+      description="Check git_config.py's review server cache.")
+  parser.add_argument(
+      "--repo-dir", action="store", dest="repo_dir",
+      help="directory with repo's own modules (default: the .repo/repo of "
+           "the checkout containing the working directory)")
+  parser.add_argument(
+      "--python", action="store", default=sys.executable,
+      help="interpreter to run git_config with (default: this one)")
+  return parser.parse_args()
+
+
+class _Checker(object):
+
+  def __init__(self, python, support_dir, repo_dir, stand_in, home):
+    self.python = python
+    self.support_dir = support_dir
+    self.repo_dir = repo_dir
+    self.stand_in = stand_in
+    self.home = home
+    self.failures = 0
+
+  def Run(self, lookups):
+    """Run one invocation's lookups; return (urls, requests per server)."""
+    process = subprocess.Popen(
+        [self.python, "-c", _CHILD % (self.support_dir, self.repo_dir,
+                                      lookups, self.stand_in.Url())],
+        env=dict(os.environ, HOME=self.home),
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = process.communicate()[0].decode("utf-8", "replace")
+    if process.returncode != 0:
+      raise RuntimeError("looking up review urls failed:\n" + output)
+    return json.loads(output.splitlines()[-1]), self.stand_in.TakeRequests()
+
+  def Expect(self, what, requests, server, count):
+    ok = requests.get(server, 0) == count
+    print("%-4s %s: %d requests to %s, expected %d"
+          % ("ok" if ok else "FAIL", what, requests.get(server, 0), server,
+             count))
+    if not ok:
+      self.failures += 1
+
+
+def main():
+  args = _ParseCommandLine()
+  support_dir = os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])),
+                             "support")
+  repo_dir = args.repo_dir
+  if not repo_dir:
+    repo_parent_dir = lldb_utils.FindParentInParentChain(".repo")
+    if not repo_parent_dir:
+      print("Error: no .repo in parent directory chain; use --repo-dir")
+      exit(1)
+    repo_dir = os.path.join(repo_parent_dir, ".repo", "repo")
+
+  stand_in = _StandIn()
+  thread = threading.Thread(target=stand_in.serve_forever)
+  thread.daemon = True
+  thread.start()
+  home = tempfile.mkdtemp(prefix="lldb-review-cache-")
+  cache_path = os.path.join(home, _CACHE_FILE)
+  checker = _Checker(args.python, support_dir, os.path.abspath(repo_dir),
+                     stand_in, home)
+  projects = [("ssh", "project%d" % i) for i in range(8)]
+  try:
+    urls, requests = checker.Run(projects + [("none", "other")])
+    checker.Expect("concurrent lookups", requests, "ssh", 1)
+    if urls[0] != "ssh://me@review.example.com:29418/project0" or \
+        urls[-1] != stand_in.Url() + "none/p/other":
+      print("FAIL unexpected review urls %s" % urls)
+      checker.failures += 1
+
+    _, requests = checker.Run(projects + [("none", "other")])
+    checker.Expect("next invocation", requests, "ssh", 0)
+    checker.Expect("next invocation", requests, "none", 0)
+
+    for what in ("html answer", "html answer again"):
+      _, requests = checker.Run([("html", "project")])
+      checker.Expect(what, requests, "html", 1)
+
+    # with the child's pickle, which may be a newer protocol than ours
+    subprocess.check_call([args.python, "-c",
+                           _EXPIRE % (cache_path, cache_path)])
+    _, requests = checker.Run(projects[:1])
+    checker.Expect("expired entry", requests, "ssh", 1)
+
+    for what, garbage in (("truncated cache", b"\x80\x02}q"),
+                          ("foreign cache", pickle.dumps([1, 2], 2))):
+      with open(cache_path, "wb") as f:
+        f.write(garbage)
+      _, requests = checker.Run(projects[:1])
+      checker.Expect(what, requests, "ssh", 1)
+      _, requests = checker.Run(projects[:1])
+      checker.Expect(what + " rewritten", requests, "ssh", 0)
+  except RuntimeError as e:
+    print("Error: %s" % e)
+    exit(1)
+  finally:
+    stand_in.shutdown()
+    shutil.rmtree(home)
+
+  if checker.failures:
+    exit(1)
+
+
+if __name__ == "__main__":
+  main()
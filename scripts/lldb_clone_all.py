@@ -7,31 +7,220 @@ Specifically:
  * lldb/clang => llvm/tools/clang
  * lldb/lldb  => llvm/tools/lldb
 
+Full clones of all three take long and use many gigabytes per sandbox;
+options make them cheaper:
+
+  --parallel       clone the three at once (clang and lldb are cloned
+                   next to llvm, then moved into llvm/tools).
+  --reference DIR  borrow objects from local repos DIR/{llvm,clang,lldb}
+                   (e.g. a shared mirror, see lldb_mirror.py) through
+                   git alternates, so only missing objects are fetched
+                   and stored; --dissociate copies them in afterwards.
+  --filter blob:none
+                   partial clone: file contents are fetched on demand,
+                   when checked out.
+  --depth N        shallow clone of the last N commits.
+  --sparse         check out only the llvm directories an lldb build
+                   needs to configure and build, i.e. without llvm's
+                   own tests.  lldb_configure.py then configures with
+                   LLVM_INCLUDE_TESTS=OFF, and as LLDB_INCLUDE_TESTS
+                   defaults to it, there is no lldb test suite
+                   (check-lldb) in such a sandbox either.
+
+If a clone fails, the repositories already cloned are removed again, so
+the command can simply be run again.
+
+A table of the time each clone took and the disk space it uses is
+printed at the end.
+
+See lldb_clone_all.py -h for usage.
+
 """
 
 
-import os
+from __future__ import print_function
 
+import argparse
+import os
+import shutil
+import subprocess
+import time
 
 import lldb_utils
 
 
+# name, path relative to the sandbox
+_REPOS = [("llvm", "llvm"),
+          ("clang", os.path.join("llvm", "tools", "clang")),
+          ("lldb", os.path.join("llvm", "tools", "lldb"))]
+
+# llvm directories lldb builds need: besides what is compiled, everything
+# llvm's CMakeLists.txt and LLVMBuild.txt add as a subdirectory, or
+# configuring fails.  Top-level files are always checked out.
+_SPARSE_LLVM_DIRS = ["bindings", "cmake", "docs", "examples", "include", "lib",
+                     "projects", "runtimes", "tools", "utils"]
+
+_STAGING_DIR = ".lldb-clone-staging"
+
+
+def _ParseCommandLine():
+  parser = argparse.ArgumentParser(
+      description="Clone llvm, clang and lldb into an lldb sandbox.")
+  parser.add_argument(
+      "--url-base", action="store", dest="url_base",
+      default="sso://team/lldb/",
+      help="prefix of the repository urls (default: %(default)s)")
+  parser.add_argument(
+      "-C", "--directory", action="store", default=".",
+      help="directory to create the sandbox in (default: current dir)")
+  parser.add_argument(
+      "-p", "--parallel", action="store_true",
+      help="clone all three repositories at the same time")
+  parser.add_argument(
+      "--reference", action="store", metavar="DIR",
+      help="borrow objects from DIR/llvm, DIR/clang and DIR/lldb "
+           "(or .git suffixed bare repos) where they exist")
+  parser.add_argument(
+      "--dissociate", action="store_true",
+      help="with --reference, copy the borrowed objects after cloning")
+  parser.add_argument(
+      "--filter", action="store",
+      help="partial clone filter, e.g. blob:none")
+  parser.add_argument(
+      "--depth", action="store", type=int,
+      help="shallow clone of this many commits")
+  parser.add_argument(
+      "--sparse", action="store_true",
+      help="check out only the llvm dirs lldb needs: %s; builds of such "
+           "a sandbox have no lldb test suite" % ", ".join(_SPARSE_LLVM_DIRS))
+  return parser.parse_args()
+
+
+def _FindReference(reference_dir, name):
+  for candidate in (name, name + ".git"):
+    path = os.path.join(reference_dir, candidate)
+    if os.path.isdir(path):
+      return os.path.abspath(path)
+  return None
+
+
+def _Run(command, cwd):
+  print(" ".join(command))
+  return subprocess.call(command, cwd=cwd)
+
+
+def CloneRepo(name, url, dest, args):
+  """Clone one repository into dest, with the options in args.
+
+  Returns:
+    The git exit status (0 on success).
+
+  """
+  command = ["git", "clone"]
+  if args.reference:
+    reference = _FindReference(args.reference, name)
+    if reference:
+      command += ["--reference", reference]
+      if args.dissociate:
+        command.append("--dissociate")
+  if args.filter:
+    command.append("--filter=" + args.filter)
+  if args.depth:
+    command += ["--depth", str(args.depth)]
+  sparse = args.sparse and name == "llvm"
+  if sparse:
+    command.append("--no-checkout")
+  status = _Run(command + [url, dest], ".")
+  if status != 0 or not sparse:
+    return status
+  for sparse_command in (["git", "sparse-checkout", "init", "--cone"],
+                         ["git", "sparse-checkout", "set"] + _SPARSE_LLVM_DIRS,
+                         ["git", "checkout"]):
+    status = _Run(sparse_command, dest)
+    if status != 0:
+      return status
+  return 0
+
+
+def DiskUsage(path, exclude=()):
+  """Return the bytes allocated under path, not counting the exclude dirs."""
+  total = 0
+  for dirpath, dirnames, filenames in os.walk(path):
+    dirnames[:] = [d for d in dirnames
+                   if os.path.join(dirpath, d) not in exclude]
+    for filename in filenames:
+      try:
+        stat = os.lstat(os.path.join(dirpath, filename))
+      except OSError:
+        continue
+      total += getattr(stat, "st_blocks", 0) * 512 or stat.st_size
+  return total
+
+
 def main():
-  if lldb_utils.RunInDirectory(".",
-                               ("git", "clone", "sso://team/lldb/llvm")) != 0:
-    print "Error: failed to clone llvm (see errors above)"
-    exit(1)
+  args = _ParseCommandLine()
+  sandbox = os.path.abspath(args.directory)
+  for _, path in _REPOS:
+    if os.path.exists(os.path.join(sandbox, path)):
+      print("Error: %s already exists." % os.path.join(sandbox, path))
+      exit(1)
+  if not os.path.isdir(sandbox):
+    os.makedirs(sandbox)
 
-  if lldb_utils.RunInDirectory(os.path.join("llvm", "tools"),
-                               ("git", "clone", "sso://team/lldb/clang")) != 0:
-    print "Error: failed to clone clang (see errors above)"
-    exit(1)
+  timings = {}
 
-  if lldb_utils.RunInDirectory(os.path.join("llvm", "tools"),
-                               ("git", "clone", "sso://team/lldb/lldb")) != 0:
-    print "Error: failed to clone lldb (see errors above)"
+  def Clone(repo):
+    name, path = repo
+    # clang and lldb go into llvm's tree, which doesn't exist yet when
+    # cloning in parallel
+    if args.parallel and name != "llvm":
+      dest = os.path.join(sandbox, _STAGING_DIR, name)
+    else:
+      dest = os.path.join(sandbox, path)
+    start = time.time()
+    status = CloneRepo(name, args.url_base + name, dest, args)
+    timings[name] = time.time() - start
+    return status
+
+  start = time.time()
+  if args.parallel:
+    statuses = lldb_utils.RunParallel(Clone, _REPOS, len(_REPOS))
+    if not any(statuses):
+      for name, path in _REPOS[1:]:
+        if not os.path.isdir(os.path.dirname(os.path.join(sandbox, path))):
+          os.makedirs(os.path.dirname(os.path.join(sandbox, path)))
+        os.rename(os.path.join(sandbox, _STAGING_DIR, name),
+                  os.path.join(sandbox, path))
+    shutil.rmtree(os.path.join(sandbox, _STAGING_DIR), ignore_errors=True)
+  else:
+    statuses = []
+    for repo in _REPOS:
+      statuses.append(Clone(repo))
+      if statuses[-1]:
+        break
+  elapsed = time.time() - start
+
+  failed = [name for (name, _), status in zip(_REPOS, statuses) if status]
+  if failed:
+    # llvm last: it contains the others once they are moved in
+    for _, path in reversed(_REPOS):
+      shutil.rmtree(os.path.join(sandbox, path), ignore_errors=True)
+    print("Error: failed to clone %s (see errors above)" % ", ".join(failed))
     exit(1)
 
+  print("")
+  print("%-6s %10s %12s %12s" % ("repo", "seconds", ".git MB", "total MB"))
+  nested = [os.path.join(sandbox, path) for _, path in _REPOS[1:]]
+  total_bytes = 0
+  for name, path in _REPOS:
+    repo_dir = os.path.join(sandbox, path)
+    git_bytes = DiskUsage(os.path.join(repo_dir, ".git"))
+    repo_bytes = DiskUsage(repo_dir, nested)
+    total_bytes += repo_bytes
+    print("%-6s %10.1f %12.1f %12.1f" % (name, timings[name],
+                                         git_bytes / 1e6, repo_bytes / 1e6))
+  print("%-6s %10.1f %12s %12.1f" % ("all", elapsed, "", total_bytes / 1e6))
+
 
 if __name__ == "__main__":
   main()
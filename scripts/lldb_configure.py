@@ -18,10 +18,15 @@
 # Python built-in modules
 import argparse
 import os
+import socket
 import subprocess
 
 
 # Our modules
+import lldb_ccache
+import lldb_pch
+import lldb_profiles
+import lldb_unity
 import lldb_utils
 import workingdir
 
@@ -38,6 +43,11 @@ def ParseCommandLine():
   parser = argparse.ArgumentParser(
       description="Configure lldb build environment.")
 
+  parser.add_argument(
+      "-p", "--profile", action="store", dest="profile",
+      choices=lldb_profiles.ProfileNames(),
+      help=("start from the named configure profile in "
+            "support/lldb_profiles.json; other options add to it"))
   parser.add_argument(
       "-target", action="store", dest="target", default="x86",
       help="specify the target type, x86, android (default: x86)")
@@ -74,18 +84,56 @@ def ParseCommandLine():
   parser.add_argument(
       "--ccache", action="store_true", dest="use_ccache",
       help="enable cached compiling (default: do not cache obj files)")
+  parser.add_argument(
+      "--ccache-dir", action="store", dest="ccache_dir",
+      help="with --ccache, the cache to use (default: ccache's default, usually ~/.ccache)")
+  parser.add_argument(
+      "--ccache-size", action="store", dest="ccache_size",
+      help="with --ccache, the size limit to set on the cache (default: "
+           "20G for a --ccache-dir, else ccache's own setting is kept)")
   parser.add_argument(
       "-u", "--unity", action="store_true", dest="use_unity",
       help="enable unity build compiles (default: one src file per obj file)")
+  parser.add_argument(
+      "--unity-baseline", action="store", dest="unity_baseline", metavar="DIR",
+      help=("with --unity, size each library's batches from the compile times "
+            "in this earlier non-unity ninja build dir (default: fixed size)"))
+  parser.add_argument(
+      "--pch", action="store", dest="pch_baseline", metavar="DIR",
+      help=("precompile the llvm/clang/C++ headers most of each library's "
+            "sources include, as found in this earlier ninja build dir "
+            "(default: no precompiled headers)"))
   parser.add_argument(
       "-k", "--incremental-link", action="store_true", dest="use_inc_link",
       help="enable incremental linking with gold linker (default: no incremental linking)")
+  parser.add_argument(
+      "--lto", action="store", dest="lto", choices=("thin", "full"),
+      help="link with link-time optimization (default: no LTO)")
+  parser.add_argument(
+      "--lto-cache", action="store", dest="lto_cache", metavar="DIR",
+      help="with --lto thin, keep ThinLTO backend results in DIR for later links")
+  parser.add_argument(
+      "--pgo-instrument", action="store_true", dest="pgo_instrument",
+      help="with --clang, build instrumented to collect a PGO profile (default: no)")
+  parser.add_argument(
+      "--pgo-profile", action="store", dest="pgo_profile", metavar="FILE",
+      help="with --clang, optimize using this merged .profdata PGO profile")
+  parser.add_argument(
+      "--split-dwarf", action="store_true", dest="use_split_dwarf",
+      help="with --debug-symbols, keep debug info in .dwo files out of the link (-gsplit-dwarf)")
+  parser.add_argument(
+      "--gdb-index", action="store_true", dest="use_gdb_index",
+      help="with --debug-symbols and --gold, have the linker build a .gdb_index section")
   parser.add_argument(
       "-b", "--build-dir", action="store",  dest="build_dir", default="build",
       help="specify the build dir, default: build")
   parser.add_argument(
       "-d", "--distcc", action="store_true", dest="use_distcc",
       help="enable distributed compiles to a build farm (default: compile locally)")
+  parser.add_argument(
+      "--distcc-hosts", action="store", dest="distcc_hosts_file",
+      help=("read distcc host specs from this file (default: $DISTCC_HOSTS, "
+            "then $DISTCC_DIR/hosts, ~/.distcc/hosts, /etc/distcc/hosts)"))
   parser.add_argument(
       "--coverage", action="store_true", dest="coverage",
       help="enable code coverage capture during exe runs. Default: no capture")
@@ -105,6 +153,10 @@ def ParseCommandLine():
       "-v", "--IDE-visual-studio", action="store_true", dest="ide_visual_studio",
       help="create project files for MS Visual Studio IDE (default: do not create VS IDE project)")
 
+  # settings only profiles provide
+  parser.set_defaults(cmake_defines=None, max_compile_jobs=None,
+                      max_link_jobs=None)
+
   return parser.parse_args()
 
 
@@ -160,25 +212,310 @@ def GetToolNames(args):
     tool_names.cxx = ("g++" if not args.use_clang else "clang++")
     tool_names.ld = ("ld" if not args.use_gold else "ld.gold")
 
-  # add distcc prefix if enabled
-  if args.use_distcc:
-    tool_names.cc = "distcc " + tool_names.cc
-    tool_names.cxx = "distcc " + tool_names.cxx
+  return tool_names
+
+
+# distcc's default port and job limits for hosts without a /LIMIT (distcc(1)).
+_DISTCC_PORT = 3632
+_DISTCC_DEFAULT_SLOTS = 4
+_DISTCC_DEFAULT_LOCALHOST_SLOTS = 2
+
+
+class DistccHost(object):
+  """One entry of a distcc host list, e.g. "buildbox:3633/8,lzo".
+
+  As in distcc, a spec with an "@" ("[user]@host[/limit][:command]") is
+  an ssh host, and "+zeroconf" stands for the hosts distcc discovers
+  itself.
+  """
+
+  def __init__(self, spec):
+    self.spec = spec
+    host = spec.split(",", 1)[0]
+    self.is_ssh = "@" in host
+    self.is_zeroconf = host == "+zeroconf"
+    if self.is_ssh:
+      # ":command" is the distccd to run; it may contain "/"
+      host = host.split(":", 1)[0]
+    self.slots = None
+    if "/" in host:
+      host, limit = host.split("/", 1)
+      self.slots = int(limit)
+    self.is_local = host == "localhost"
+    self.port = _DISTCC_PORT
+    if not self.is_ssh and ":" in host:
+      host, port = host.rsplit(":", 1)
+      self.port = int(port)
+    self.host = host.split("@", 1)[-1]
+    if self.is_zeroconf:
+      # unknown until distcc discovers the hosts
+      self.slots = 0
+    elif self.slots is None:
+      self.slots = (_DISTCC_DEFAULT_LOCALHOST_SLOTS if self.is_local
+                    else _DISTCC_DEFAULT_SLOTS)
+
+  def IsReachable(self, timeout=0.5):
+    """Return whether the host's distccd accepts a TCP connection."""
+    if self.is_local or self.is_ssh or self.is_zeroconf:
+      # localhost compiles locally; ssh hosts are started on demand, and
+      # distcc finds zeroconf hosts itself.
+      return True
+    try:
+      socket.create_connection((self.host, self.port), timeout).close()
+      return True
+    except (socket.error, socket.timeout):
+      return False
+
+
+def ReadDistccHosts(hosts_file=None):
+  """Read the distcc host specs the user has configured.
+
+  Args:
+    hosts_file: the hosts file to read.  If None, $DISTCC_HOSTS is used
+      if set, otherwise the first of distcc's own hosts files that exists.
 
-  # ccache should be the initial compiler prefix (before distcc),
-  # so all subsequent compile operations are skipped on a cache hit
+  Returns:
+    A list of DistccHost objects (possibly empty).
+
+  """
+  text = None
+  if hosts_file is None:
+    text = os.environ.get("DISTCC_HOSTS")
+    if not text:
+      candidates = [os.path.join(os.environ.get("DISTCC_DIR", ""), "hosts"),
+                    os.path.expanduser(os.path.join("~", ".distcc", "hosts")),
+                    "/etc/distcc/hosts"]
+      hosts_file = next((f for f in candidates if os.path.isfile(f)), None)
+  if text is None and hosts_file is not None:
+    with open(hosts_file) as f:
+      text = "\n".join(line.split("#", 1)[0] for line in f)
+  if not text:
+    return []
+  # options such as --randomize or --localslots=N are not hosts
+  return [DistccHost(spec) for spec in text.split()
+          if not spec.startswith("--")]
+
+
+def DiscoverDistccHosts(args):
+  """Find the configured distcc hosts that are up, checking in parallel.
+
+  Returns:
+    (list of reachable DistccHost objects, number of remote hosts
+    configured).
+
+  """
+  hosts = ReadDistccHosts(args.distcc_hosts_file)
+  reachable = lldb_utils.RunParallel(lambda h: h.IsReachable(), hosts)
+  return ([h for h, up in zip(hosts, reachable) if up],
+          len([h for h in hosts if not h.is_local]))
+
+
+def WriteDistccDir(build_dir, distcc_hosts):
+  """Write the hosts file distcc will use when building in build_dir.
+
+  The build runs long after configure has exited, so the host list can't
+  be handed over through the environment of this script.  Instead the
+  compiler launcher points DISTCC_DIR at a directory inside the build dir.
+
+  Returns:
+    The DISTCC_DIR for the build.
+  """
+  distcc_dir = os.path.join(build_dir, ".distcc")
+  if not os.path.isdir(distcc_dir):
+    os.makedirs(distcc_dir)
+  with open(os.path.join(distcc_dir, "hosts"), "w") as f:
+    f.write(" ".join(h.spec for h in distcc_hosts) + "\n")
+  return distcc_dir
+
+
+def GetCompilerLauncher(args, llvm_parent_dir, distcc_dir):
+  """Construct the command that compiles are run under (may be empty).
+
+  ccache comes first so that a cache hit skips everything else; on a miss
+  it hands the compile to distcc through CCACHE_PREFIX.  Settings the
+  launched tools need at build time are passed through env(1).
+
+  Args:
+    args: the results from parsing the command line.
+    llvm_parent_dir: the root of the checkout being configured.
+    distcc_dir: the DISTCC_DIR to build with, or None to compile locally.
+
+  Returns:
+    A list of launcher tokens, to be put in front of the compiler.
+
+  """
+  env_settings = []
+  launcher = []
+  if distcc_dir:
+    env_settings.append("DISTCC_DIR=" + distcc_dir)
   if args.use_ccache:
-    tool_names.cc = "ccache " + tool_names.cc
-    tool_names.cxx = "ccache " + tool_names.cxx
+    env_settings.extend(lldb_ccache.LauncherSettings(
+        llvm_parent_dir, args.ccache_dir, args.use_clang,
+        bool(args.pch_baseline)))
+    if distcc_dir:
+      env_settings.append("CCACHE_PREFIX=distcc")
+    launcher.append("ccache")
+  elif distcc_dir:
+    launcher.append("distcc")
+  if env_settings:
+    launcher = ["env"] + env_settings + launcher
+  return launcher
+
+
+# Rough peak memory (GB) of one lldb/clang compile, without and with -g.
+_COMPILE_MEMORY_GB = {False: 1, True: 2}
+
+# Rough peak memory (GB) of one lldb/clang link, by linker and by the kind of
+# debug info going through the link.
+_LINK_MEMORY_GB = {
+    "ld": {"none": 3, "split": 5, "full": 10},
+    "ld.gold": {"none": 2, "split": 3, "full": 6},
+}
+
+
+def GetLinkMemoryBytes(args, tool_names):
+  """Estimate the memory one link needs with the chosen linker and flags."""
+  if not args.enable_symbols:
+    debug_info = "none"
+  elif args.use_split_dwarf:
+    debug_info = "split"
+  else:
+    debug_info = "full"
+  return _LINK_MEMORY_GB.get(tool_names.ld, _LINK_MEMORY_GB["ld"])[
+      debug_info] << 30
 
-    # if using ccache with clang, add extra clang args to silence 'unused -I' warnings.
-    # args added to tool name instead of compiler flags because flags are ignored/overridden
-    # by some of lldb's cmake build script
-    if args.use_clang:
-      tool_names.cc = tool_names.cc + " -Qunused-arguments -fcolor-diagnostics"
-      tool_names.cxx = tool_names.cxx + " -Qunused-arguments -fcolor-diagnostics"
 
-  return tool_names
+def GetBuildCapacity(args, tool_names, distcc_hosts,
+                     distcc_hosts_configured=0):
+  """Size the build's parallelism from this machine and the build farm.
+
+  Args:
+    args: the results from parsing the command line.
+    tool_names: the tools chosen by GetToolNames.
+    distcc_hosts: the reachable distcc hosts (empty to compile locally).
+    distcc_hosts_configured: how many remote distcc hosts are configured.
+
+  Returns:
+    An object describing the local cores/memory, remote distcc slots and
+    the number of compile and link jobs to run concurrently.
+
+  """
+  class Capacity: pass
+
+  capacity = Capacity()
+  capacity.cores = lldb_utils.LocalCpuCount()
+  capacity.memory_bytes = lldb_utils.LocalMemoryBytes()
+  capacity.remote_hosts = len([h for h in distcc_hosts if not h.is_local])
+  capacity.remote_hosts_configured = distcc_hosts_configured
+  capacity.remote_slots = sum(h.slots for h in distcc_hosts
+                              if not h.is_local)
+
+  # Compiles and links both run on this machine's free memory.  Remote
+  # compiles only preprocess locally, so they don't count against it.
+  capacity.available_bytes = lldb_utils.LocalMemoryBytes(available=True)
+  capacity.compile_bytes = _COMPILE_MEMORY_GB[bool(args.enable_symbols)] << 30
+  capacity.link_bytes = GetLinkMemoryBytes(args, tool_names)
+  capacity.compile_jobs = (
+      max(1, min(capacity.cores,
+                 capacity.available_bytes // capacity.compile_bytes))
+      + capacity.remote_slots)
+  capacity.link_jobs = max(1, min(capacity.cores,
+                                  capacity.available_bytes // capacity.link_bytes))
+
+  # a profile may cap the pools further (e.g. for memory-hungry LTO links)
+  if args.max_compile_jobs:
+    capacity.compile_jobs = min(capacity.compile_jobs, args.max_compile_jobs)
+  if args.max_link_jobs:
+    capacity.link_jobs = min(capacity.link_jobs, args.max_link_jobs)
+  return capacity
+
+
+def PrintCapacitySummary(args, tool_names, capacity):
+  print "Build capacity:"
+  print "  local cores:   %d" % capacity.cores
+  print "  local memory:  %.1f GB" % (capacity.memory_bytes / float(1 << 30))
+  if args.use_distcc:
+    print "  distcc hosts:  %d reachable of %d configured (%d remote slots)" % (
+        capacity.remote_hosts, capacity.remote_hosts_configured,
+        capacity.remote_slots)
+  print "  free memory:   %.1f GB" % (
+      capacity.available_bytes / float(1 << 30))
+  print "  compile jobs:  %d (%d GB each locally)" % (
+      capacity.compile_jobs, capacity.compile_bytes >> 30)
+  print "  link jobs:     %d (%d GB each with %s)" % (
+      capacity.link_jobs, capacity.link_bytes >> 30, tool_names.ld)
+  print "Build with: %s -j %d" % (tool_names.make, capacity.compile_jobs)
+
+
+def GetCmakeVersion():
+  """Return the version of the cmake on the PATH, e.g. (3, 19), or None."""
+  try:
+    with open(os.devnull, "w") as devnull:
+      output = subprocess.check_output(["cmake", "--version"], stderr=devnull)
+  except (OSError, subprocess.CalledProcessError):
+    return None
+  # cmake version 3.19.2
+  words = output.split()
+  if len(words) < 3 or words[:2] != ["cmake", "version"]:
+    return None
+  try:
+    return tuple(int(part) for part in words[2].split(".")[:2])
+  except ValueError:
+    return None
+
+
+def WriteCmakeHooks(build_dir, hooks):
+  """Write cmake code to be run by the llvm project, and return its path.
+
+  The file is passed to cmake as CMAKE_PROJECT_INCLUDE.
+
+  Args:
+    build_dir: the build directory.
+    hooks: a list of cmake code snippets.
+
+  Returns:
+    The path of the file written.
+
+  """
+  path = os.path.join(build_dir, "lldb_configure_hooks.cmake")
+  with open(path, "w") as f:
+    f.write("# Generated by lldb_configure.py.\n")
+    for hook in hooks:
+      f.write("\n" + hook)
+  return path
+
+
+def GetCmakeHooks(args):
+  """Return the cmake code snippets the arguments ask for."""
+  hooks = []
+  if args.use_unity:
+    batch_sizes = {}
+    if args.unity_baseline:
+      batch_sizes = lldb_unity.PlanBatchSizes(args.unity_baseline)
+    hooks.append(lldb_unity.CmakeHook(batch_sizes,
+                                      lldb_unity.ReadExclusions()))
+  if args.pch_baseline:
+    hooks.append(lldb_pch.CmakeHook(lldb_pch.PlanHeaders(args.pch_baseline)))
+  return hooks
+
+
+def GetLauncherFlags(args):
+  """Return the C and C++ compiler flags the compiler launchers need.
+
+  Args:
+    args: the results from parsing the command line.
+
+  Returns:
+    The flags, with a leading space, or "".
+
+  """
+  # ccache and distcc are run as compiler launchers, see GetCompilerLauncher
+  if args.use_ccache and args.use_clang:
+    # silence clang's 'unused -I' warnings when ccache compiles preprocessed
+    # output, and keep its colors although the output isn't a terminal
+    return " -Qunused-arguments -fcolor-diagnostics"
+  return ""
+
 
 def GetCxxFlags(args):
   """Construct C++ compiler flags required for the given options.
@@ -190,11 +527,8 @@ def GetCxxFlags(args):
     The C++ compiler flags required for the given options.
 
   """
-  flags = ""
-  
-  if args.coverage:
-    # add code coverage flags
-    flags += " -fprofile-arcs -ftest-coverage"
+  # coverage and debug info flags are shared with the other build scripts
+  flags = lldb_profiles.CompilerFlags(args) + GetLauncherFlags(args)
 
   if args.with_python_dir:
     flags += " -I%s" % os.path.join(
@@ -213,11 +547,9 @@ def GetLdFlags(args):
     The C++ compiler flags required for the given options.
 
   """
-  flags = ""
-
-  if args.coverage:
-    # add code coverage flags
-    flags += " -fprofile-arcs -ftest-coverage"
+  # coverage, linker choice and debug index flags are shared with the
+  # other build scripts
+  flags = lldb_profiles.LinkerFlags(args)
 
   if args.with_python_dir:
     flags += " -L{} -L{}".format(
@@ -229,6 +561,8 @@ def GetLdFlags(args):
 
 def main():
   args = ParseCommandLine()
+  if args.profile:
+    lldb_profiles.ApplyToArgs(lldb_profiles.GetProfile(args.profile), args)
 
   # find the parent of the llvm directory
   llvm_parent_dir = lldb_utils.FindLLVMParentInParentChain()
@@ -268,9 +602,82 @@ def main():
           "Add --debug-symbols to the command line.")
     exit(1)
 
+  # split dwarf and gdb-index only make sense for debug info, and only
+  # gold can build the index
+  if (args.use_split_dwarf or args.use_gdb_index) and not args.enable_symbols:
+    print("Error: --split-dwarf and --gdb-index require debug info.\n"
+          "Add --debug-symbols to the command line.")
+    exit(1)
+  if args.use_gdb_index and not args.use_gold:
+    print("Error: --gdb-index requires the gold linker.\n"
+          "Add --gold to the command line.")
+    exit(1)
+
+  # profile-guided optimization is clang's -fprofile-instr-generate/-use
+  if args.pgo_instrument or args.pgo_profile:
+    if not args.use_clang or not args.use_cmake:
+      print("Error: --pgo-instrument and --pgo-profile require clang and cmake.\n"
+            "Add --clang --cmake to the command line.")
+      exit(1)
+    if args.pgo_profile:
+      args.pgo_profile = os.path.abspath(args.pgo_profile)
+      if not os.path.isfile(args.pgo_profile):
+        print "Error: PGO profile not found: " + args.pgo_profile
+        exit(1)
+  if args.lto_cache:
+    if args.lto != "thin":
+      print("Error: --lto-cache only applies to ThinLTO.\n"
+            "Add --lto thin to the command line.")
+      exit(1)
+    args.lto_cache = os.path.abspath(os.path.expanduser(args.lto_cache))
+
+  # unity builds are done by cmake
+  if args.use_unity and (not args.use_cmake or args.target == "android"):
+    print("Error: --unity requires a cmake build for the host.\n"
+          "Add --cmake to the command line.")
+    exit(1)
+  if args.unity_baseline:
+    args.unity_baseline = os.path.abspath(args.unity_baseline)
+    if not os.path.exists(os.path.join(args.unity_baseline, ".ninja_log")):
+      print "Error: no .ninja_log in unity baseline dir: " + args.unity_baseline
+      exit(1)
+
+  # so are precompiled headers, and they're planned from ninja's deps log
+  if args.pch_baseline:
+    if not args.use_cmake or not args.use_ninja or args.target == "android":
+      print("Error: --pch requires a cmake/ninja build for the host.\n"
+            "Add --cmake --ninja to the command line.")
+      exit(1)
+    args.pch_baseline = os.path.abspath(args.pch_baseline)
+    if not os.path.exists(os.path.join(args.pch_baseline, ".ninja_deps")):
+      print "Error: no .ninja_deps in pch baseline dir: " + args.pch_baseline
+      exit(1)
+
+  # both hooks need cmake_language(DEFER)
+  if args.use_unity or args.pch_baseline:
+    cmake_version = GetCmakeVersion()
+    for option, wanted, module in (("--unity", args.use_unity, lldb_unity),
+                                   ("--pch", args.pch_baseline, lldb_pch)):
+      if wanted and (cmake_version is None or
+                     cmake_version < module.CMAKE_MIN_VERSION):
+        print("Error: %s requires cmake %s or newer, found %s." % (
+            option, ".".join(map(str, module.CMAKE_MIN_VERSION)),
+            ".".join(map(str, cmake_version)) if cmake_version else "none"))
+        exit(1)
+
   # get names of config, make, compilers, & linker
   tool_names = GetToolNames(args)
 
+  # find the build farm, if one was requested
+  distcc_hosts = []
+  distcc_hosts_configured = 0
+  if args.use_distcc:
+    distcc_hosts, distcc_hosts_configured = DiscoverDistccHosts(args)
+    if not any(not h.is_local for h in distcc_hosts):
+      print "Warning: no distcc hosts reachable, compiling locally."
+  capacity = GetBuildCapacity(args, tool_names, distcc_hosts,
+                              distcc_hosts_configured)
+
   # get flag arguments for the compiler and linker
   cxx_flags = GetCxxFlags(args)
   ld_flags = GetLdFlags(args)
@@ -278,15 +685,19 @@ def main():
   # Make build directory
   os.makedirs(build_dir)
 
+  distcc_dir = None
+  if any(not h.is_local for h in distcc_hosts):
+    distcc_dir = WriteDistccDir(build_dir, distcc_hosts)
+  launcher = GetCompilerLauncher(args, llvm_parent_dir, distcc_dir)
+  # only when asked for: without --ccache-dir, this changes the user's
+  # global ccache config
+  if args.use_ccache and args.target != "android" and (args.ccache_size or
+                                                        args.ccache_dir):
+    lldb_ccache.SetMaxSize(args.ccache_size or "20G", args.ccache_dir)
+
   with workingdir.WorkingDir(build_dir):
 
-    build_type_name = ""
-    if args.enable_symbols and args.enable_assertions:
-      build_type_name = "Debug"
-    if args.enable_symbols and args.enable_optimized:
-      build_type_name = "RelWithDebInfo"
-    elif args.enable_optimized:
-      build_type_name = "Release"
+    build_type_name = lldb_profiles.BuildTypeName(args)
       
     config_message = "configured for " + tool_names.config + "/" + tool_names.make + " (%s)" % build_type_name
 
@@ -298,21 +709,10 @@ def main():
     if args.use_cmake:
       if args.target == "android":
         print("Configuring for " + args.target + ", " + args.arch + ", " + args.toolchain)
-    	# convert to cmake script style string
-    	# todo: 32bit x86
-    	if args.arch == "x86-android":
-        	args.arch = "x86"
-        	llvm_target_arch = "X86"
-        	llvm_targets_to_build = "X86"
-    	elif args.arch == "x86-64-android":
-        	args.arch = "x86_64"
-        	llvm_target_arch = "X86"
-        	llvm_targets_to_build = "X86"
-        # todo: 64bit arm and mips
-        else:
-        	llvm_target_arch = "ARM"
-        	llvm_targets_to_build = "ARM"
-        	
+        # convert to cmake script style string
+        args.arch, llvm_target_arch = lldb_profiles.AndroidArch(args.arch)
+        llvm_targets_to_build = llvm_target_arch
+
         llvm_tblgen = args.tblgen_dir + "/llvm-tblgen"
         clang_tblgen = args.tblgen_dir + "/clang-tblgen"
         if not os.path.isfile(llvm_tblgen):
@@ -340,16 +740,37 @@ def main():
       else:
           command_tokens = ("cmake",
                            ("" if not args.use_ninja else "-GNinja"),
+                          "-DCMAKE_C_COMPILER_LAUNCHER=" + ";".join(launcher),
+                          "-DCMAKE_CXX_COMPILER_LAUNCHER=" + ";".join(launcher),
                           "-DCMAKE_LINKER=" + tool_names.ld,
                           "-DCMAKE_CXX_FLAGS=" + cxx_flags,
                           "-DCMAKE_SHARED_LINKER_FLAGS=" + ld_flags,
                           "-DCMAKE_EXE_LINKER_FLAGS=" + ld_flags,
                           "-DCMAKE_INSTALL_PREFIX:PATH=" + install_dir,
-                          "-DCMAKE_BUILD_TYPE=" + build_type_name,
                           # Do not include this next flag if you want to see
                           # cmake maintainer-related messages.
                           "-Wno-dev",
                           os.path.join("..", "llvm"))            
+          # build type, assertions, LTO and profile extras
+          defines = lldb_profiles.CmakeDefines(args)
+          if GetLauncherFlags(args):
+            # the C++ ones are in cxx_flags
+            defines.append("-DCMAKE_C_FLAGS=" + GetLauncherFlags(args).strip())
+          if args.use_ninja:
+            # ninja pools keep parallel compiles and links within memory
+            defines += [
+                "-DLLVM_PARALLEL_COMPILE_JOBS=%d" % capacity.compile_jobs,
+                "-DLLVM_PARALLEL_LINK_JOBS=%d" % capacity.link_jobs]
+          if not os.path.isdir(os.path.join(llvm_parent_dir, "llvm", "test")):
+            # a sparse checkout, see lldb_clone_all.py --sparse; this turns
+            # off lldb's tests too, LLDB_INCLUDE_TESTS defaults to it
+            defines.append("-DLLVM_INCLUDE_TESTS=OFF")
+          hooks = GetCmakeHooks(args)
+          if hooks:
+            defines.append("-DCMAKE_PROJECT_INCLUDE="
+                           + WriteCmakeHooks(build_dir, hooks))
+          command_tokens = (command_tokens[:-1] + tuple(defines)
+                            + command_tokens[-1:])
     else:
       command_tokens = [os.path.join("..", "llvm", "configure"),
                         "--enable-cxx11",
@@ -371,14 +792,15 @@ def main():
     env_vars = os.environ
     # these environment settings really mess up the Android cmake file
     if args.target != 'android':
-      env_vars["CC"] = tool_names.cc
-      env_vars["CXX"] = tool_names.cxx
-      env_vars["DISTCC_HOSTS"] = ""
-      
-      if args.use_ccache and args.use_clang:
-        env_vars["CCACHE_CPP2"] = "yes"  # This is intended to silence preproc -I warnings, but is not working as expected
+      if args.use_cmake:
+        env_vars["CC"] = tool_names.cc
+        env_vars["CXX"] = tool_names.cxx
+      else:
+        # configure has no launcher setting, so prefix the compilers
+        env_vars["CC"] = " ".join(launcher + [tool_names.cc])
+        env_vars["CXX"] = " ".join(launcher + [tool_names.cxx])
 
-      print "CC='" + tool_names.cc + "' CXX='" + tool_names.cxx + "' " + " ".join(command_tokens)
+      print "CC='" + env_vars["CC"] + "' CXX='" + env_vars["CXX"] + "' " + " ".join(command_tokens)
 
     status = subprocess.call(command_tokens, env=env_vars)
     #    status = 0;
@@ -397,6 +819,9 @@ def main():
     print "The build directory has been set up:"
     print "cd " + build_dir
 
+    print ""
+    PrintCapacitySummary(args, tool_names, capacity)
+
 
 if __name__ == "__main__":
   main()
@@ -7,37 +7,173 @@ and installs a version of git_config.py in that directory
 which allows 'repo upload' to work on sso:// repositories
 like lldb/tools.
 
+With --all, every repo checkout found under the given root
+directories is updated instead.  Files are compared by content hash
+and replaced atomically (write to a temp file, then rename), so a
+concurrent 'repo sync' never sees a missing or partial git_config.py.
+
+See lldb_install_repo_config.py -h for usage.
+
 """
 
 
-import filecmp
+import argparse
 import os
 import shutil
 import sys
+import tempfile
 
 import lldb_utils
 
 
+def ParseCommandLine():
+  """Parse the command line and return a parser results object."""
+  parser = argparse.ArgumentParser(
+      description="Install the custom git_config.py into repo checkouts.")
+
+  parser.add_argument(
+      "-a", "--all", action="store", dest="roots", metavar="ROOT", nargs="+",
+      help=("update every repo checkout found under the given directories "
+            "(default: only the checkout containing the working directory)"))
+  parser.add_argument(
+      "-c", "--check", action="store_true", dest="check_only",
+      help="only report which checkouts are out of date; exit 1 if any are")
+  parser.add_argument(
+      "-j", "--jobs", action="store", dest="jobs", type=int, default=16,
+      help="number of directories to scan/update concurrently (default: 16)")
+  parser.add_argument(
+      "--max-depth", action="store", dest="max_depth", type=int, default=4,
+      help="how many levels below each root to search (default: 4)")
+
+  return parser.parse_args()
+
+
+def _ScanForCheckouts(top, max_depth):
+  """Return the repo checkouts (dirs containing .repo) at or below top."""
+  found = []
+  top_depth = top.rstrip(os.sep).count(os.sep)
+  for dirpath, dirnames, _ in os.walk(top):
+    if ".repo" in dirnames:
+      found.append(dirpath)
+      # Nothing below a checkout's root is another checkout.
+      dirnames[:] = []
+      continue
+    if dirpath.count(os.sep) - top_depth >= max_depth:
+      dirnames[:] = []
+      continue
+    # Skip hidden directories (.git, caches, ...) and don't follow links.
+    dirnames[:] = [d for d in dirnames
+                   if not d.startswith(".")
+                   and not os.path.islink(os.path.join(dirpath, d))]
+  return found
+
+
+def FindRepoCheckouts(roots, max_depth, jobs):
+  """Find every repo checkout under the given roots in one parallel scan.
+
+  Each root's immediate subdirectories are walked concurrently.
+
+  Args:
+    roots: directories to search.
+    max_depth: how many directory levels below each root to search.
+    jobs: the number of directory trees to walk at once.
+
+  Returns:
+    The sorted list of checkout directories (the parents of .repo).
+
+  """
+  checkouts = set()
+  subtrees = []
+  for root in roots:
+    root = os.path.realpath(os.path.expanduser(root))
+    if os.path.isdir(os.path.join(root, ".repo")):
+      checkouts.add(root)
+      continue
+    if max_depth <= 0 or not os.path.isdir(root):
+      continue
+    for name in os.listdir(root):
+      path = os.path.join(root, name)
+      if (not name.startswith(".") and os.path.isdir(path)
+          and not os.path.islink(path)):
+        subtrees.append(path)
+
+  for found in lldb_utils.RunParallel(
+      lambda path: _ScanForCheckouts(path, max_depth - 1), subtrees, jobs):
+    checkouts.update(found)
+  return sorted(checkouts)
+
+
+def InstallAtomically(src, dest):
+  """Replace dest with a copy of src without dest ever being missing.
+
+  The copy is written to a temp file in dest's directory and renamed
+  over dest, which is atomic on POSIX file systems.
+  """
+  dest_dir = os.path.dirname(dest)
+  fd, temp_path = tempfile.mkstemp(prefix=".git_config.py.", dir=dest_dir)
+  try:
+    with os.fdopen(fd, "wb") as temp_file:
+      with open(src, "rb") as src_file:
+        shutil.copyfileobj(src_file, temp_file)
+    shutil.copymode(dest if os.path.exists(dest) else src, temp_path)
+    os.rename(temp_path, dest)
+  except:
+    os.remove(temp_path)
+    raise
+
+
+def UpdateCheckout(checkout, src, src_digest, check_only):
+  """Bring one checkout's git_config.py up to date.
+
+  Returns:
+    A short status string for the report.
+  """
+  dest = os.path.join(checkout, ".repo", "repo", "git_config.py")
+  if not os.path.exists(dest):
+    return "skipped (no .repo/repo/git_config.py)"
+  try:
+    if lldb_utils.FileDigest(dest) == src_digest:
+      return "up to date"
+    if check_only:
+      return "OUT OF DATE"
+    InstallAtomically(src, dest)
+  except (IOError, OSError) as e:
+    return "FAILED: %s" % e
+  return "installed"
+
+
 def main():
-  # determine .repo directory
-  repo_parent_dir = lldb_utils.FindParentInParentChain(".repo")
-  if not repo_parent_dir:
-    print "Error: no .repo in parent directory chain"
-    exit(1)
+  args = ParseCommandLine()
+  src = os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])),
+                     "support", "git_config.py")
+  src_digest = lldb_utils.FileDigest(src)
 
-  repo_dir = repo_parent_dir + "/.repo/repo"
+  if args.roots:
+    checkouts = FindRepoCheckouts(args.roots, args.max_depth, args.jobs)
+    if not checkouts:
+      print "Error: no repo checkouts found under " + " ".join(args.roots)
+      exit(1)
+  else:
+    # determine .repo directory
+    repo_parent_dir = lldb_utils.FindParentInParentChain(".repo")
+    if not repo_parent_dir:
+      print "Error: no .repo in parent directory chain"
+      exit(1)
+    checkouts = [repo_parent_dir]
 
-  dest = repo_dir + "/git_config.py"
-  src = os.path.dirname(sys.argv[0]) + "/support/git_config.py"
+  results = lldb_utils.RunParallel(
+      lambda checkout: UpdateCheckout(checkout, src, src_digest,
+                                      args.check_only),
+      checkouts, args.jobs)
 
-  if filecmp.cmp(src, dest):
-    print "custom git_config.py already installed in " + dest
-    return
+  failed = False
+  for checkout, result in zip(checkouts, results):
+    print "%-24s %s" % (result, checkout)
+    if result.startswith("FAILED") or result == "OUT OF DATE":
+      failed = True
 
-  print "rm " + dest
-  os.remove(dest)
-  print "cp " + src + " " + dest
-  shutil.copyfile(src, dest)
+  if failed:
+    exit(1)
 
 
 if __name__ == "__main__":
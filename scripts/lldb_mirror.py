@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+"""Keep local bare mirrors of llvm, clang and lldb for all sandboxes.
+
+  lldb_mirror.py init      clone the mirrors and redirect fetches to them
+  lldb_mirror.py update    fetch each upstream once into its mirror
+  lldb_mirror.py serve     update every --interval seconds until killed
+  lldb_mirror.py status    show the mirrors and the redirection
+  lldb_mirror.py uninstall stop redirecting fetches to the mirrors
+
+The mirrors are bare "git clone --mirror" repos under one cache dir
+(default ~/.cache/lldb-mirrors).  init adds to the user's git config
+
+  url.<mirror>.insteadOf = <upstream url>
+  url.<upstream url>.pushInsteadOf = <upstream url>
+
+so every fetch, pull or clone of an upstream url (lldb_pull_rebase.py,
+lldb_git_sync.sh, lldb_clone_all.py, repo sync, which resolves them in
+support/git_config.py) reads from the local mirror, while pushes still
+go upstream.  Sandboxes keep the upstream url as their remote, so
+uninstall is all it takes to go back.
+
+The mirrors themselves fetch from the upstream by an alias url, which
+that redirection doesn't match, and which they rewrite to the upstream
+url with a "git -c" option; the user's other url rewrites, credential
+helpers and proxies all still apply to it.
+
+Fetches are then only as fresh as the mirrors: run serve in the
+background, or update before syncing.  Updates of one mirror are
+serialized with a lock, and update --max-age skips mirrors fetched more
+recently than that, so sandboxes syncing at the same time share one
+network fetch.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import fcntl
+import os
+import subprocess
+import sys
+import time
+
+import lldb_utils
+
+
+REPOS = ("llvm", "clang", "lldb")
+
+_STAMP_FILE = "lldb-mirror-updated"
+_LOCK_FILE = "lldb-mirror.lock"
+
+# the mirrors' remote url, rewritten to the upstream on every fetch
+_UPSTREAM_ALIAS = "lldb-mirror-upstream:"
+
+
+class Mirror(object):
+  """A bare mirror of one upstream repository."""
+
+  def __init__(self, name, url, cache_dir):
+    self.name = name
+    self.url = url
+    self.path = os.path.join(cache_dir, name + ".git")
+
+  def Exists(self):
+    return os.path.isdir(self.path)
+
+  def LastUpdate(self):
+    """Return when the mirror was last fetched, or None."""
+    try:
+      return os.stat(os.path.join(self.path, _STAMP_FILE)).st_mtime
+    except OSError:
+      return None
+
+  def Update(self, max_age=None):
+    """Fetch the upstream into the mirror, cloning it if needed.
+
+    Args:
+      max_age: skip the fetch if the mirror was fetched within this many
+        seconds, e.g. by another sandbox's sync waiting on the same lock.
+
+    Returns:
+      (status, seconds, output); status is None if the fetch was skipped.
+
+    """
+    start = time.time()
+    parent = os.path.dirname(self.path)
+    if not os.path.isdir(parent):
+      os.makedirs(parent)
+    with open(os.path.join(parent, "%s.%s" % (self.name, _LOCK_FILE)),
+              "w") as lock:
+      fcntl.flock(lock, fcntl.LOCK_EX)
+      last = self.LastUpdate()
+      if max_age is not None and last is not None and \
+          time.time() - last < max_age:
+        return None, time.time() - start, ""
+      # The user's insteadOf would redirect a fetch of the upstream url
+      # to the mirror itself, so the mirror fetches the alias instead.
+      # git rewrites a url only once, so the upstream url stays as it is.
+      upstream = ResolveUrl(self.url, os.path.dirname(self.path))
+      command = ["git", "-c", "url.%s.insteadOf=%s" % (upstream,
+                                                       _UPSTREAM_ALIAS)]
+      # decided under the lock: a concurrent update may have just cloned it
+      if not self.Exists():
+        command += ["clone", "-q", "--mirror", _UPSTREAM_ALIAS, self.path]
+        cwd = None
+      else:
+        # mirrors cloned before the alias have the upstream url
+        subprocess.check_call(["git", "config", "remote.origin.url",
+                               _UPSTREAM_ALIAS], cwd=self.path)
+        command += ["fetch", "-q", "--prune", "origin"]
+        cwd = self.path
+      process = subprocess.Popen(command, cwd=cwd,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT)
+      output = process.communicate()[0].decode("utf-8", "replace")
+      if process.returncode == 0:
+        with open(os.path.join(self.path, _STAMP_FILE), "w"):
+          pass
+        os.utime(os.path.join(self.path, _STAMP_FILE), None)
+    return process.returncode, time.time() - start, output.strip()
+
+
+def _GitConfig(args, check=True, scope="--global", cwd=None):
+  command = ["git", "config"] + ([scope] if scope else []) + args
+  process = subprocess.Popen(command, cwd=cwd, stdout=subprocess.PIPE)
+  output = process.communicate()[0].decode("utf-8", "replace")
+  if check and process.returncode != 0:
+    raise subprocess.CalledProcessError(process.returncode, " ".join(command))
+  return output
+
+
+def ResolveUrl(url, cache_dir):
+  """Apply the user's url.<base>.insteadOf rewrites to url, as git would.
+
+  Rewrites to the mirrors in cache_dir are left out.  Like git, this
+  takes the longest matching prefix, and the first one of equal length.
+
+  """
+  best_base, best_prefix = None, ""
+  # all scopes, but not a sandbox's own config
+  for line in _GitConfig(["--get-regexp", r"^url\..*\.insteadof$"],
+                         check=False, scope=None, cwd=cache_dir).splitlines():
+    key, _, prefix = line.partition(" ")
+    base = key[len("url."):-len(".insteadof")]
+    if os.path.dirname(base) == cache_dir:
+      continue
+    if url.startswith(prefix) and len(prefix) > len(best_prefix):
+      best_base, best_prefix = base, prefix
+  if best_base is None:
+    return url
+  return best_base + url[len(best_prefix):]
+
+
+def InstallRedirection(mirrors):
+  """Point fetches of the upstream urls at the mirrors, but not pushes."""
+  for mirror in mirrors:
+    _GitConfig(["--replace-all", "url.%s.insteadOf" % mirror.path,
+                mirror.url])
+    _GitConfig(["--replace-all", "url.%s.pushInsteadOf" % mirror.url,
+                mirror.url])
+
+
+def RemoveRedirection(mirrors):
+  for mirror in mirrors:
+    for key in ("url.%s.insteadOf" % mirror.path,
+                "url.%s.pushInsteadOf" % mirror.url):
+      # exits 5 if the key isn't set
+      _GitConfig(["--unset-all", key], check=False)
+
+
+def UpdateMirrors(mirrors, max_age=None):
+  """Update all mirrors in parallel and print how it went.
+
+  Returns:
+    True if all succeeded.
+
+  """
+  results = lldb_utils.RunParallel(lambda m: m.Update(max_age), mirrors,
+                                   len(mirrors))
+  ok = True
+  for mirror, (status, seconds, output) in zip(mirrors, results):
+    if status is None:
+      state = "fresh, skipped"
+    elif status == 0:
+      state = "updated"
+    else:
+      state = "FAILED: " + output
+      ok = False
+    print("%-6s %6.1fs  %s" % (mirror.name, seconds, state))
+  sys.stdout.flush()
+  return ok
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Keep local mirrors of the lldb repositories.")
+  parser.add_argument(
+      "--cache-dir", action="store", dest="cache_dir",
+      default=os.path.join("~", ".cache", "lldb-mirrors"),
+      help="where the mirrors live (default: %(default)s)")
+  parser.add_argument(
+      "--url-base", action="store", dest="url_base",
+      default="sso://team/lldb/",
+      help="prefix of the upstream urls, as in lldb_clone_all.py "
+           "(default: %(default)s)")
+  parser.add_argument(
+      "--repo", action="append", dest="repos", choices=REPOS,
+      help="a repository to mirror; repeat for more (default: all)")
+  subparsers = parser.add_subparsers(dest="command")
+  subparsers.add_parser("init", help="clone the mirrors, redirect fetches")
+  update = subparsers.add_parser("update", help="fetch into the mirrors")
+  update.add_argument(
+      "--max-age", action="store", dest="max_age", type=float,
+      help="skip mirrors fetched within this many seconds")
+  serve = subparsers.add_parser("serve", help="keep the mirrors updated")
+  serve.add_argument(
+      "--interval", action="store", type=float, default=300,
+      help="seconds between updates (default: 300)")
+  subparsers.add_parser("status", help="show the mirrors")
+  subparsers.add_parser("uninstall", help="stop redirecting fetches")
+  args = parser.parse_args()
+
+  cache_dir = os.path.abspath(os.path.expanduser(args.cache_dir))
+  mirrors = [Mirror(name, args.url_base + name, cache_dir)
+             for name in args.repos or REPOS]
+
+  if args.command == "init":
+    if not UpdateMirrors(mirrors):
+      exit(1)
+    InstallRedirection(mirrors)
+    print("fetches of %s* now read from %s" % (args.url_base, cache_dir))
+  elif args.command == "update":
+    if not UpdateMirrors(mirrors, args.max_age):
+      exit(1)
+  elif args.command == "serve":
+    try:
+      while True:
+        print(time.strftime("%Y-%m-%d %H:%M:%S"))
+        # keep serving through network failures
+        UpdateMirrors(mirrors, args.interval / 2)
+        time.sleep(args.interval)
+    except KeyboardInterrupt:
+      pass
+  elif args.command == "status":
+    redirected = _GitConfig(["--get-regexp", r"^url\..*\.insteadof$"],
+                            check=False)
+    for mirror in mirrors:
+      last = mirror.LastUpdate()
+      print("%-6s %-40s %s%s"
+            % (mirror.name, mirror.path,
+               time.strftime("updated %Y-%m-%d %H:%M", time.localtime(last))
+               if last else "not cloned",
+               ", redirected" if mirror.path in redirected else ""))
+  else:
+    RemoveRedirection(mirrors)
+    print("fetches go upstream again; the mirrors in %s are kept" % cache_dir)
+
+
+if __name__ == "__main__":
+  main()
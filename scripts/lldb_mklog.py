@@ -24,6 +24,8 @@ import re
 import subprocess
 import sys
 
+import lldb_ccache
+
 
 # make $@ 2>&1 | tee make.log
 def main():
@@ -51,6 +53,10 @@ def main():
     print "lldb_configure.py [--cmake]"
     exit(1)
 
+  # compare ccache's counters before and after to report this build's hits
+  ccache_dir = lldb_ccache.BuildCacheDir(os.getcwd())
+  ccache_before = lldb_ccache.Snapshot(ccache_dir)
+
   proc = subprocess.Popen([build_command] + sys.argv[real_arg_start:],
                           bufsize=1,
                           stdout=subprocess.PIPE,
@@ -90,6 +96,7 @@ def main():
     sys.stdout.write(prev_line)
     filtered_logfile.write(prev_line)
   proc.wait()
+  lldb_ccache.ReportBuild(ccache_before, lldb_ccache.Snapshot(ccache_dir))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,132 @@
+"""Read build timing and dependency data from a ninja build directory.
+
+ReadNinjaLog -- Return the duration of each output of the last build.
+CompileTimes -- Return compile durations of objects under a source dir.
+SourceForObject -- Map a cmake object file path back to its source.
+ReadDeps -- Return the headers each object depended on (ninja -t deps).
+PrintTimeComparison -- Print total compile time of two builds.
+
+"""
+
+
+from __future__ import print_function
+
+import os
+import re
+import subprocess
+
+
+# cmake object files look like
+#   tools/lldb/source/Core/CMakeFiles/lldbCore.dir/Address.cpp.o
+_OBJECT_RE = re.compile(r"^(?P<dir>.*?)/CMakeFiles/[^/]+\.dir/(?P<src>.+)\.o$")
+
+
+def ReadNinjaLog(build_dir):
+  """Return how long each output took in the most recent build.
+
+  .ninja_log accumulates entries over many builds; the last entry for an
+  output wins.
+
+  Args:
+    build_dir: the ninja build directory.
+
+  Returns:
+    A dict of output path (relative to build_dir) to seconds.
+
+  """
+  durations = {}
+  with open(os.path.join(build_dir, ".ninja_log")) as log:
+    for line in log:
+      if line.startswith("#"):
+        continue
+      fields = line.rstrip("\n").split("\t")
+      if len(fields) < 4:
+        continue
+      start_ms, end_ms, output = int(fields[0]), int(fields[1]), fields[3]
+      durations[output] = (end_ms - start_ms) / 1000.0
+  return durations
+
+
+def SourceForObject(output):
+  """Map a cmake object file to (source dir, source file), or None.
+
+  Both are relative to the top of the source tree, e.g.
+  ("tools/lldb/source/Core", "tools/lldb/source/Core/Address.cpp").
+  """
+  match = _OBJECT_RE.match(output)
+  if not match:
+    return None
+  source_dir = match.group("dir")
+  return source_dir, os.path.join(source_dir, match.group("src"))
+
+
+def CompileTimes(build_dir, prefix="tools/lldb/"):
+  """Return the compile time of each object whose source is under prefix.
+
+  Args:
+    build_dir: the ninja build directory.
+    prefix: only sources whose path (relative to llvm) starts with this.
+
+  Returns:
+    A dict of source dir to a dict of source file to seconds.
+
+  """
+  times = {}
+  for output, seconds in ReadNinjaLog(build_dir).items():
+    source = SourceForObject(output)
+    if source and source[1].startswith(prefix):
+      times.setdefault(source[0], {})[source[1]] = seconds
+  return times
+
+
+def ReadDeps(build_dir, prefix="tools/lldb/"):
+  """Return the headers each object under prefix included.
+
+  Uses the dependency information ninja recorded from the compiler
+  (ninja -t deps), so the build must have been run at least once.
+
+  Returns:
+    A dict of object output path to a list of header paths.
+
+  """
+  output = subprocess.check_output(["ninja", "-C", build_dir, "-t", "deps"])
+  deps = {}
+  current = None
+  for line in output.decode("utf-8", "replace").splitlines():
+    if not line.strip():
+      current = None
+    elif not line[0].isspace():
+      target = line.split(":", 1)[0]
+      source = SourceForObject(target)
+      if source and source[1].startswith(prefix):
+        current = deps.setdefault(target, [])
+      else:
+        current = None
+    elif current is not None:
+      current.append(line.strip())
+  return deps
+
+
+def PrintTimeComparison(label, baseline_times, new_times, new_overhead=0.0):
+  """Print the total compile time of two builds and the difference.
+
+  The times are whole compiles as .ninja_log records them, frontend and
+  backend alike.
+
+  Args:
+    label: what the new build does differently, e.g. "unity".
+    baseline_times: CompileTimes() of the baseline build.
+    new_times: CompileTimes() of the new build.
+    new_overhead: seconds the new build spent on work of its own that
+      should count against it, e.g. building precompiled headers.
+
+  """
+  baseline = sum(sum(t.values()) for t in baseline_times.values())
+  new = sum(sum(t.values()) for t in new_times.values()) + new_overhead
+  print("total compile time, baseline: %8.1f s (%d objects)"
+        % (baseline, sum(len(t) for t in baseline_times.values())))
+  print("total compile time, %-9s %8.1f s (%d objects)"
+        % (label + ":", new, sum(len(t) for t in new_times.values())))
+  if baseline:
+    print("total compile time saved: %.1f s (%.1f%%)"
+          % (baseline - new, 100.0 * (baseline - new) / baseline))
@@ -11,9 +11,18 @@ import select
 import sys
 import subprocess
 
+import lldb_profiles
+
 _COMMON_SYNC_OPTS = "-avzhe ssh --delete"
 _COMMON_EXCLUDE_OPTS = "--exclude=DerivedData --exclude=.svn --exclude=.git --exclude=llvm-build/Release+Asserts"
 
+# The configure profile (see lldb_profiles.py) used for each configuration
+# unless --profile says otherwise.
+_CONFIGURATION_PROFILES = {
+    "debug": "debug",
+    "release": "release",
+}
+
 def normalize_configuration(config_text):
     if not config_text:
         return "debug"
@@ -44,6 +53,10 @@ def parse_args():
         "--local-lldb-dir", "-l", metavar="DIR",
         help="specify local lldb directory (Xcode layout assumed for llvm/clang)",
         default=os.getcwd())
+    parser.add_argument(
+        "--profile", "-p",
+        choices=lldb_profiles.ProfileNames(),
+        help="configure profile to build with (default: by configuration)")
     parser.add_argument(
         "--remote-address", "-r", metavar="REMOTE-ADDR",
         help="specify the dns name or ip address of the remote linux system",
@@ -85,6 +98,8 @@ def init_with_args(args):
     args.remote_build_dir = os.path.join(
         args.remote_dir,
         "build-%s" % args.configuration)
+    if not args.profile:
+        args.profile = _CONFIGURATION_PROFILES[args.configuration]
 
     # We assume the local lldb directory is really named 'lldb'.
     # This is because on the remote end, the local lldb root dir
@@ -141,21 +156,13 @@ def maybe_configure(args):
         "cd", args.remote_dir, "&&",
         "touch", "llvm/.git", "&&",
         "lldb_configure.py",
-        "-a", # enable assertions
         "-b", args.remote_build_dir, # use this build dir
-        "-c", # use cmake
-        "-g", # use gold linker
-        "-l", # use clang
-        "-n", # use ninja
-        "-s", # generate debug symbols
+        "--profile", args.profile, # everything else comes from the profile
         ]
 
     if args.use_ccache:
         commandline.append("--ccache")
 
-    if args.configuration == 'release':
-        commandline.append('--release')
-
     return subprocess.call(commandline)
 
 
@@ -220,6 +227,10 @@ def run_remote_build_command(args, build_command_list):
 
 
 def build(args):
+    if args.use_ccache:
+        # Report the remote ccache hit rate along with the build.
+        return run_remote_build_command(
+            args, ["time", "lldb_ccache.py", "ninja"])
     return run_remote_build_command(args, ["time", "ninja"])
 
 
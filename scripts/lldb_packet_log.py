@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+
+"""Decode gdb-remote packet logs written by lldb and llgs.
+
+llgs_setenv.sh has llgs log every packet it sends and reads
+(log enable ... gdb-remote packets).  Each log line has the packet's
+size on the wire and the packet as sent, e.g.
+
+  1415823112.123456789 <  19> send packet: $qSupported#37
+
+or, for packets that were compressed on the wire, the compressed size
+and the size of the logged, decompressed packet:
+
+  1415823112.123456789 <  40:212> read packet: $...#5c
+
+This module streams a whole log (memory mapped, so multi-gigabyte logs
+are fine), frames each packet by its logged size, verifies its checksum,
+and undoes the }-escaping and *-run-length encoding of its payload.
+Everything works on whole byte strings (re, split, bytes.translate and
+zlib.adler32 for checksums) rather than looping per character.  Time
+stamps and checksums cost as much as framing the packets does, so
+callers that don't need them can leave them out.
+
+ReadPackets -- Yield a Packet for every packet in a log.
+DecodePayload -- Undo escaping and run-length encoding of a payload.
+Checksum -- Return the gdb-remote checksum of raw payload bytes.
+
+Usage:
+  lldb_packet_log.py decode LOG        print packets as JSON lines
+  lldb_packet_log.py stats LOG         count packets and check checksums
+  lldb_packet_log.py decode-packet PAYLOAD
+                                       decode one payload (no $ or #cs)
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import json
+import mmap
+import re
+import sys
+import time
+import zlib
+
+
+# "<  19> send packet: " or "<  40:212> read packet: ".  The pattern
+# starts with a literal, so finditer scans the whole log for headers in C,
+# several times faster than a find per packet from Python.
+_HEADER_RE = re.compile(br"< *(\d+)(?::(\d+))?> (send|read) packet: ")
+# the start of the line before the header, with the optional sequence
+# number and time stamp (log enable -s -T)
+_TIME_RE = re.compile(br"(?:\d+ )?(\d+\.\d+) ")
+
+# kinds of the packets that are just one byte
+_SINGLE_BYTE_KINDS = {b"+": "ack", b"-": "nak", b"\x03": "interrupt"}
+
+# byte ^ 0x20, for undoing } escapes
+_UNESCAPE = bytes(bytearray(b ^ 0x20 for b in range(256)))
+
+# The low half of an adler32 is 1 + the sum of the bytes mod 65521, so it
+# is the exact sum for up to 256 bytes (256 * 255 < 65521).
+_ADLER_CHUNK = 256
+
+
+class Packet(object):
+  """One packet of a log.
+
+  Attributes:
+    offset: where the log line starts in the log file.
+    time: the log's time stamp for the packet (seconds), or None if the
+      log wasn't written with time stamps (log enable -T) or they
+      weren't asked for.
+    direction: "send" or "read", from the logging side's point of view.
+    kind: "packet" ($), "notify" (%), "ack" (+), "nak" (-), "interrupt"
+      (0x03) or "unknown" (anything else, e.g. line noise).
+    wire_size: the size of the packet on the wire (compressed, for
+      compressed packets).
+    raw: the payload as logged, between $ and #; empty for acks, naks
+      and interrupts, and what was logged for unknown packets.
+    checksum_ok: whether the checksum matched (True for the packets
+      without a checksum), or None if checksums weren't asked for.
+
+  """
+
+  __slots__ = ("offset", "time", "direction", "kind", "wire_size", "raw",
+               "checksum_ok")
+
+  def __init__(self, offset, time_stamp, direction, kind, wire_size, raw,
+               checksum_ok):
+    self.offset = offset
+    self.time = time_stamp
+    self.direction = direction
+    self.kind = kind
+    self.wire_size = wire_size
+    self.raw = raw
+    self.checksum_ok = checksum_ok
+
+  def Payload(self):
+    """Return the decoded payload."""
+    return DecodePayload(self.raw)
+
+  def ToJson(self, with_payload=True):
+    record = {"offset": self.offset, "time": self.time,
+              "direction": self.direction, "kind": self.kind,
+              "wire_size": self.wire_size, "checksum_ok": self.checksum_ok}
+    if with_payload:
+      # latin-1 maps every byte to one character, so nothing is lost
+      record["payload"] = self.Payload().decode("latin-1")
+    return record
+
+
+def Checksum(raw):
+  """Return the gdb-remote checksum (sum of bytes mod 256) of raw."""
+  if len(raw) <= _ADLER_CHUNK:
+    return ((zlib.adler32(raw) & 0xffff) - 1) & 0xff
+  total = 0
+  for i in range(0, len(raw), _ADLER_CHUNK):
+    total += (zlib.adler32(raw[i:i + _ADLER_CHUNK]) & 0xffff) - 1
+  return total & 0xff
+
+
+def DecodePayload(raw):
+  """Undo the run-length encoding and }-escaping of a packet payload.
+
+  Args:
+    raw: the payload bytes between $ and #.
+
+  Returns:
+    The decoded bytes.
+
+  """
+  if b"*" in raw:
+    # A run is a character, "*" and a count character (count + 29) of
+    # extra copies.  Runs are expanded before unescaping, repeating the
+    # escaped form of the character, so escaped characters can be
+    # repeated too and a "}" count isn't taken for an escape.
+    parts = raw.split(b"*")
+    expanded = [parts[0]]
+    previous = parts[0]
+    i = 1
+    while i < len(parts):
+      part = parts[i]
+      if part:
+        count, text = part[:1], part[1:]
+      else:
+        # "**": the count character is itself a "*"
+        i += 1
+        count, text = b"*", parts[i] if i < len(parts) else b""
+      token = previous[-2:] if previous[-2:-1] == b"}" else previous[-1:]
+      expanded.append(token * (ord(count) - 29))
+      expanded.append(text)
+      previous = text or token
+      i += 1
+    raw = b"".join(expanded)
+  if b"}" not in raw:
+    return raw
+  parts = raw.split(b"}")
+  return parts[0] + b"".join(part[:1].translate(_UNESCAPE) + part[1:]
+                             for part in parts[1:])
+
+
+def ReadPackets(path, times=True, checksums=True):
+  """Yield every packet logged in a packet log, in log order.
+
+  Args:
+    path: the log file.
+    times: whether to read the packets' time stamps.
+    checksums: whether to verify the packets' checksums.
+
+  Yields:
+    Packet objects.
+
+  """
+  with open(path, "rb") as f:
+    try:
+      data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+      # empty file
+      return
+    try:
+      find = data.find
+      rfind = data.rfind
+      match_time = _TIME_RE.match
+      end = 0
+      for match in _HEADER_RE.finditer(data):
+        header, start = match.span()
+        if header < end:
+          # "packet: " inside the previous packet
+          continue
+        line_start = rfind(b"\n", end, header) + 1 or end
+        wire_size, logged_size, direction = match.groups()
+        wire_size = int(wire_size)
+        end = start + (int(logged_size) if logged_size else wire_size)
+        first = data[start:start + 1]
+        if first == b"$" or first == b"%":
+          checksum_at = end - 3
+          # The size frames binary packets exactly; if it doesn't look
+          # right (e.g. a truncated log) fall back to the end of the line.
+          if data[checksum_at:checksum_at + 1] != b"#":
+            end = find(b"\n", start)
+            if end < 0:
+              end = len(data)
+            checksum_at = rfind(b"#", start, end)
+          kind = "packet" if first == b"$" else "notify"
+          raw = data[start + 1:checksum_at] if checksum_at > start else b""
+          checksum_ok = None
+          if checksums:
+            try:
+              checksum_ok = (checksum_at > start and
+                             int(data[checksum_at + 1:checksum_at + 3], 16)
+                             == Checksum(raw))
+            except ValueError:
+              checksum_ok = False
+        else:
+          wire = data[start:end]
+          kind = _SINGLE_BYTE_KINDS.get(wire, "unknown")
+          raw = b"" if kind != "unknown" else wire
+          checksum_ok = True if checksums else None
+        time_stamp = None
+        if times:
+          time_match = match_time(data, line_start, header)
+          if time_match:
+            time_stamp = float(time_match.group(1))
+        yield Packet(line_start, time_stamp,
+                     "send" if direction == b"send" else "read", kind,
+                     wire_size, raw, checksum_ok)
+    finally:
+      data.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Decode lldb/llgs gdb-remote packet logs.")
+  subparsers = parser.add_subparsers(dest="command")
+  decode = subparsers.add_parser("decode", help="print packets as JSON lines")
+  decode.add_argument("log")
+  decode.add_argument(
+      "--no-payload", action="store_false", dest="with_payload",
+      help="leave the decoded payloads out")
+  stats = subparsers.add_parser(
+      "stats", help="count packets and check their checksums")
+  stats.add_argument("log")
+  packet = subparsers.add_parser("decode-packet",
+                                 help="decode one payload given as argument")
+  packet.add_argument("payload")
+  args = parser.parse_args()
+
+  if args.command == "decode-packet":
+    raw = args.payload.encode("latin-1")
+    decoded = DecodePayload(raw)
+    print("Input length %d" % len(raw))
+    print("Output length %d" % len(decoded))
+    print(decoded.decode("latin-1"))
+  elif args.command == "decode":
+    out = sys.stdout
+    for p in ReadPackets(args.log):
+      out.write(json.dumps(p.ToJson(args.with_payload)) + "\n")
+  else:
+    start = time.time()
+    counts = {}
+    bad = []
+    wire_bytes = 0
+    decoded_bytes = 0
+    for p in ReadPackets(args.log, times=False):
+      counts[p.kind] = counts.get(p.kind, 0) + 1
+      wire_bytes += p.wire_size
+      decoded_bytes += len(p.Payload())
+      if not p.checksum_ok:
+        bad.append(p.offset)
+    elapsed = time.time() - start
+    for kind in sorted(counts):
+      print("%-9s %10d" % (kind, counts[kind]))
+    print("bytes on the wire %d, decoded payload bytes %d"
+          % (wire_bytes, decoded_bytes))
+    print("bad checksums: %d%s" % (len(bad), (" (first at offset %d)" % bad[0])
+                                   if bad else ""))
+    print("decoded in %.2fs" % elapsed)
+
+
+if __name__ == "__main__":
+  main()
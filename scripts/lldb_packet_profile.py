@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+"""Find where a lldb <-> llgs session spends its round trips.
+
+Reads a gdb-remote packet log (see lldb_packet_log.py; llgs_setenv.sh
+writes one with time stamps), pairs each request with its response and
+reports:
+
+  packet types  per request type (m, p, qXfer, vCont, ...): round trips,
+                latency total/median/p90/max, a latency histogram, bytes
+                on the wire and how much run-length encoding saved.
+  chatty runs   consecutive requests of one type that could have been a
+                single request: runs of m/x memory reads (contiguous ones
+                could be one bigger read) and of p register reads (one g,
+                or registers expedited in the stop reply, would do).
+  acks          ack bytes and round trips, if the session never switched
+                to QStartNoAckMode.
+
+Runs are ranked by the time the extra round trips took, or by their
+number for logs without time stamps.
+
+The log is read from the logging side's point of view: for llgs's log
+(the default) requests are "read" and responses "send" packets; use
+--side lldb for a log written by lldb itself.
+
+See lldb_packet_profile.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import sys
+
+import lldb_packet_log
+
+
+# upper bounds of the latency histogram buckets, in seconds
+_BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0, float("inf"))
+_BUCKET_NAMES = ("<10us", "<100us", "<1ms", "<10ms", "<100ms", "<1s", ">=1s")
+
+# request types that read memory or registers one at a time
+_MEMORY_READS = ("m", "x")
+_REGISTER_READS = ("p",)
+
+
+class RoundTrip(object):
+  """A request and its response (None if it got none)."""
+
+  __slots__ = ("request", "response", "kind")
+
+  def __init__(self, request, response, kind):
+    self.request = request
+    self.response = response
+    self.kind = kind
+
+  def Latency(self):
+    """Return the seconds until the response, or None if unknown."""
+    if (self.response is None or self.request.time is None or
+        self.response.time is None):
+      return None
+    return self.response.time - self.request.time
+
+
+class TypeStats(object):
+  """Round trip statistics of one request type."""
+
+  def __init__(self, kind):
+    self.kind = kind
+    self.count = 0
+    self.unanswered = 0
+    self.latencies = []
+    self.wire_bytes = 0
+    self.raw_bytes = 0
+    self.decoded_bytes = 0
+
+  def Add(self, trip):
+    self.count += 1
+    for packet in (trip.request, trip.response):
+      if packet is not None:
+        self.wire_bytes += packet.wire_size
+        self.raw_bytes += len(packet.raw)
+        self.decoded_bytes += len(packet.Payload())
+    if trip.response is None:
+      self.unanswered += 1
+    latency = trip.Latency()
+    if latency is not None:
+      self.latencies.append(latency)
+
+  def Total(self):
+    return sum(self.latencies)
+
+  def Percentile(self, fraction):
+    if not self.latencies:
+      return None
+    latencies = sorted(self.latencies)
+    return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))]
+
+  def Histogram(self):
+    counts = [0] * len(_BUCKETS)
+    for latency in self.latencies:
+      for i, bound in enumerate(_BUCKETS):
+        if latency < bound:
+          counts[i] += 1
+          break
+    return counts
+
+
+def RequestType(raw):
+  """Return the type of a request payload, e.g. "m", "Z0" or "qXfer".
+
+  Single letter commands are their letter (Z/z with the breakpoint
+  type); q, Q, v, j and _ commands are named up to the first separator.
+
+  """
+  first = raw[:1]
+  if first in (b"Z", b"z"):
+    name = raw[:2]
+  elif first in (b"q", b"Q", b"v", b"j", b"_"):
+    name = raw
+    for separator in (b":", b";", b",", b"?"):
+      index = name.find(separator, 1)
+      if index > 0:
+        name = name[:index]
+    # _m and _M take an address right after the letter
+    if first == b"_":
+      name = name[:2]
+    name = name[:32]
+  else:
+    name = first
+  return name.decode("latin-1")
+
+
+def PairRoundTrips(packets, side="llgs"):
+  """Pair requests with their responses.
+
+  gdb-remote allows one outstanding request, so a response answers the
+  last request; a request followed by another request got no response
+  (e.g. a vCont whose stop reply only comes later, or k).
+
+  Args:
+    packets: lldb_packet_log.Packet objects in log order.
+    side: "llgs" or "lldb", which side wrote the log.
+
+  Returns:
+    (list of RoundTrip, ack packet count, ack bytes).
+
+  """
+  request_direction = "read" if side == "llgs" else "send"
+  trips = []
+  pending = None
+  acks = 0
+  ack_bytes = 0
+  for packet in packets:
+    if packet.kind in ("ack", "nak"):
+      acks += 1
+      ack_bytes += packet.wire_size
+      continue
+    if packet.kind != "packet":
+      # async notifications aren't answers
+      continue
+    if packet.direction == request_direction:
+      if pending is not None:
+        trips.append(RoundTrip(pending, None, RequestType(pending.raw)))
+      pending = packet
+    elif pending is not None:
+      trips.append(RoundTrip(pending, packet, RequestType(pending.raw)))
+      pending = None
+  if pending is not None:
+    trips.append(RoundTrip(pending, None, RequestType(pending.raw)))
+  return trips, acks, ack_bytes
+
+
+def _MemoryRange(raw):
+  """Return (address, length) of an m/x request, or None."""
+  try:
+    address, length = raw[1:].split(b",", 1)
+    return int(address, 16), int(length, 16)
+  except ValueError:
+    return None
+
+
+def FindChattyRuns(trips, min_run=4):
+  """Find runs of single reads that one request could have done.
+
+  Args:
+    trips: RoundTrips in log order.
+    min_run: the shortest run to report.
+
+  Returns:
+    A list of dicts with the run's kind, first trip index, length, the
+    seconds its round trips took (None without time stamps), whether the
+    reads were contiguous (memory reads only) and a suggestion.
+
+  """
+  runs = []
+  start = 0
+  while start < len(trips):
+    kind = trips[start].kind
+    end = start + 1
+    while end < len(trips) and trips[end].kind == kind:
+      end += 1
+    if (end - start >= min_run and
+        kind in _MEMORY_READS + _REGISTER_READS):
+      run = trips[start:end]
+      latencies = [t.Latency() for t in run]
+      seconds = (sum(latencies) if None not in latencies else None)
+      run_info = {"kind": kind, "index": start, "length": len(run),
+                  "seconds": seconds, "contiguous": False}
+      if kind in _MEMORY_READS:
+        ranges = [_MemoryRange(t.request.raw) for t in run]
+        run_info["contiguous"] = None not in ranges and all(
+            ranges[i][0] + ranges[i][1] == ranges[i + 1][0]
+            for i in range(len(ranges) - 1))
+        if run_info["contiguous"]:
+          total = sum(length for _, length in ranges)
+          run_info["suggestion"] = "one %s read of 0x%x bytes at 0x%x" % (
+              kind, total, ranges[0][0])
+        else:
+          run_info["suggestion"] = "batch or cache the reads (e.g. read " \
+                                   "ahead a whole page)"
+      else:
+        run_info["suggestion"] = "read all registers with g, or have them " \
+                                 "expedited in the stop reply"
+      runs.append(run_info)
+    start = end
+  return runs
+
+
+def _Saved(run):
+  """Return what ranks a chatty run: the time or number of extra trips."""
+  if run["seconds"] is not None:
+    return run["seconds"] * (run["length"] - 1) / run["length"]
+  return run["length"] - 1
+
+
+def _Ms(seconds):
+  return "%10.3f" % (seconds * 1000.0) if seconds is not None else \
+      "%10s" % "-"
+
+
+def PrintReport(trips, acks, ack_bytes, min_run=4, top=20, out=sys.stdout):
+  """Print the ranked round trip report."""
+  stats = {}
+  for trip in trips:
+    stats.setdefault(trip.kind, TypeStats(trip.kind)).Add(trip)
+  timed = any(s.latencies for s in stats.values())
+  if timed:
+    ranked = sorted(stats.values(), key=lambda s: -s.Total())
+  else:
+    out.write("no time stamps in the log (log enable -T); ranking by "
+              "round trips\n\n")
+    ranked = sorted(stats.values(), key=lambda s: -s.count)
+
+  out.write("%-16s %8s %10s %10s %10s %10s %12s %6s\n"
+            % ("type", "trips", "total ms", "median ms", "p90 ms",
+               "max ms", "wire bytes", "rle"))
+  for s in ranked[:top]:
+    out.write("%-16s %8d %s %s %s %s %12d %5.2fx\n"
+              % (s.kind, s.count, _Ms(s.Total() if s.latencies else None),
+                 _Ms(s.Percentile(0.5)), _Ms(s.Percentile(0.9)),
+                 _Ms(max(s.latencies) if s.latencies else None),
+                 s.wire_bytes,
+                 float(s.decoded_bytes) / s.raw_bytes if s.raw_bytes else 1.0))
+
+  if timed:
+    out.write("\nlatency histogram (round trips)\n")
+    out.write("%-16s" % "type" +
+              "".join("%8s" % name for name in _BUCKET_NAMES) + "\n")
+    for s in ranked[:top]:
+      out.write("%-16s" % s.kind +
+                "".join("%8d" % n for n in s.Histogram()) + "\n")
+
+  runs = FindChattyRuns(trips, min_run)
+  runs.sort(key=lambda r: -_Saved(r))
+  out.write("\n%d chatty runs of %d or more single reads" % (len(runs),
+                                                           min_run))
+  if runs:
+    extra = sum(r["length"] - 1 for r in runs)
+    out.write("; batching would save %d round trips" % extra)
+    if timed:
+      out.write(" (~%.1f ms)" % (1000.0 * sum(_Saved(r) for r in runs)))
+  out.write("\n")
+  for r in runs[:top]:
+    first = trips[r["index"]].request
+    out.write("  %-3s x%-5d %s  at log offset %-10d %s\n"
+              % (r["kind"], r["length"], _Ms(r["seconds"]), first.offset,
+                 r["suggestion"]))
+
+  if acks:
+    out.write("\n%d acks (%d bytes): the session didn't use "
+              "QStartNoAckMode\n" % (acks, ack_bytes))
+  unanswered = sum(s.unanswered for s in stats.values())
+  if unanswered:
+    out.write("%d requests without a response (continues, kills or a "
+              "truncated log) are counted without latency\n" % unanswered)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Rank the round trips of a gdb-remote packet log.")
+  parser.add_argument("log", help="packet log (log enable -T ... packets)")
+  parser.add_argument(
+      "--side", choices=("llgs", "lldb"), default="llgs",
+      help="which side wrote the log (default: llgs)")
+  parser.add_argument(
+      "--min-run", action="store", dest="min_run", type=int, default=4,
+      help="shortest run of single reads to report (default: 4)")
+  parser.add_argument(
+      "--top", action="store", type=int, default=20,
+      help="lines per section (default: 20)")
+  args = parser.parse_args()
+
+  trips, acks, ack_bytes = PairRoundTrips(
+      lldb_packet_log.ReadPackets(args.log, checksums=False), args.side)
+  if not trips:
+    print("Error: no packets in " + args.log)
+    exit(1)
+  PrintReport(trips, acks, ack_bytes, args.min_run, args.top)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+"""Replay a recorded llgs session to lldb, for offline benchmarks.
+
+Serves a gdb-remote packet log recorded on the llgs side (see
+llgs_setenv.sh) on a loopback port and answers lldb's requests from the
+recording, so protocol-heavy operations (attach, backtraces, memory
+reads) can be timed repeatably without a device or an emulator:
+
+  lldb_packet_replay.py /tmp/llgs_packets.log --port 4567 &
+  time lldb -b -o "gdb-remote 127.0.0.1:4567" -o "bt all"
+
+A request gets the response recorded for the same request, the recorded
+responses of a repeated request being played in turn (the last one again
+once they run out).  Interrupts (0x03) likewise get the stop replies
+recorded after interrupts.  Requests the recording doesn't have get an empty
+("unsupported") response and are listed when the connection closes.  As
+lldb's requests follow from the server's answers, replaying the same
+commands as the recording asks nearly only recorded requests.
+
+Latency can be injected per response: a fixed --latency, and/or the
+recorded latency scaled by --recorded-latency.
+
+See lldb_packet_replay.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import collections
+import random
+import socket
+import sys
+import time
+
+import lldb_packet_log
+import lldb_packet_profile
+
+
+_INTERRUPT = b"\x03"
+
+
+def InterruptReplies(packets):
+  """Return the stop replies llgs sent after each interrupt it read.
+
+  Returns:
+    A list of (response payload, recorded latency), in recorded order.
+
+  """
+  replies = []
+  interrupt = None
+  for packet in packets:
+    if packet.kind == "interrupt" and packet.direction == "read":
+      interrupt = packet
+    elif (interrupt is not None and packet.kind == "packet" and
+          packet.direction == "send"):
+      latency = None
+      if interrupt.time is not None and packet.time is not None:
+        latency = packet.time - interrupt.time
+      replies.append((packet.raw, latency))
+      interrupt = None
+  return replies
+
+
+class Recording(object):
+  """The recorded responses of a session, by request payload."""
+
+  def __init__(self, trips, interrupt_replies=()):
+    self.responses = collections.defaultdict(list)
+    if interrupt_replies:
+      self.responses[_INTERRUPT] = list(interrupt_replies)
+    self.stop_replies = []
+    for trip in trips:
+      if trip.response is None:
+        continue
+      self.responses[trip.request.raw].append(
+          (trip.response.raw, trip.Latency()))
+      if trip.response.raw[:1] in (b"T", b"S", b"W", b"X"):
+        self.stop_replies.append((trip.response.raw, trip.Latency()))
+    self.Reset()
+
+  def Reset(self):
+    """Start a new session: play every request's responses from the top."""
+    self._next = collections.defaultdict(int)
+
+  def Answer(self, request):
+    """Return (response payload, recorded latency) or None if unknown."""
+    if request == _INTERRUPT and not self.responses.get(request):
+      # no interrupt recorded: answer with the last recorded stop reply
+      return self.stop_replies[-1] if self.stop_replies else None
+    responses = self.responses.get(request)
+    if not responses:
+      return None
+    index = self._next[request]
+    self._next[request] = index + 1
+    return responses[min(index, len(responses) - 1)]
+
+
+def _Frame(payload):
+  return b"$" + payload + b"#" + (
+      "%02x" % lldb_packet_log.Checksum(payload)).encode("ascii")
+
+
+def _SplitPackets(buffer):
+  """Take the complete packets off the front of what was received.
+
+  Returns:
+    (list of packets, the incomplete rest).  Packets are payloads, or
+    b"+", b"-" and _INTERRUPT.
+
+  """
+  packets = []
+  position = 0
+  while position < len(buffer):
+    first = buffer[position:position + 1]
+    if first in (b"+", b"-", _INTERRUPT):
+      packets.append(first)
+      position += 1
+      continue
+    if first != b"$":
+      # line noise
+      position += 1
+      continue
+    end = buffer.find(b"#", position + 1)
+    while end > 0:
+      # a "#" after an odd number of "}" is escaped binary data
+      escapes = end - position - 1 - len(buffer[position + 1:end].rstrip(b"}"))
+      if escapes % 2 == 0:
+        break
+      end = buffer.find(b"#", end + 1)
+    if end < 0 or end + 3 > len(buffer):
+      break
+    packets.append(buffer[position + 1:end])
+    position = end + 3
+  return packets, buffer[position:]
+
+
+def Serve(connection, recording, args, log=sys.stdout):
+  """Answer one lldb connection until it closes.
+
+  Returns:
+    A dict of unknown request to the number of times it was asked.
+
+  """
+  recording.Reset()
+  acking = True
+  unknown = collections.Counter()
+  buffer = b""
+  while True:
+    data = connection.recv(65536)
+    if not data:
+      return unknown
+    packets, buffer = _SplitPackets(buffer + data)
+    for request in packets:
+      if request in (b"+", b"-"):
+        continue
+      answer = recording.Answer(request)
+      if answer is None:
+        unknown[request] += 1
+        response, recorded = b"", None
+      else:
+        response, recorded = answer
+      delay = args.latency / 1000.0
+      if recorded is not None:
+        delay += recorded * args.recorded_latency
+      if args.jitter:
+        delay += random.uniform(0, args.jitter / 1000.0)
+      if delay > 0:
+        time.sleep(delay)
+      reply = _Frame(response)
+      if acking and request != _INTERRUPT:
+        reply = b"+" + reply
+      connection.sendall(reply)
+      if request == b"QStartNoAckMode" and response == b"OK":
+        acking = False
+      if args.verbose:
+        log.write("%r -> %r\n" % (request[:60], response[:60]))
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Replay a recorded llgs session to lldb.")
+  parser.add_argument("log", help="llgs packet log (llgs_setenv.sh)")
+  parser.add_argument(
+      "-p", "--port", action="store", type=int, default=0,
+      help="loopback port to listen on (default: any free port)")
+  parser.add_argument(
+      "--latency", action="store", type=float, default=0.0,
+      help="milliseconds to delay every response by (default: 0)")
+  parser.add_argument(
+      "--recorded-latency", action="store", dest="recorded_latency",
+      type=float, default=0.0,
+      help=("also delay responses by their recorded latency times this "
+            "factor, e.g. 1 to replay the device's timing (default: 0)"))
+  parser.add_argument(
+      "--jitter", action="store", type=float, default=0.0,
+      help="random extra milliseconds per response, up to this (default: 0)")
+  parser.add_argument(
+      "--once", action="store_true",
+      help="exit after the first connection closes")
+  parser.add_argument(
+      "-v", "--verbose", action="store_true",
+      help="print every request and response")
+  args = parser.parse_args()
+
+  packets = list(lldb_packet_log.ReadPackets(args.log, checksums=False))
+  trips, _, _ = lldb_packet_profile.PairRoundTrips(packets, "llgs")
+  recording = Recording(trips, InterruptReplies(packets))
+  if not recording.responses:
+    print("Error: no request/response pairs in " + args.log)
+    exit(1)
+  if args.recorded_latency and not any(
+      latency is not None for responses in recording.responses.values()
+      for _, latency in responses):
+    print("Warning: the log has no time stamps (log enable -T); "
+          "--recorded-latency has no effect.")
+
+  server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+  server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  server.bind(("127.0.0.1", args.port))
+  server.listen(1)
+  print("replaying %d distinct requests on 127.0.0.1:%d"
+        % (len(recording.responses), server.getsockname()[1]))
+  sys.stdout.flush()
+  try:
+    while True:
+      connection, _ = server.accept()
+      connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+      start = time.time()
+      try:
+        unknown = Serve(connection, recording, args)
+      except socket.error as e:
+        print("connection error: %s" % e)
+        unknown = collections.Counter()
+      finally:
+        connection.close()
+      print("session closed after %.2fs, %d requests not in the recording"
+            % (time.time() - start, sum(unknown.values())))
+      for request, count in unknown.most_common(20):
+        print("  %5d  %r" % (count, request[:80]))
+      sys.stdout.flush()
+      if args.once:
+        break
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.close()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+
+"""Precompiled header support for lldb's libraries.
+
+lldb_configure.py --pch uses this to give each lldb library a
+precompiled header made of the llvm, clang and C++ library headers that
+most of its sources include.  Include frequency is taken from the
+header dependencies an earlier build of the same tree recorded in ninja
+(ninja -t deps); headers of lldb itself are left out, as they change too
+often for a PCH to stay valid.
+
+Usage:
+  lldb_pch.py plan BASELINE_BUILD_DIR
+      print the headers chosen for each library directory.
+  lldb_pch.py report BASELINE_BUILD_DIR PCH_BUILD_DIR
+      compare the total lldb compile time of the two builds, counting
+      the time spent building the PCHs themselves.
+
+A PCH only saves frontend time, but report compares total compile times,
+as .ninja_log has no finer timing; in an unoptimized build they are
+mostly frontend time.  Precompiled headers need cmake 3.16 or newer,
+and the hook that sets them up 3.19.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import os
+import re
+
+import lldb_ninja
+
+
+# The hook runs its code with cmake_language(DEFER).
+CMAKE_MIN_VERSION = (3, 19)
+
+# A header goes in a library's PCH if at least this share of the
+# library's sources include it, up to this many headers.
+_MIN_SHARE = 0.6
+_MAX_HEADERS = 60
+
+# Libraries with fewer sources than this don't get a PCH.
+_MIN_SOURCES = 4
+
+_LLDB_PREFIX = "tools/lldb/"
+
+# llvm/clang headers, named as they are included.
+_PROJECT_HEADER_RE = re.compile(
+    r"/include/((?:llvm|clang|llvm-c|clang-c)/[^.]+\.h)$")
+
+# C++ standard library headers, e.g. /usr/include/c++/4.8/string
+_STD_HEADER_RE = re.compile(r"/c\+\+/[^/]+/([a-z_]+)$")
+
+# Outputs of cmake's PCH compiles (gcc, clang).
+_PCH_OUTPUT_RE = re.compile(r"/cmake_pch\.hxx\.(gch|pch)$")
+
+
+def IncludeName(header):
+  """Return how a header is included, e.g. "<llvm/ADT/StringRef.h>".
+
+  Returns None for headers that don't belong in a PCH: lldb's own, and
+  internal or generated ones (.inc, .def, bits/...).
+  """
+  match = _PROJECT_HEADER_RE.search(header)
+  if match:
+    return "<%s>" % match.group(1)
+  match = _STD_HEADER_RE.search(header)
+  if match:
+    return "<%s>" % match.group(1)
+  return None
+
+
+def HeaderCounts(build_dir):
+  """Count how many sources of each lldb library include each header.
+
+  Args:
+    build_dir: a ninja build dir of this tree that has been built.
+
+  Returns:
+    A dict of source dir (relative to llvm) to (number of sources,
+    {include name: number of sources including it}).
+
+  """
+  counts = {}
+  for output, headers in lldb_ninja.ReadDeps(build_dir, _LLDB_PREFIX).items():
+    source_dir = lldb_ninja.SourceForObject(output)[0]
+    sources, header_counts = counts.get(source_dir, (0, {}))
+    for name in set(IncludeName(h) for h in headers):
+      if name:
+        header_counts[name] = header_counts.get(name, 0) + 1
+    counts[source_dir] = (sources + 1, header_counts)
+  return counts
+
+
+def PlanHeaders(build_dir):
+  """Choose the precompiled headers for each lldb library directory.
+
+  Args:
+    build_dir: a ninja build dir of this tree that has been built.
+
+  Returns:
+    A dict of source dir (relative to llvm) to a list of include names.
+
+  """
+  plan = {}
+  for source_dir, (sources, header_counts) in HeaderCounts(build_dir).items():
+    if sources < _MIN_SOURCES:
+      continue
+    common = [name for name, count in header_counts.items()
+              if count >= _MIN_SHARE * sources]
+    # The most widely used first, which also puts most of the headers
+    # they pull in ahead of the more specific ones.
+    common.sort(key=lambda name: (-header_counts[name], name))
+    if common:
+      plan[source_dir] = common[:_MAX_HEADERS]
+  return plan
+
+
+def CmakeHook(plan):
+  """Return cmake code that gives lldb's libraries precompiled headers.
+
+  The code is meant for CMAKE_PROJECT_INCLUDE.  It defers the work to the
+  end of the top-level directory, when all lldb targets exist.
+
+  Args:
+    plan: source dir => include names, from PlanHeaders().
+
+  Returns:
+    The cmake code, as a string.
+
+  """
+  lines = [
+      "# lldb precompiled headers (lldb_pch.py)",
+      "function(_lldb_pch_dir dir)",
+      '  file(RELATIVE_PATH rel "${CMAKE_SOURCE_DIR}" "${dir}")',
+      '  if(DEFINED "_lldb_pch_${rel}")',
+      '    get_property(targets DIRECTORY "${dir}" PROPERTY BUILDSYSTEM_TARGETS)',
+      "    foreach(target ${targets})",
+      "      get_target_property(type ${target} TYPE)",
+      '      if(type MATCHES "^(STATIC|SHARED|MODULE|OBJECT)_LIBRARY$")',
+      '        target_precompile_headers(${target} PRIVATE ${_lldb_pch_${rel}})',
+      "      endif()",
+      "    endforeach()",
+      "  endif()",
+      '  get_property(subdirs DIRECTORY "${dir}" PROPERTY SUBDIRECTORIES)',
+      "  foreach(subdir ${subdirs})",
+      '    _lldb_pch_dir("${subdir}")',
+      "  endforeach()",
+      "endfunction()",
+      "function(_lldb_pch_apply)",
+      '  _lldb_pch_dir("${CMAKE_SOURCE_DIR}")',
+      "endfunction()",
+      "get_property(_lldb_pch_hooked GLOBAL PROPERTY LLDB_PCH_HOOKED)",
+      "if(NOT _lldb_pch_hooked)",
+      "  set_property(GLOBAL PROPERTY LLDB_PCH_HOOKED ON)",
+  ]
+  for source_dir in sorted(plan):
+    lines.append('  set("_lldb_pch_%s"' % source_dir.replace(os.sep, "/"))
+    # C++ only: the headers would also be precompiled, and fail, for the
+    # C sources of a library.  ">" would end the generator expression.
+    lines += ['    "$<$<COMPILE_LANGUAGE:CXX>:%s>"' % name.replace(">",
+                                                            "$<ANGLE-R>")
+              for name in plan[source_dir]]
+    lines.append("  )")
+  lines += [
+      '  cmake_language(DEFER DIRECTORY "${CMAKE_SOURCE_DIR}"'
+      " CALL _lldb_pch_apply)",
+      "endif()",
+  ]
+  return "\n".join(lines) + "\n"
+
+
+def PchBuildTime(build_dir):
+  """Return the seconds the last build spent compiling lldb's PCHs."""
+  return sum(seconds
+             for output, seconds in lldb_ninja.ReadNinjaLog(build_dir).items()
+             if output.startswith(_LLDB_PREFIX)
+             and _PCH_OUTPUT_RE.search(output))
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Plan and evaluate lldb precompiled headers.")
+  subparsers = parser.add_subparsers(dest="command")
+  plan = subparsers.add_parser(
+      "plan", help="print the PCH headers for each lldb library directory")
+  plan.add_argument("baseline", help="ninja build dir that has been built")
+  report = subparsers.add_parser(
+      "report",
+      help="compare total compile time against a build without PCHs")
+  report.add_argument("baseline", help="ninja build dir without PCHs")
+  report.add_argument("pch", help="ninja build dir with PCHs")
+  args = parser.parse_args()
+
+  if args.command == "plan":
+    headers = PlanHeaders(args.baseline)
+    for source_dir in sorted(headers):
+      print("%s (%d headers)" % (source_dir, len(headers[source_dir])))
+      for name in headers[source_dir]:
+        print("  " + name)
+  else:
+    pch_seconds = PchBuildTime(args.pch)
+    print("precompiled headers built in %.1f s" % pch_seconds)
+    lldb_ninja.PrintTimeComparison(
+        "pch", lldb_ninja.CompileTimes(args.baseline, _LLDB_PREFIX),
+        lldb_ninja.CompileTimes(args.pch, _LLDB_PREFIX), pch_seconds)
+
+
+if __name__ == "__main__":
+  main()
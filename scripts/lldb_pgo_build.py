@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+
+"""Build a profile-guided, ThinLTO-optimized release lldb.
+
+The build runs in stages, each in its own build directory next to llvm:
+
+  baseline      plain release build (lldb_configure.py --profile release),
+                to compare against.
+  instrumented  release build instrumented for PGO (--pgo-instrument).
+  train         run the lldb test suite, or the --workload command, with
+                the instrumented lldb to collect raw profiles.
+  merge         merge the raw profiles with llvm-profdata.
+  optimized     ThinLTO release build using the merged profile
+                (--profile release-thinlto --pgo-profile), with a ThinLTO
+                cache that is kept between runs.
+  report        compare the startup, symbol loading and (with
+                --report-tests) test suite times of the optimized and the
+                baseline lldb.
+
+Build directories that already exist are rebuilt rather than configured
+again, so an interrupted pipeline can be resumed with --stages.  A stage
+that is configured again (its build directory was deleted) first deletes
+its install directory, install-pgo-<stage>, which lldb_configure.py
+refuses to configure over.
+
+See lldb_pgo_build.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import lldb_utils
+
+
+STAGES = ("baseline", "instrumented", "train", "merge", "optimized", "report")
+
+_BUILD_DIRS = {
+    "baseline": "build-pgo-baseline",
+    "instrumented": "build-pgo-instrumented",
+    "optimized": "build-pgo-optimized",
+}
+_PROFILE_DIR = "build-pgo-profiles"
+_PROFDATA_NAME = "lldb.profdata"
+
+_BUILD_TARGETS = ["lldb", "lldb-server"]
+
+
+def _ParseCommandLine():
+  """Perform command line parsing via argparse.
+
+  Returns:
+    Parsed arguments per argparse.parse_args().
+  """
+  parser = argparse.ArgumentParser(
+      description="Build a PGO + ThinLTO optimized release lldb.")
+
+  parser.add_argument(
+      "--stages", nargs="+", choices=STAGES, default=list(STAGES),
+      help="stages to run, in pipeline order (default: all)")
+  parser.add_argument(
+      "--workload", action="store",
+      help=("shell command to train the instrumented lldb with instead of "
+            "the test suite; {lldb} is replaced by the lldb binary's path"))
+  parser.add_argument(
+      "--lto-cache", action="store", dest="lto_cache",
+      default=os.path.join("~", ".cache", "lldb-thinlto"),
+      help="ThinLTO cache dir, kept between runs (default: %(default)s)")
+  parser.add_argument(
+      "--profdata", action="store",
+      help=("llvm-profdata to merge profiles with; it must match the "
+            "compiler (default: the one next to clang in $PATH)"))
+  parser.add_argument(
+      "--repeat", action="store", type=int, default=10,
+      help="runs per startup/symbol loading measurement (default: 10)")
+  parser.add_argument(
+      "--report-tests", action="store_true", dest="report_tests",
+      help="also time a full test suite run of each build (slow)")
+
+  return parser.parse_args()
+
+
+def _RunCommand(command, env=None):
+  print(" ".join(command))
+  status = subprocess.call(command, env=env)
+  if status != 0:
+    print("command failed (see above).", file=sys.stderr)
+    exit(1)
+
+
+def _ConfigureAndBuild(llvm_parent_dir, stage, configure_args):
+  """Configure a stage's build dir unless it exists, then build lldb."""
+  build_dir = os.path.join(llvm_parent_dir, _BUILD_DIRS[stage])
+  if not os.path.isdir(build_dir):
+    install_name = "install-pgo-" + stage
+    install_dir = os.path.join(llvm_parent_dir, install_name)
+    # left by an earlier run of this stage; it would fail the configure
+    if os.path.exists(install_dir):
+      print("removing %s" % install_dir)
+      shutil.rmtree(install_dir)
+    configure = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             "lldb_configure.py")
+    _RunCommand([sys.executable, configure, "-b", _BUILD_DIRS[stage],
+                 "-i", install_name] + configure_args)
+  _RunCommand(["ninja", "-C", build_dir] + _BUILD_TARGETS)
+
+
+def _Train(args, llvm_parent_dir):
+  """Run the training workload with the instrumented lldb."""
+  profile_dir = os.path.join(llvm_parent_dir, _PROFILE_DIR)
+  if not os.path.isdir(profile_dir):
+    os.makedirs(profile_dir)
+  for stale in glob.glob(os.path.join(profile_dir, "*.profraw")):
+    os.remove(stale)
+
+  env = dict(os.environ)
+  # one file per process and binary, merged online within a process
+  env["LLVM_PROFILE_FILE"] = os.path.join(profile_dir, "lldb-%p-%m.profraw")
+  build_dir = os.path.join(llvm_parent_dir, _BUILD_DIRS["instrumented"])
+  if args.workload:
+    command = args.workload.format(lldb=os.path.join(build_dir, "bin", "lldb"))
+    print(command)
+    status = subprocess.call(command, shell=True, env=env)
+  else:
+    command = ["ninja", "-C", build_dir, "check-lldb"]
+    print(" ".join(command))
+    status = subprocess.call(command, env=env)
+  # failing tests still exercise the code we want profiled
+  if status != 0:
+    print("Warning: training run exited with status %d." % status)
+
+
+def _FindProfdata(args):
+  if args.profdata:
+    return args.profdata
+  clang = lldb_utils.FindInExecutablePath("clang")
+  if clang:
+    profdata = os.path.join(os.path.dirname(os.path.realpath(clang)),
+                            "llvm-profdata")
+    if os.path.exists(profdata):
+      return profdata
+  return "llvm-profdata"
+
+
+def _Merge(args, llvm_parent_dir):
+  """Merge the raw profiles of the training run."""
+  profile_dir = os.path.join(llvm_parent_dir, _PROFILE_DIR)
+  raw_profiles = sorted(glob.glob(os.path.join(profile_dir, "*.profraw")))
+  if not raw_profiles:
+    print("Error: no raw profiles in %s; run the train stage first."
+          % profile_dir, file=sys.stderr)
+    exit(1)
+  _RunCommand([_FindProfdata(args), "merge", "-o",
+               os.path.join(profile_dir, _PROFDATA_NAME)] + raw_profiles)
+
+
+def _TimeCommand(command, repeat):
+  """Run command repeat times; return the (min, median) wall time."""
+  times = []
+  with open(os.devnull, "w") as devnull:
+    for _ in range(repeat):
+      start = time.time()
+      subprocess.call(command, stdout=devnull, stderr=devnull)
+      times.append(time.time() - start)
+  times.sort()
+  return times[0], times[len(times) // 2]
+
+
+def _Report(args, llvm_parent_dir):
+  """Compare the optimized lldb against the baseline."""
+  builds = [(stage, os.path.join(llvm_parent_dir, _BUILD_DIRS[stage]))
+            for stage in ("baseline", "optimized")]
+  # Load the same big binary in both, the baseline's liblldb.
+  symbol_file = os.path.join(builds[0][1], "lib", "liblldb.so")
+  if not os.path.exists(symbol_file):
+    symbol_file = os.path.join(builds[0][1], "bin", "lldb")
+
+  results = {}
+  for stage, build_dir in builds:
+    lldb = os.path.join(build_dir, "bin", "lldb")
+    if not os.path.exists(lldb):
+      print("Error: %s not built; run the %s stage first." % (lldb, stage),
+            file=sys.stderr)
+      exit(1)
+    results[stage] = [
+        _TimeCommand([lldb, "-x", "-b", "-o", "version"], args.repeat),
+        _TimeCommand([lldb, "-x", "-b", "-o", "target create " + symbol_file,
+                      "-o", "breakpoint set -n main"], args.repeat)]
+    if args.report_tests:
+      results[stage].append(
+          _TimeCommand(["ninja", "-C", build_dir, "check-lldb"], 1))
+
+  names = ["startup", "symbol loading", "test suite"][:len(results["baseline"])]
+  print("%-16s %14s %14s %8s" % ("median (min) s", "baseline", "optimized",
+                                 "change"))
+  for i, name in enumerate(names):
+    base_min, base_median = results["baseline"][i]
+    opt_min, opt_median = results["optimized"][i]
+    print("%-16s %7.3f (%.3f) %7.3f (%.3f) %+7.1f%%"
+          % (name, base_median, base_min, opt_median, opt_min,
+             100.0 * (opt_median - base_median) / base_median))
+
+
+def main():
+  args = _ParseCommandLine()
+  llvm_parent_dir = lldb_utils.FindLLVMParentInParentChain()
+  if not llvm_parent_dir:
+    print("Error: No llvm directory found in parent chain.", file=sys.stderr)
+    exit(1)
+  profdata_file = os.path.join(llvm_parent_dir, _PROFILE_DIR, _PROFDATA_NAME)
+
+  for stage in STAGES:
+    if stage not in args.stages:
+      continue
+    print("=== %s" % stage)
+    if stage == "baseline":
+      _ConfigureAndBuild(llvm_parent_dir, stage,
+                         ["--profile", "release", "--cmake", "--ninja"])
+    elif stage == "instrumented":
+      _ConfigureAndBuild(llvm_parent_dir, stage,
+                         ["--profile", "release", "--cmake", "--ninja",
+                          "--pgo-instrument"])
+    elif stage == "train":
+      _Train(args, llvm_parent_dir)
+    elif stage == "merge":
+      _Merge(args, llvm_parent_dir)
+    elif stage == "optimized":
+      _ConfigureAndBuild(llvm_parent_dir, stage,
+                         ["--profile", "release-thinlto", "--cmake", "--ninja",
+                          "--pgo-profile", profdata_file,
+                          "--lto-cache", args.lto_cache])
+    else:
+      _Report(args, llvm_parent_dir)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,235 @@
+"""Named configure profiles shared by the lldb build scripts.
+
+A profile is a named set of lldb_configure.py settings (build type,
+compiler, linker, LTO, unity, job pools, ...), kept in
+support/lldb_profiles.json so that lldb_configure.py, remote-build.py
+and lldb_osx_make_linux.py all build the same thing for the same name.
+
+Profile keys are the lldb_configure.py option names (the argparse
+"dest" values), so a profile can be applied to parsed arguments
+directly.  A profile may name another one in "inherits" and override
+some of its settings.
+
+ProfileNames -- Return the names of all profiles.
+HostProfileNames -- Return the names of the profiles that build for the host.
+GetProfile -- Return a profile with its inherited settings filled in.
+ApplyToArgs -- Apply a profile to parsed lldb_configure.py arguments.
+BuildTypeName -- Return the CMAKE_BUILD_TYPE for a set of settings.
+CmakeDefines -- Return the -D arguments for a set of settings.
+CompilerFlags -- Return the compiler flags for a set of settings.
+LinkerFlags -- Return the linker flags for a set of settings.
+AndroidArch -- Map an Android -arch value to the ABI and LLVM target.
+
+"""
+
+
+import json
+import os
+
+
+PROFILES_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             "support", "lldb_profiles.json")
+
+# Settings of a profile that doesn't mention them.
+_DEFAULTS = {
+    "description": "",
+    "target": "x86",
+    "arch": None,
+    "enable_assertions": False,
+    "enable_optimized": False,
+    "enable_symbols": False,
+    "use_cmake": True,
+    "use_ninja": True,
+    "use_clang": False,
+    "use_gold": False,
+    "use_ccache": False,
+    "use_unity": False,
+    "use_split_dwarf": False,
+    "use_gdb_index": False,
+    "coverage": False,
+    "lto": None,
+    "cmake_defines": {},
+    "max_compile_jobs": None,
+    "max_link_jobs": None,
+}
+
+# lldb_configure.py -arch value => (ANDROID_ABI, LLVM_TARGET_ARCH)
+_ANDROID_ARCHS = {
+    "x86-android": ("x86", "X86"),
+    "x86-64-android": ("x86_64", "X86"),
+}
+
+_LTO_NAMES = {"thin": "Thin", "full": "Full"}
+
+_profiles = None
+
+
+class Profile(object):
+  """The settings of one named profile, as attributes."""
+
+  def __init__(self, name, settings, explicit=()):
+    self.name = name
+    self._explicit = frozenset(explicit)
+    for key, value in settings.items():
+      setattr(self, key, value)
+
+  def IsSet(self, key):
+    """Return whether the profile, or one it inherits, sets key itself."""
+    return key in self._explicit
+
+
+def _LoadProfiles():
+  global _profiles
+  if _profiles is None:
+    with open(PROFILES_FILE) as f:
+      _profiles = json.load(f)
+  return _profiles
+
+
+def ProfileNames():
+  """Return the sorted names of all profiles."""
+  return sorted(_LoadProfiles())
+
+
+def HostProfileNames():
+  """Return the sorted names of the profiles that don't cross-compile."""
+  return [name for name in ProfileNames()
+          if GetProfile(name).target != "android"]
+
+
+def _ResolveSettings(name, seen, explicit):
+  profiles = _LoadProfiles()
+  if name not in profiles:
+    raise ValueError("unknown profile: %s (known: %s)"
+                     % (name, ", ".join(ProfileNames())))
+  if name in seen:
+    raise ValueError("profile %s inherits from itself" % name)
+  entry = profiles[name]
+  parent = entry.get("inherits")
+  if parent:
+    settings = _ResolveSettings(parent, seen + [name], explicit)
+  else:
+    settings = dict(_DEFAULTS)
+  for key, value in entry.items():
+    if key == "inherits":
+      continue
+    if key not in _DEFAULTS:
+      raise ValueError("profile %s: unknown setting %s" % (name, key))
+    if key == "cmake_defines":
+      value = dict(settings["cmake_defines"], **value)
+    settings[key] = value
+    explicit.add(key)
+  return settings
+
+
+def GetProfile(name):
+  """Return the named profile with inherited and default settings filled in.
+
+  Raises:
+    ValueError: if there is no such profile or it is malformed.
+
+  """
+  explicit = set()
+  settings = _ResolveSettings(name, [], explicit)
+  return Profile(name, settings, explicit)
+
+
+def ApplyToArgs(profile, args):
+  """Merge a profile into parsed lldb_configure.py arguments.
+
+  On/off options given on the command line stay on; everything else the
+  command line left unset is taken from the profile.
+  """
+  for key, value in vars(profile).items():
+    if key in ("name", "description", "_explicit"):
+      continue
+    current = getattr(args, key, None)
+    if isinstance(value, bool):
+      setattr(args, key, bool(current) or value)
+    elif key == "target":
+      if current in (None, _DEFAULTS["target"]):
+        setattr(args, key, value)
+    elif current is None or current == {}:
+      setattr(args, key, value)
+
+
+def BuildTypeName(settings):
+  """Return the CMAKE_BUILD_TYPE for the given settings (may be empty)."""
+  if settings.enable_optimized:
+    if settings.enable_symbols:
+      return "RelWithDebInfo"
+    return "Release"
+  if settings.enable_symbols and settings.enable_assertions:
+    return "Debug"
+  return ""
+
+
+def CmakeDefines(settings, set_assertions=True):
+  """Return the cmake -D arguments that the given settings imply.
+
+  Args:
+    settings: a Profile, or lldb_configure.py arguments with a profile
+      applied.
+    set_assertions: whether to pass LLVM_ENABLE_ASSERTIONS; if not, cmake
+      picks it by build type (on for Debug only).
+
+  Returns:
+    A list of "-DNAME=VALUE" strings.
+
+  """
+  defines = ["-DCMAKE_BUILD_TYPE=" + BuildTypeName(settings)]
+  if set_assertions:
+    defines.append("-DLLVM_ENABLE_ASSERTIONS=" +
+                   ("ON" if settings.enable_assertions else "OFF"))
+  lto = getattr(settings, "lto", None)
+  if lto:
+    defines.append("-DLLVM_ENABLE_LTO=" + _LTO_NAMES[lto])
+  # profile-guided optimization: lldb_configure.py options only, as the
+  # profile data is specific to one build
+  if getattr(settings, "pgo_instrument", False):
+    defines.append("-DLLVM_BUILD_INSTRUMENTED=IR")
+  pgo_profile = getattr(settings, "pgo_profile", None)
+  if pgo_profile:
+    defines.append("-DLLVM_PROFDATA_FILE=" + pgo_profile)
+  extra = getattr(settings, "cmake_defines", None) or {}
+  for name in sorted(extra):
+    defines.append("-D%s=%s" % (name, extra[name]))
+  return defines
+
+
+def CompilerFlags(settings):
+  """Return the compiler flags that the given settings imply."""
+  flags = ""
+  if settings.coverage:
+    # add code coverage flags
+    flags += " -fprofile-arcs -ftest-coverage"
+  if settings.use_split_dwarf:
+    flags += " -gsplit-dwarf"
+  return flags
+
+
+def LinkerFlags(settings):
+  """Return the linker flags that the given settings imply."""
+  flags = ""
+  if settings.coverage:
+    # add code coverage flags
+    flags += " -fprofile-arcs -ftest-coverage"
+  if settings.use_gold:
+    # CMAKE_LINKER alone doesn't change the linker the compiler driver runs
+    flags += " -fuse-ld=gold"
+  if settings.use_gdb_index:
+    flags += " -Wl,--gdb-index"
+  lto_cache = getattr(settings, "lto_cache", None)
+  if lto_cache and getattr(settings, "lto", None) == "thin":
+    # reuse ThinLTO backend compiles of unchanged modules across links
+    flags += " -Wl,-plugin-opt,cache-dir=" + lto_cache
+  return flags
+
+
+def AndroidArch(arch):
+  """Map a -arch value to (ANDROID_ABI, LLVM_TARGET_ARCH).
+
+  Anything not known to be x86 is assumed to be an ARM ABI.
+  """
+  # todo: 64bit arm and mips
+  return _ANDROID_ARCHS.get(arch, (arch, "ARM"))
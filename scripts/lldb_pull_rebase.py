@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+"""Pull llvm, clang and lldb and rebase the current branches onto them.
+
+For each repository of the sandbox this
+
+  1. fetches the mirror branch (master) from the remote, for all the
+     repositories in parallel,
+  2. advances the local mirror branch to it without checking it out
+     (git update-ref, only if it is a fast-forward), or with a
+     fast-forward merge if it is the branch checked out,
+  3. rebases the current branch onto the mirror branch, only if it
+     doesn't already contain it, with --autostash to keep local changes.
+
+Unlike the old pull_lldb_rebase, the working tree is only touched by the
+rebase itself, and not at all when there is nothing new.
+
+See lldb_pull_rebase.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import lldb_utils
+
+
+REPOS = {
+    "llvm": os.path.join("llvm"),
+    "clang": os.path.join("llvm", "tools", "clang"),
+    "lldb": os.path.join("llvm", "tools", "lldb"),
+}
+
+
+class RepoState(object):
+  """What happened to one repository."""
+
+  def __init__(self, name, path):
+    self.name = name
+    self.path = path
+    self.fetch_seconds = 0.0
+    self.old = None
+    self.new = None
+    self.new_commits = 0
+    self.action = ""
+    self.error = None
+
+
+def _ParseCommandLine():
+  parser = argparse.ArgumentParser(
+      description="Fetch llvm/clang/lldb and rebase onto the mirror branch.")
+  parser.add_argument(
+      "-r", "--remote", action="store", default="origin",
+      help="remote to fetch from (default: origin)")
+  parser.add_argument(
+      "-b", "--branch", action="store", default="master",
+      help="local mirror branch of the remote's branch (default: master)")
+  parser.add_argument(
+      "--repos", nargs="+", choices=sorted(REPOS), default=sorted(REPOS),
+      help="repositories to pull (default: all)")
+  parser.add_argument(
+      "-a", "--pull-all", action="store_true", dest="pull_all",
+      help="accepted for compatibility; all repositories are pulled")
+  parser.add_argument(
+      "--no-rebase", action="store_false", dest="rebase",
+      help="only fetch and advance the mirror branches")
+  return parser.parse_args()
+
+
+def _Git(repo_dir, args):
+  """Run git; return (status, output)."""
+  process = subprocess.Popen(["git"] + args, cwd=repo_dir,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+  output, _ = process.communicate()
+  return process.returncode, output.decode("utf-8", "replace").strip()
+
+
+def _RevParse(repo_dir, ref):
+  status, output = _Git(repo_dir, ["rev-parse", "--verify", "-q", ref])
+  return output if status == 0 else None
+
+
+def _IsAncestor(repo_dir, ancestor, descendant):
+  return _Git(repo_dir, ["merge-base", "--is-ancestor", ancestor,
+                         descendant])[0] == 0
+
+
+def FetchAndAdvance(state, remote, branch):
+  """Fetch the remote branch and fast-forward the local mirror branch.
+
+  Doesn't touch the working tree unless the mirror branch is checked out.
+
+  """
+  tracking = "refs/remotes/%s/%s" % (remote, branch)
+  start = time.time()
+  status, output = _Git(state.path, ["fetch", "-q", remote,
+                                     "+refs/heads/%s:%s" % (branch, tracking)])
+  state.fetch_seconds = time.time() - start
+  if status != 0:
+    state.error = "fetch failed: " + output
+    return state
+
+  state.old = _RevParse(state.path, "refs/heads/" + branch)
+  state.new = _RevParse(state.path, tracking)
+  if state.old == state.new:
+    state.action = "up to date"
+    return state
+  if state.old is not None and not _IsAncestor(state.path, state.old,
+                                               state.new):
+    state.error = ("%s has commits that aren't on %s/%s; not advancing it"
+                   % (branch, remote, branch))
+    return state
+  if state.old is not None:
+    state.new_commits = int(_Git(state.path, [
+        "rev-list", "--count", "%s..%s" % (state.old, state.new)])[1] or 0)
+
+  current = _Git(state.path, ["symbolic-ref", "-q", "HEAD"])[1]
+  if current == "refs/heads/" + branch:
+    # checked out, so the working tree has to follow
+    status, output = _Git(state.path, ["merge", "--ff-only", "-q", tracking])
+    state.action = "fast-forwarded"
+  else:
+    status, output = _Git(state.path, [
+        "update-ref", "-m", "lldb_pull_rebase: fast-forward",
+        "refs/heads/" + branch, state.new] + ([state.old] if state.old else []))
+    state.action = "advanced"
+  if status != 0:
+    state.error = "advancing %s failed: %s" % (branch, output)
+  return state
+
+
+def RebaseIfNeeded(state, branch):
+  """Rebase the current branch onto the mirror branch if it is behind."""
+  current = _Git(state.path, ["symbolic-ref", "-q", "--short", "HEAD"])[1]
+  if not current:
+    state.action += ", detached HEAD not rebased"
+    return
+  if current == branch or _IsAncestor(state.path, branch, "HEAD"):
+    return
+  print("rebasing %s onto %s in %s" % (current, branch, state.name))
+  sys.stdout.flush()
+  # Output goes to the terminal, in case of conflicts.
+  if subprocess.call(["git", "rebase", "--autostash", branch],
+                     cwd=state.path) != 0:
+    state.error = ("rebasing %s onto %s failed; resolve it, then git rebase "
+                   "--continue (or --abort)" % (current, branch))
+  else:
+    state.action += ", rebased " + current
+
+
+def main():
+  args = _ParseCommandLine()
+  llvm_parent_dir = lldb_utils.FindLLVMParentInParentChain()
+  if not llvm_parent_dir:
+    print("Error: No llvm directory found in parent chain.")
+    exit(1)
+
+  states = [RepoState(name, os.path.join(llvm_parent_dir, REPOS[name]))
+            for name in args.repos
+            if os.path.exists(os.path.join(llvm_parent_dir, REPOS[name],
+                                           ".git"))]
+  if not states:
+    print("Error: none of %s found under %s"
+          % (", ".join(args.repos), llvm_parent_dir))
+    exit(1)
+
+  start = time.time()
+  lldb_utils.RunParallel(
+      lambda state: FetchAndAdvance(state, args.remote, args.branch),
+      states, len(states))
+  fetched = time.time()
+
+  if args.rebase:
+    for state in states:
+      if not state.error:
+        RebaseIfNeeded(state, args.branch)
+
+  print("")
+  print("%-6s %8s %8s  %s" % ("repo", "fetch s", "commits", "result"))
+  for state in states:
+    print("%-6s %8.1f %8d  %s" % (state.name, state.fetch_seconds,
+                                  state.new_commits,
+                                  "ERROR: " + state.error if state.error
+                                  else state.action))
+  print("fetched in %.1fs, total %.1fs" % (fetched - start,
+                                           time.time() - start))
+  if any(state.error for state in states):
+    exit(1)
+
+
+if __name__ == "__main__":
+  main()
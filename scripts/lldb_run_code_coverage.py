@@ -9,6 +9,7 @@ See lldb_run_code_coverage.py --help for command line options.
 
 
 import argparse
+import multiprocessing
 import os
 import os.path
 import subprocess
@@ -84,6 +85,12 @@ def _ParseCommandLine():
       help=('Run tests assuming cmake/ninja '
             '(default: run tests assuming configure/gmake).'))
 
+  parser.add_argument(
+      '--jobs', '-j', action='store', type=int,
+      default=multiprocessing.cpu_count(),
+      help=('Number of test directories to run at once with --cmake '
+            '(default: cpu count).'))
+
   parser.add_argument(
       '--output-dir', '-o', action='store', default='coverage-report',
       help=('Output directory for code coverage report '
@@ -140,7 +147,11 @@ def _InitializeCapture(args):
 def _RunTests(args):
   with workingdir.WorkingDir(args.build_dir):
     if args.use_cmake:
-      _RunCommand(['ninja', 'check-lldb'], args)
+      # build what check-lldb would, then run the suite in parallel shards
+      _RunCommand(['ninja', 'lldb', 'lldb-server'], args)
+      _RunCommand([sys.executable,
+                   os.path.join(g_script_dir, 'lldb_test_runner.py'),
+                   '-j', str(args.jobs)], args)
     else:
       _RunCommand(['make', '-C', os.path.join('tools', 'lldb', 'test')], args)
 
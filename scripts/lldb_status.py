@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+
+"""Summarize the git status of llvm, clang and lldb in one table.
+
+For each repository of the sandbox, all at once, this runs
+
+  git status --porcelain=v2 --branch
+
+and prints the current branch, how far it is ahead of and behind its
+upstream, the number of staged, modified, conflicted and untracked
+files, and the number of stashes.
+
+Most of the time of a status on trees this size goes to finding
+untracked files and to checking every tracked file for changes.  The
+untracked cache (core.untrackedCache) is always turned on, so only
+directories that changed since the last status are scanned again.
+Where git has a built-in file system monitor, core.fsmonitor is turned
+on too, unless the repository configures its own (e.g. a watchman
+hook), so only the files the monitor reports are checked.  Both are
+kept in the index, so the first status of a sandbox is a full one and
+the following ones are fast.
+
+See lldb_status.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import os
+import subprocess
+import time
+
+import lldb_utils
+
+
+# name, path relative to the sandbox
+_REPOS = [("llvm", "llvm"),
+          ("clang", os.path.join("llvm", "tools", "clang")),
+          ("lldb", os.path.join("llvm", "tools", "lldb"))]
+
+
+class RepoStatus(object):
+  """The status of one repository."""
+
+  def __init__(self, name, path):
+    self.name = name
+    self.path = path
+    self.branch = None
+    self.upstream = None
+    self.ahead = 0
+    self.behind = 0
+    self.staged = 0
+    self.modified = 0
+    self.conflicts = 0
+    self.untracked = 0
+    self.stashes = 0
+    self.seconds = 0.0
+    self.error = None
+
+
+def _Git(repo_dir, args):
+  """Run git; return (status, output)."""
+  process = subprocess.Popen(["git"] + args, cwd=repo_dir,
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+  output, _ = process.communicate()
+  return process.returncode, output.decode("utf-8", "replace")
+
+
+def HasFsmonitorDaemon():
+  """Return whether this git has a built-in fsmonitor for this platform."""
+  status, output = _Git(".", ["version", "--build-options"])
+  return status == 0 and "fsmonitor--daemon" in output
+
+
+def ParseStatus(state, output):
+  """Fill in state from "git status --porcelain=v2 --branch" output."""
+  for line in output.splitlines():
+    if line.startswith("# branch.head "):
+      state.branch = line[len("# branch.head "):]
+    elif line.startswith("# branch.upstream "):
+      state.upstream = line[len("# branch.upstream "):]
+    elif line.startswith("# branch.ab "):
+      ahead, behind = line[len("# branch.ab "):].split()
+      state.ahead, state.behind = int(ahead), -int(behind)
+    elif line.startswith(("1 ", "2 ")):
+      # "1 XY ...": X is the staged change, Y the unstaged one, "." none
+      if line[2] != ".":
+        state.staged += 1
+      if line[3] != ".":
+        state.modified += 1
+    elif line.startswith("u "):
+      state.conflicts += 1
+    elif line.startswith("? "):
+      state.untracked += 1
+
+
+def GetStatus(state, fsmonitor, untracked):
+  """Run git status in one repository; results go into state."""
+  start = time.time()
+  config = ["-c", "core.untrackedCache=true"]
+  if fsmonitor and _Git(state.path, ["config", "core.fsmonitor"])[0] != 0:
+    config += ["-c", "core.fsmonitor=true"]
+  status, output = _Git(state.path, config + [
+      "status", "--porcelain=v2", "--branch",
+      "--untracked-files=" + ("normal" if untracked else "no")])
+  if status != 0:
+    state.error = output.strip()
+  else:
+    ParseStatus(state, output)
+    # there is no reflog at all without stashes
+    status, output = _Git(state.path, ["rev-list", "--walk-reflogs",
+                                       "--count", "refs/stash", "--"])
+    state.stashes = int(output) if status == 0 else 0
+  state.seconds = time.time() - start
+  return state
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Show the git status of llvm, clang and lldb.")
+  parser.add_argument(
+      "--no-untracked", action="store_false", dest="untracked",
+      help="don't look for untracked files")
+  parser.add_argument(
+      "--no-fsmonitor", action="store_false", dest="fsmonitor",
+      help="don't turn on git's built-in file system monitor")
+  args = parser.parse_args()
+
+  llvm_parent_dir = lldb_utils.FindLLVMParentInParentChain()
+  if not llvm_parent_dir:
+    print("Error: No llvm directory found in parent chain.")
+    exit(1)
+
+  states = [RepoStatus(name, os.path.join(llvm_parent_dir, path))
+            for name, path in _REPOS
+            if os.path.exists(os.path.join(llvm_parent_dir, path, ".git"))]
+  if not states:
+    print("Error: no git repositories found under %s" % llvm_parent_dir)
+    exit(1)
+
+  start = time.time()
+  fsmonitor = args.fsmonitor and HasFsmonitorDaemon()
+  lldb_utils.RunParallel(
+      lambda state: GetStatus(state, fsmonitor, args.untracked),
+      states, len(states))
+  elapsed = time.time() - start
+
+  print("%-6s %-24s %6s %6s %6s %8s %8s %9s %5s %6s"
+        % ("repo", "branch", "ahead", "behind", "staged", "modified",
+           "conflict", "untracked", "stash", "secs"))
+  for state in states:
+    if state.error:
+      print("%-6s ERROR: %s" % (state.name, state.error))
+      continue
+    if state.upstream:
+      ahead, behind = str(state.ahead), str(state.behind)
+    else:
+      ahead = behind = "-"
+    print("%-6s %-24s %6s %6s %6d %8d %8d %9s %5d %6.2f"
+          % (state.name, state.branch, ahead, behind, state.staged,
+             state.modified, state.conflicts,
+             state.untracked if args.untracked else "-", state.stashes,
+             state.seconds))
+  print("%.2fs%s" % (elapsed, ", fsmonitor on" if fsmonitor else ""))
+  if any(state.error for state in states):
+    exit(1)
+
+
+if __name__ == "__main__":
+  main()
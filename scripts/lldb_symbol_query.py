@@ -0,0 +1,346 @@
+#!/usr/bin/env python
+
+"""Answer "where is X defined / referenced" for the llvm tree quickly.
+
+  lldb_symbol_query.py build          (re)build the index
+  lldb_symbol_query.py def NAME       where NAME is defined
+  lldb_symbol_query.py refs NAME      where NAME is used (lldb sources)
+  lldb_symbol_query.py serve          keep the index loaded for queries
+
+build takes the symbols of every file from lldb_tags.py's per-file cache
+(indexing files that changed since, as lldb_tags.py would) and the
+identifiers used on each line of the lldb sources, cached per file
+content in the same database.  Both are written as sorted text indexes
+next to llvm (.lldb-symbols.defs and .lldb-symbols.refs), one
+"name<TAB>path<TAB>line<TAB>text" line per entry.
+
+Queries memory map an index and binary search it, so they don't read
+more than a few pages of it.  serve does the same from a daemon on a
+Unix socket next to llvm, which the queries use when it is running, to
+also save the start-up time; it picks up rebuilt indexes.
+
+Results print as path:line: text, which editors (and the .emacs-project
+set up by lldb_configure.py) can jump to.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import mmap
+import multiprocessing
+import os
+import re
+import signal
+import socket
+import sys
+import time
+
+import lldb_tags
+import lldb_utils
+
+
+DEFS_FILE = ".lldb-symbols.defs"
+REFS_FILE = ".lldb-symbols.refs"
+SOCKET_FILE = ".lldb-symbols.sock"
+
+# references are indexed for these trees, relative to the llvm parent dir
+_REFS_TREES = (os.path.join("llvm", "tools", "lldb") + os.sep,)
+
+_IDENTIFIER_RE = re.compile(br"[A-Za-z_]\w{2,}")
+# etags entries: "text\x7f[name\x01]line,offset"
+_ETAGS_NAME_RE = re.compile(br"([\w~]+(?:::[\w~]+)*)\W*$")
+
+_REFS_FORMAT = "refs"
+
+
+def _FileRefs(path):
+  """Return the identifiers used in a file.
+
+  Returns:
+    (path, "identifier<TAB>line<TAB>text" lines, one per identifier and
+    source line).
+
+  """
+  try:
+    with open(path, "rb") as f:
+      text = f.read()
+  except IOError:
+    return path, b""
+  refs = []
+  for number, line in enumerate(text.splitlines(), 1):
+    stripped = line.strip()[:120].replace(b"\t", b" ")
+    for name in set(_IDENTIFIER_RE.findall(line)):
+      refs.append(b"%s\t%d\t%s\n" % (name, number, stripped))
+  return path, b"".join(refs)
+
+
+def _ParseEtagsBody(body):
+  """Yield (name, line, text) for the entries of a file's etags section."""
+  for entry in body.splitlines():
+    text, _, position = entry.partition(b"\x7f")
+    name, _, position = position.rpartition(b"\x01")
+    if not name:
+      match = _ETAGS_NAME_RE.search(text)
+      if not match:
+        continue
+      name = match.group(1)
+    yield name, position.split(b",", 1)[0], text.strip().replace(b"\t", b" ")
+
+
+def _WriteIndex(path, lines):
+  lines.sort()
+  with open(path + ".tmp", "wb") as f:
+    f.writelines(lines)
+  os.rename(path + ".tmp", path)
+
+
+def BuildIndex(llvm_parent_dir, ctags="ctags", jobs=None):
+  """Build the definitions and references indexes.
+
+  Returns:
+    (number of definitions, number of references).
+
+  """
+  files = lldb_tags.ListSources(llvm_parent_dir)
+  cache = lldb_tags.TagCache(os.path.join(llvm_parent_dir,
+                                          lldb_tags.CACHE_FILE))
+  lldb_tags.IndexFiles(cache, files, "etags", ctags, jobs, llvm_parent_dir)
+
+  defs = []
+  names = set()
+  bodies = cache.Bodies("etags", set(files.values()))
+  for path, key in files.items():
+    encoded_path = path.encode("utf-8")
+    for name, line, text in _ParseEtagsBody(bodies.get(key, b"")):
+      names.add(name)
+      defs.append(b"%s\t%s\t%s\t%s\n" % (name, encoded_path, line, text))
+  _WriteIndex(os.path.join(llvm_parent_dir, DEFS_FILE), defs)
+
+  ref_files = dict((path, key) for path, key in files.items()
+                   if path.startswith(_REFS_TREES))
+  cached = cache.Keys(_REFS_FORMAT)
+  todo = dict((key, path) for path, key in ref_files.items()
+              if key not in cached)
+  if todo:
+    print("collecting references of %d files..." % len(todo))
+    sys.stdout.flush()
+    key_of = dict((path, key) for key, path in todo.items())
+    # tokenizing is CPU bound, so processes rather than lldb_utils' threads
+    pool = multiprocessing.Pool(jobs)
+    try:
+      refs = pool.map(_FileRefs, [os.path.join(llvm_parent_dir, p)
+                                  for p in sorted(todo.values())], 16)
+    finally:
+      pool.close()
+      pool.join()
+    cache.Put(_REFS_FORMAT, dict(
+        (key_of[os.path.relpath(path, llvm_parent_dir)], body)
+        for path, body in refs))
+
+  refs = []
+  bodies = cache.Bodies(_REFS_FORMAT, set(ref_files.values()))
+  for path, key in ref_files.items():
+    encoded_path = path.encode("utf-8")
+    for entry in bodies.get(key, b"").splitlines():
+      name, line, text = entry.split(b"\t", 2)
+      # only what is defined somewhere; not keywords, locals and such
+      if name in names:
+        refs.append(b"%s\t%s\t%s\t%s\n" % (name, encoded_path, line, text))
+  _WriteIndex(os.path.join(llvm_parent_dir, REFS_FILE), refs)
+  return len(defs), len(refs)
+
+
+class Index(object):
+  """A sorted index file, memory mapped for lookups."""
+
+  def __init__(self, path):
+    self.path = path
+    self.data = None
+    self.mtime = None
+    self.Reload()
+
+  def Reload(self):
+    """Map the index again if it was rebuilt since it was mapped."""
+    mtime = os.stat(self.path).st_mtime
+    if mtime == self.mtime:
+      return
+    with open(self.path, "rb") as f:
+      if os.fstat(f.fileno()).st_size:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+      else:
+        # an empty index can't be mapped
+        data = b""
+    if isinstance(self.data, mmap.mmap):
+      self.data.close()
+    self.data, self.mtime = data, mtime
+
+  def Lookup(self, name, prefix=False, limit=None):
+    """Return the entries for name (or names starting with it).
+
+    Returns:
+      A list of (name, path, line, text) tuples of bytes.
+
+    """
+    data = self.data
+    key = name if prefix else name + b"\t"
+    # find the first line that sorts at or after key
+    low, high = 0, len(data)
+    while low < high:
+      middle = (low + high) // 2
+      start = data.rfind(b"\n", 0, middle) + 1
+      end = data.find(b"\n", start)
+      if end < 0:
+        end = len(data)
+      if data[start:end] < key:
+        low = end + 1
+      else:
+        high = start
+    results = []
+    while low < len(data) and (limit is None or len(results) < limit):
+      end = data.find(b"\n", low)
+      if end < 0:
+        end = len(data)
+      line = data[low:end]
+      if not line.startswith(key):
+        break
+      results.append(tuple(line.split(b"\t", 3)))
+      low = end + 1
+    return results
+
+
+def _FormatResults(results, llvm_parent_dir):
+  parent = llvm_parent_dir.encode("utf-8")
+  return b"".join(b"%s:%s: %s\n" % (os.path.join(parent, path), line, text)
+                  for _, path, line, text in results)
+
+
+def _Query(indexes, request, llvm_parent_dir):
+  """Answer one "def|refs|prefix NAME [LIMIT]" request."""
+  fields = request.split()
+  if len(fields) < 2 or fields[0] not in (b"def", b"refs", b"prefix"):
+    return b"error: bad request\n"
+  limit = int(fields[2]) if len(fields) > 2 else None
+  index = indexes[b"refs" if fields[0] == b"refs" else b"def"]
+  index.Reload()
+  return _FormatResults(index.Lookup(fields[1], fields[0] == b"prefix",
+                                     limit), llvm_parent_dir)
+
+
+def _OpenIndexes(llvm_parent_dir):
+  return {b"def": Index(os.path.join(llvm_parent_dir, DEFS_FILE)),
+          b"refs": Index(os.path.join(llvm_parent_dir, REFS_FILE))}
+
+
+def Serve(llvm_parent_dir):
+  """Answer queries on the Unix socket until interrupted."""
+  indexes = _OpenIndexes(llvm_parent_dir)
+  path = os.path.join(llvm_parent_dir, SOCKET_FILE)
+  if os.path.exists(path):
+    os.remove(path)
+  server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  server.bind(path)
+  server.listen(16)
+  # clean up the socket when killed, too
+  signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+  print("answering queries on " + path)
+  sys.stdout.flush()
+  try:
+    while True:
+      connection, _ = server.accept()
+      try:
+        request = b""
+        while not request.endswith(b"\n"):
+          data = connection.recv(4096)
+          if not data:
+            break
+          request += data
+        connection.sendall(_Query(indexes, request, llvm_parent_dir))
+      except (EnvironmentError, ValueError) as e:
+        print("query failed: %s" % e)
+      finally:
+        connection.close()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.close()
+    os.remove(path)
+
+
+def _AskServer(llvm_parent_dir, request):
+  """Return the daemon's answer to request, or None if none is running."""
+  path = os.path.join(llvm_parent_dir, SOCKET_FILE)
+  if not os.path.exists(path):
+    return None
+  client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  try:
+    client.connect(path)
+    client.sendall(request)
+    answer = []
+    while True:
+      data = client.recv(65536)
+      if not data:
+        break
+      answer.append(data)
+    return b"".join(answer)
+  except socket.error:
+    return None
+  finally:
+    client.close()
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Find where symbols are defined and used in the llvm tree.")
+  subparsers = parser.add_subparsers(dest="command")
+  build = subparsers.add_parser("build", help="(re)build the index")
+  build.add_argument(
+      "-j", "--jobs", action="store", type=int,
+      default=lldb_utils.LocalCpuCount(),
+      help="number of processes to run at once (default: cpu count)")
+  build.add_argument(
+      "--ctags-program", action="store", dest="ctags", default="ctags",
+      help="ctags to run (default: ctags)")
+  for name, help_text in (("def", "where a symbol is defined"),
+                          ("refs", "where a symbol is used in lldb"),
+                          ("prefix", "definitions of names starting with")):
+    query = subparsers.add_parser(name, help=help_text)
+    query.add_argument("name")
+    query.add_argument("-n", "--limit", action="store", type=int,
+                       help="print at most this many results")
+  subparsers.add_parser("serve", help="answer queries from a daemon")
+  args = parser.parse_args()
+
+  llvm_parent_dir = lldb_utils.FindLLVMParentInParentChain()
+  if not llvm_parent_dir:
+    print("Error: No llvm directory found in parent chain.")
+    exit(1)
+
+  if args.command == "build":
+    start = time.time()
+    defs, refs = BuildIndex(llvm_parent_dir, args.ctags, args.jobs)
+    print("indexed %d definitions and %d references in %.1fs"
+          % (defs, refs, time.time() - start))
+    return
+  if not os.path.exists(os.path.join(llvm_parent_dir, DEFS_FILE)):
+    print("Error: no index; run lldb_symbol_query.py build first.")
+    exit(1)
+  if args.command == "serve":
+    Serve(llvm_parent_dir)
+    return
+
+  request = ("%s %s%s\n" % (args.command, args.name,
+                            " %d" % args.limit if args.limit else "")
+            ).encode("utf-8")
+  answer = _AskServer(llvm_parent_dir, request)
+  if answer is None:
+    answer = _Query(_OpenIndexes(llvm_parent_dir), request, llvm_parent_dir)
+  out = getattr(sys.stdout, "buffer", sys.stdout)
+  out.write(answer)
+  if not answer:
+    exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+
+"""Build a tags file for the llvm, clang and lldb trees incrementally.
+
+The sources of each repository are listed with git, and each file is
+identified by its content hash: the blob id git already has for files
+unchanged since the index, and git hash-object of the ones git status
+reports as modified or untracked.  ctags output is cached per content
+hash in .lldb-tags.sqlite next to llvm, so an update only runs ctags on
+files whose contents it hasn't seen (after a pull: the pulled changes),
+sharded across parallel ctags processes, and then merges the cached
+entries of all files into one etags (default) or ctags file.
+
+With --system-headers, /usr/include is indexed too (as make_lldb_tags
+did), keyed by path, size and modification time.
+
+See lldb_tags.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+import lldb_utils
+
+
+CACHE_FILE = ".lldb-tags.sqlite"
+
+_REPOS = [os.path.join("llvm"),
+          os.path.join("llvm", "tools", "clang"),
+          os.path.join("llvm", "tools", "lldb")]
+_SOURCE_EXTENSIONS = (".h", ".cpp", ".c")
+_SYSTEM_INCLUDE_DIR = "/usr/include"
+
+_CTAGS_ARGS = ["--c++-kinds=+p", "--fields=+iaS", "--extra=+q",
+               "--language-force=C++"]
+
+# files per ctags process, so shards are spread evenly over the workers
+_MAX_SHARD_FILES = 500
+
+
+class TagCache(object):
+  """Cached ctags output of single files, by content key and format."""
+
+  def __init__(self, path):
+    self.db = sqlite3.connect(path)
+    self.db.execute("CREATE TABLE IF NOT EXISTS tags ("
+                    " key TEXT, format TEXT, body BLOB,"
+                    " PRIMARY KEY (key, format))")
+
+  def Keys(self, tag_format):
+    return set(key for (key,) in self.db.execute(
+        "SELECT key FROM tags WHERE format = ?", (tag_format,)))
+
+  def Bodies(self, tag_format, keys):
+    """Return a dict of key to tags body for the keys in the cache."""
+    bodies = {}
+    for key, body in self.db.execute(
+        "SELECT key, body FROM tags WHERE format = ?", (tag_format,)):
+      if key in keys:
+        bodies[key] = bytes(body)
+    return bodies
+
+  def Put(self, tag_format, bodies):
+    with self.db:
+      self.db.executemany(
+          "INSERT OR REPLACE INTO tags VALUES (?, ?, ?)",
+          [(key, tag_format, sqlite3.Binary(body))
+           for key, body in bodies.items()])
+
+  def Prune(self, keep):
+    """Drop the entries of files that are no longer in any tree."""
+    stale = [(key,) for key in set(k for (k,) in self.db.execute(
+        "SELECT key FROM tags")) - keep]
+    with self.db:
+      self.db.executemany("DELETE FROM tags WHERE key = ?", stale)
+    self.db.execute("VACUUM")
+    return len(stale)
+
+
+def _Git(repo_dir, args, stdin=None):
+  process = subprocess.Popen(["git"] + args, cwd=repo_dir,
+                             stdin=subprocess.PIPE if stdin else None,
+                             stdout=subprocess.PIPE)
+  output, _ = process.communicate(stdin)
+  if process.returncode != 0:
+    raise subprocess.CalledProcessError(process.returncode, "git " + args[0])
+  return output.decode("utf-8", "surrogateescape"
+                       if sys.version_info[0] >= 3 else "replace")
+
+
+def ListRepoSources(llvm_parent_dir, repo):
+  """Return the source files of one git repository and their blob ids.
+
+  Args:
+    llvm_parent_dir: the dir containing llvm.
+    repo: the repository, relative to llvm_parent_dir.
+
+  Returns:
+    A dict of path (relative to llvm_parent_dir) to blob id.
+
+  """
+  repo_dir = os.path.join(llvm_parent_dir, repo)
+  sources = {}
+  # "<mode> <blob> <stage>\t<path>"
+  for entry in _Git(repo_dir, ["ls-files", "-s", "-z"]).split("\0"):
+    if not entry.endswith(_SOURCE_EXTENSIONS):
+      continue
+    info, path = entry.split("\t", 1)
+    sources[path] = info.split()[1]
+
+  # files whose working tree contents differ from the index
+  changed = []
+  entries = iter(_Git(repo_dir, ["status", "--porcelain", "-z",
+                                 "--untracked-files=all"]).split("\0"))
+  for entry in entries:
+    if not entry:
+      continue
+    state, path = entry[:2], entry[3:]
+    if state[0] in "RC":
+      # the source path of a rename or copy follows
+      next(entries, None)
+    if not path.endswith(_SOURCE_EXTENSIONS):
+      continue
+    if "D" in state:
+      sources.pop(path, None)
+    elif state[1] != " ":
+      changed.append(path)
+  if changed:
+    blobs = _Git(repo_dir, ["hash-object", "--stdin-paths"],
+                 ("\n".join(changed) + "\n").encode("utf-8")).split()
+    sources.update(zip(changed, blobs))
+
+  return dict((os.path.join(repo, path), blob)
+              for path, blob in sources.items())
+
+
+def ListSystemHeaders(include_dir=_SYSTEM_INCLUDE_DIR):
+  """Return a dict of the headers under include_dir to their keys."""
+  headers = {}
+  for dirpath, _, filenames in os.walk(include_dir):
+    for filename in filenames:
+      if not filename.endswith(".h"):
+        continue
+      path = os.path.join(dirpath, filename)
+      try:
+        stat = os.stat(path)
+      except OSError:
+        continue
+      headers[path] = "sys:%s:%d:%d" % (path, stat.st_size, stat.st_mtime)
+  return headers
+
+
+def ListSources(llvm_parent_dir, system_headers=False):
+  """Return the files to index and their content keys.
+
+  Args:
+    llvm_parent_dir: the dir containing llvm.
+    system_headers: whether to include the system headers.
+
+  Returns:
+    A dict of path (relative to llvm_parent_dir, absolute for system
+    headers) to content key.
+
+  """
+  files = {}
+  for repo in _REPOS:
+    if os.path.exists(os.path.join(llvm_parent_dir, repo, ".git")):
+      files.update(ListRepoSources(llvm_parent_dir, repo))
+  if system_headers:
+    files.update(ListSystemHeaders())
+  return files
+
+
+def _SplitEtags(output):
+  """Split etags output into a dict of file to its section body."""
+  bodies = {}
+  for section in output.split(b"\x0c\n")[1:]:
+    header, _, body = section.partition(b"\n")
+    bodies[header.rsplit(b",", 1)[0].decode("utf-8", "replace")] = body
+  return bodies
+
+
+def _SplitCtags(output):
+  """Split ctags output into a dict of file to its lines, minus the file."""
+  lines = {}
+  for line in output.splitlines(True):
+    if line.startswith(b"!_"):
+      continue
+    fields = line.split(b"\t", 2)
+    if len(fields) < 3:
+      continue
+    lines.setdefault(fields[1].decode("utf-8", "replace"), []).append(
+        fields[0] + b"\t" + fields[2])
+  return dict((path, b"".join(entries)) for path, entries in lines.items())
+
+
+def RunCtags(ctags, paths, tag_format, cwd):
+  """Run one ctags process over paths.
+
+  Returns:
+    A dict of path to its tags body; empty for files without tags.
+
+  """
+  command = [ctags] + _CTAGS_ARGS + ["-f", "-", "-L", "-"]
+  if tag_format == "etags":
+    command.insert(1, "-e")
+  process = subprocess.Popen(command, cwd=cwd, stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE)
+  output, _ = process.communicate(("\n".join(paths) + "\n").encode("utf-8"))
+  if process.returncode != 0:
+    raise subprocess.CalledProcessError(process.returncode, ctags)
+  bodies = dict((path, b"") for path in paths)
+  bodies.update(_SplitEtags(output) if tag_format == "etags"
+                else _SplitCtags(output))
+  return bodies
+
+
+def IndexFiles(cache, files, tag_format, ctags, jobs, llvm_parent_dir):
+  """Run ctags on the files whose contents aren't in the cache yet.
+
+  Args:
+    cache: a TagCache.
+    files: a dict of path to content key, as from ListSources.
+    tag_format: "etags" or "ctags".
+    ctags: the ctags program.
+    jobs: the number of ctags processes to run at once.
+    llvm_parent_dir: the dir containing llvm.
+
+  Returns:
+    The number of files indexed.
+
+  """
+  cached = cache.Keys(tag_format)
+  # one file per content key is enough
+  todo = dict((key, path) for path, key in files.items() if key not in cached)
+  paths = sorted(todo.values())
+  shard_size = max(1, min(_MAX_SHARD_FILES, -(-len(paths) // max(1, jobs))))
+  shards = [paths[i:i + shard_size] for i in range(0, len(paths), shard_size)]
+  key_of = dict((path, key) for key, path in todo.items())
+
+  def Run(shard):
+    return RunCtags(ctags, shard, tag_format, llvm_parent_dir)
+
+  if shards:
+    print("indexing %d of %d files in %d shards..."
+          % (len(paths), len(files), len(shards)))
+    sys.stdout.flush()
+  for bodies in lldb_utils.RunParallel(Run, shards, jobs):
+    cache.Put(tag_format,
+              dict((key_of[path], body) for path, body in bodies.items()
+                   if path in key_of))
+  return len(paths)
+
+
+def WriteTags(tags_path, tag_format, files, bodies, llvm_parent_dir):
+  """Merge the per-file tags into one tags file.
+
+  Args:
+    tags_path: the tags file to write.
+    tag_format: "etags" or "ctags".
+    files: a dict of path (relative to llvm_parent_dir, or absolute) to
+      content key.
+    bodies: a dict of content key to tags body.
+    llvm_parent_dir: the dir containing llvm.
+
+  """
+  tags_dir = os.path.dirname(os.path.abspath(tags_path))
+
+  def TagsPath(path):
+    # relative to the tags file, as editors resolve them
+    return os.path.relpath(os.path.join(llvm_parent_dir, path),
+                           tags_dir).encode("utf-8")
+
+  with open(tags_path + ".tmp", "wb") as out:
+    if tag_format == "etags":
+      for path in sorted(files):
+        body = bodies[files[path]]
+        if body:
+          out.write(b"\x0c\n%s,%d\n" % (TagsPath(path), len(body)))
+          out.write(body)
+    else:
+      lines = []
+      for path in files:
+        tags_file = TagsPath(path)
+        for line in bodies[files[path]].splitlines(True):
+          name, rest = line.split(b"\t", 1)
+          lines.append(name + b"\t" + tags_file + b"\t" + rest)
+      lines.sort()
+      out.write(b"!_TAG_FILE_FORMAT\t2\t/extended format/\n")
+      out.write(b"!_TAG_FILE_SORTED\t1\t/0=unsorted, 1=sorted/\n")
+      out.writelines(lines)
+  os.rename(tags_path + ".tmp", tags_path)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Incrementally build tags for the llvm/clang/lldb trees.")
+  parser.add_argument(
+      "-o", "--output", action="store",
+      help="tags file to write (default: TAGS, or tags with --ctags, next "
+           "to llvm)")
+  parser.add_argument(
+      "--ctags", action="store_const", const="ctags", default="etags",
+      dest="tag_format",
+      help="write a vi style tags file instead of emacs TAGS")
+  parser.add_argument(
+      "--system-headers", action="store_true", dest="system_headers",
+      help="also index %s" % _SYSTEM_INCLUDE_DIR)
+  parser.add_argument(
+      "-j", "--jobs", action="store", type=int,
+      default=lldb_utils.LocalCpuCount(),
+      help="number of ctags processes to run at once (default: cpu count)")
+  parser.add_argument(
+      "--ctags-program", action="store", dest="ctags", default="ctags",
+      help="ctags to run (default: ctags; exuberant or universal ctags)")
+  parser.add_argument(
+      "--prune", action="store_true",
+      help="drop cached entries of files no longer in the trees")
+  args = parser.parse_args()
+
+  llvm_parent_dir = lldb_utils.FindLLVMParentInParentChain()
+  if not llvm_parent_dir:
+    print("Error: No llvm directory found in parent chain.")
+    exit(1)
+  if not (os.path.exists(args.ctags) or
+          lldb_utils.FindInExecutablePath(args.ctags)):
+    print("Error: %s not found in $PATH." % args.ctags)
+    exit(1)
+  tags_path = args.output or os.path.join(
+      llvm_parent_dir, "TAGS" if args.tag_format == "etags" else "tags")
+
+  start = time.time()
+  files = ListSources(llvm_parent_dir, args.system_headers)
+  listed = time.time()
+
+  cache = TagCache(os.path.join(llvm_parent_dir, CACHE_FILE))
+  indexed_count = IndexFiles(cache, files, args.tag_format, args.ctags,
+                             args.jobs, llvm_parent_dir)
+  indexed = time.time()
+
+  keys = set(files.values())
+  WriteTags(tags_path, args.tag_format, files,
+            cache.Bodies(args.tag_format, keys), llvm_parent_dir)
+  print("listed %d files in %.1fs, indexed %d in %.1fs, wrote %s in %.1fs"
+        % (len(files), listed - start, indexed_count, indexed - listed,
+           tags_path, time.time() - indexed))
+  if args.prune:
+    print("pruned %d stale cache entries" % cache.Prune(keys))
+
+
+if __name__ == "__main__":
+  main()
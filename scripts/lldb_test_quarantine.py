@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+"""Find flaky and newly slow lldb tests in the recorded test history.
+
+Reads the test results database that lldb_test_runner.py fills (see
+lldb_test_results.py) and flags:
+
+  flaky tests   tests that both passed and failed (or errored) on the
+                same llvm, clang and lldb revisions, i.e. without a
+                code change.
+  slow shards   test directories whose recent duration regressed past
+                a threshold compared with their earlier runs.
+
+Runs without known revisions, which includes imported logs, and runs of
+checkouts with local changes can't tell a flaky test from a fix or a
+breakage, so they are left out of the flaky analysis.
+
+The result is written to lldb-test-quarantine.json in the build dir.
+lldb_test_runner.py reads it to retry failing shards whose failures are
+all quarantined flaky tests, and doesn't fail the run for them when a
+retry passes.  It also starts the slow shards by their recent duration,
+with a timeout of at least twice that.
+
+See lldb_test_quarantine.py -h for usage.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import time
+
+import lldb_test_results
+
+
+QUARANTINE_FILE = "lldb-test-quarantine.json"
+
+_FAILED = ("FAIL", "ERROR")
+
+
+def _RecentRunIds(db, runs):
+  return [run_id for (run_id,) in db.execute(
+      "SELECT run_id FROM runs ORDER BY run_id DESC LIMIT ?", (runs,))]
+
+
+def _Marks(run_ids):
+  return ",".join("?" * len(run_ids))
+
+
+def FindFlakyTests(db, runs=30):
+  """Return the tests whose outcome flipped within one set of revisions.
+
+  Args:
+    db: a lldb_test_results.Connect()ed database.
+    runs: how many of the most recent runs to look at.
+
+  Returns:
+    A dict of test_id to a dict with the test's shard, the number of
+    runs it ran in, how many of those failed, and how many times its
+    outcome flipped between consecutive clean runs of the same
+    revisions.
+
+  """
+  run_ids = _RecentRunIds(db, runs)
+  if not run_ids:
+    return {}
+  # dirty is only 0 when all three revisions are known
+  rows = db.execute(
+      "SELECT r.test_id, r.shard,"
+      " ru.llvm_revision || ' ' || ru.clang_revision || ' ' || ru.revision,"
+      " r.outcome FROM results r JOIN runs ru ON ru.run_id = r.run_id"
+      " WHERE r.run_id IN (%s) AND ru.dirty = 0"
+      " AND r.outcome IN ('PASS', 'FAIL', 'ERROR')"
+      " ORDER BY r.test_id, r.run_id" % _Marks(run_ids), run_ids)
+
+  flaky = {}
+  history = {}
+  for test_id, shard, revision, outcome in rows:
+    stats = history.setdefault(test_id, {"shard": shard, "runs": 0,
+                                         "failures": 0, "flips": 0,
+                                         "last": {}})
+    stats["runs"] += 1
+    failed = outcome in _FAILED
+    if failed:
+      stats["failures"] += 1
+    last = stats["last"].get(revision)
+    if last is not None and last != failed:
+      stats["flips"] += 1
+    stats["last"][revision] = failed
+  for test_id, stats in history.items():
+    if stats["flips"]:
+      del stats["last"]
+      flaky[test_id] = stats
+  return flaky
+
+
+def _Median(values):
+  values = sorted(values)
+  return values[len(values) // 2]
+
+
+def FindSlowShards(db, runs=30, recent=3, slowdown=1.5, min_increase=5.0):
+  """Return the test directories whose duration regressed.
+
+  Args:
+    db: a lldb_test_results.Connect()ed database.
+    runs: how many of the most recent runs to look at.
+    recent: how many of those count as recent; the rest are the baseline.
+    slowdown: flag shards whose recent median is this many times the
+      baseline median...
+    min_increase: ...and at least this many seconds longer.
+
+  Returns:
+    A dict of shard to a dict with its baseline and recent median
+    durations.
+
+  """
+  run_ids = _RecentRunIds(db, runs)
+  if not run_ids:
+    return {}
+  durations = {}
+  for shard, duration in db.execute(
+      "SELECT shard, duration FROM shards WHERE run_id IN (%s)"
+      " AND duration IS NOT NULL ORDER BY run_id" % _Marks(run_ids), run_ids):
+    durations.setdefault(shard, []).append(duration)
+
+  slow = {}
+  for shard, values in durations.items():
+    # a baseline of at least as many runs as the recent window
+    if len(values) < 2 * recent:
+      continue
+    baseline = _Median(values[:-recent])
+    latest = _Median(values[-recent:])
+    if latest >= baseline * slowdown and latest - baseline >= min_increase:
+      slow[shard] = {"baseline": round(baseline, 1),
+                     "recent": round(latest, 1)}
+  return slow
+
+
+def ReadQuarantine(path):
+  """Return the quarantine written by WriteQuarantine, or an empty one."""
+  try:
+    with open(path) as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return {"flaky": {}, "slow": {}}
+
+
+def WriteQuarantine(path, flaky, slow):
+  with open(path + ".tmp", "w") as f:
+    json.dump({"generated": time.time(), "flaky": flaky, "slow": slow}, f,
+              indent=1, sort_keys=True)
+  os.rename(path + ".tmp", path)
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Find flaky and newly slow lldb tests.")
+  parser.add_argument(
+      "-b", "--build-dir", action="store", dest="build_dir", default=".",
+      help="build dir with the test results database (default: current dir)")
+  parser.add_argument(
+      "-n", "--runs", action="store", type=int, default=30,
+      help="number of recent runs to analyse (default: 30)")
+  parser.add_argument(
+      "--recent", action="store", type=int, default=3,
+      help="runs compared against the earlier ones for slowdowns "
+           "(default: 3)")
+  parser.add_argument(
+      "--slowdown", action="store", type=float, default=1.5,
+      help="duration ratio that counts as a regression (default: 1.5)")
+  parser.add_argument(
+      "--min-increase", action="store", dest="min_increase", type=float,
+      default=5.0,
+      help="seconds a regression must add at least (default: 5)")
+  parser.add_argument(
+      "--dry-run", action="store_true", dest="dry_run",
+      help="only print the findings, don't write the quarantine file")
+  args = parser.parse_args()
+
+  db = lldb_test_results.Connect(
+      os.path.join(args.build_dir, lldb_test_results.DB_FILE))
+  flaky = FindFlakyTests(db, args.runs)
+  slow = FindSlowShards(db, args.runs, args.recent, args.slowdown,
+                        args.min_increase)
+
+  print("%d flaky tests:" % len(flaky))
+  for test_id in sorted(flaky, key=lambda t: -flaky[t]["flips"]):
+    stats = flaky[test_id]
+    print("  %-60s %2d flips, failed %d of %d runs"
+          % (test_id, stats["flips"], stats["failures"], stats["runs"]))
+  print("%d slower test directories:" % len(slow))
+  for shard in sorted(slow):
+    print("  %-60s %6.1fs -> %6.1fs"
+          % (shard, slow[shard]["baseline"], slow[shard]["recent"]))
+
+  if not args.dry_run:
+    path = os.path.join(args.build_dir, QUARANTINE_FILE)
+    WriteQuarantine(path, flaky, slow)
+    print("wrote " + path)
+
+
+if __name__ == "__main__":
+  main()
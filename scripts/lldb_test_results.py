@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+
+"""A database of lldb test suite results.
+
+dotest output is parsed once into an SQLite database, by default
+lldb-test-results.sqlite in the build dir, and reports are queries on
+it.  lldb_test_runner.py records every run it makes; logs from elsewhere
+can be imported.
+
+Tables:
+  runs     run_id, started, revision (of the lldb checkout), build_dir,
+           log_digest (of imported logs, so each is imported once),
+           llvm_revision, clang_revision, dirty (1 if any of the three
+           checkouts had local changes, NULL if unknown)
+  shards   run_id, shard (test directory), status, duration (seconds)
+  results  run_id, test_id (module.Class.test), shard, outcome (PASS,
+           FAIL, ERROR, XFAIL, XPASS, UNSUPPORTED), skip_reason
+
+dotest doesn't time individual tests, so durations are kept per test
+directory, the unit the runner runs and times.
+
+Usage:
+  lldb_test_results.py import LOG       add a dotest log as a new run
+  lldb_test_results.py totals [-r RUN | -l LOG]
+      pass/xfail/fail and unsupported counts
+  lldb_test_results.py unsupported [-r RUN | -l LOG]
+      unsupported tests by reason
+  lldb_test_results.py xfail [-r RUN | -l LOG]
+      expected failures, as Class,test
+  lldb_test_results.py trend [-n N]     outcome counts of the last N runs
+
+RUN defaults to the latest run; -l LOG reports on a log, importing it
+first if it is new.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import subprocess
+import time
+
+
+DB_FILE = "lldb-test-results.sqlite"
+
+OUTCOMES = ("PASS", "FAIL", "ERROR", "XFAIL", "XPASS", "UNSUPPORTED")
+
+# e.g. UNSUPPORTED: LLDB (suite) :: test_foo_dwarf (TestFoo.FooTestCase) (requires Darwin)
+_RESULT_RE = re.compile(
+    r"^(?P<outcome>%s): LLDB \([^)]*\) :: (?P<test>\w+) \((?P<case>[\w.]+)\)"
+    r"(?:\s*\((?P<reason>.*)\))?" % "|".join(OUTCOMES))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+  run_id INTEGER PRIMARY KEY,
+  started REAL,
+  revision TEXT,
+  build_dir TEXT,
+  log_digest TEXT UNIQUE,
+  llvm_revision TEXT,
+  clang_revision TEXT,
+  dirty INTEGER);
+CREATE TABLE IF NOT EXISTS shards (
+  run_id INTEGER,
+  shard TEXT,
+  status INTEGER,
+  duration REAL,
+  PRIMARY KEY (run_id, shard));
+CREATE TABLE IF NOT EXISTS results (
+  run_id INTEGER,
+  test_id TEXT,
+  shard TEXT,
+  outcome TEXT,
+  skip_reason TEXT);
+CREATE INDEX IF NOT EXISTS results_by_run ON results (run_id, outcome);
+CREATE INDEX IF NOT EXISTS results_by_test ON results (test_id);
+"""
+
+
+# runs columns added since the first version, for older databases
+_ADDED_RUN_COLUMNS = (("llvm_revision", "TEXT"), ("clang_revision", "TEXT"),
+                      ("dirty", "INTEGER"))
+
+# the checkouts a run tests, relative to the llvm one
+_CHECKOUTS = (("llvm_revision", ""),
+              ("clang_revision", os.path.join("tools", "clang")),
+              ("revision", os.path.join("tools", "lldb")))
+
+
+def Connect(db_path):
+  """Open (creating if needed) a results database."""
+  db = sqlite3.connect(db_path)
+  db.executescript(_SCHEMA)
+  columns = set(row[1] for row in db.execute("PRAGMA table_info(runs)"))
+  with db:
+    for name, column_type in _ADDED_RUN_COLUMNS:
+      if name not in columns:
+        db.execute("ALTER TABLE runs ADD COLUMN %s %s" % (name, column_type))
+  return db
+
+
+def ParseResults(output):
+  """Parse dotest output.
+
+  Returns:
+    A list of (test_id, outcome, skip_reason) tuples.
+
+  """
+  results = []
+  for line in output.splitlines():
+    match = _RESULT_RE.match(line)
+    if match:
+      results.append(("%s.%s" % (match.group("case"), match.group("test")),
+                      match.group("outcome"), match.group("reason")))
+  return results
+
+
+def _Git(source_dir, args):
+  """Return the output of a git command, or None if it failed."""
+  try:
+    with open(os.devnull, "w") as devnull:
+      return subprocess.check_output(
+          ["git"] + args, cwd=source_dir,
+          stderr=devnull).decode("utf-8", "replace").strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def Revisions(source_dir):
+  """Return what a run in an lldb checkout tests.
+
+  Args:
+    source_dir: a directory in the lldb checkout, llvm/tools/lldb.
+
+  Returns:
+    A dict with the revision (lldb), llvm_revision and clang_revision
+    checked out, None where unknown, and dirty: whether any of the
+    checkouts has changes to tracked files, or None if that isn't known.
+    It takes RecordRun's keyword arguments of the same names.
+
+  """
+  revisions = dict((name, None) for name, _ in _CHECKOUTS)
+  revisions["dirty"] = None
+  lldb_dir = _Git(source_dir, ["rev-parse", "--show-toplevel"])
+  if not lldb_dir:
+    return revisions
+  llvm_dir = os.path.dirname(os.path.dirname(lldb_dir))
+  dirty = False
+  for name, path in _CHECKOUTS:
+    checkout = os.path.join(llvm_dir, path)
+    revisions[name] = _Git(checkout, ["rev-parse", "HEAD"])
+    status = _Git(checkout, ["status", "--porcelain", "--untracked-files=no"])
+    if revisions[name] is None or status is None:
+      dirty = None
+    elif status and dirty is not None:
+      dirty = True
+  revisions["dirty"] = dirty
+  return revisions
+
+
+def RecordRun(db, shard_outputs, revision=None, build_dir=None,
+              started=None, once=False, llvm_revision=None,
+              clang_revision=None, dirty=None):
+  """Store the results of one test run.
+
+  Args:
+    db: a Connect()ed database.
+    shard_outputs: a list of (shard, status, duration, output) for each
+      test directory run; shard, status and duration may be None when
+      unknown, e.g. for an imported log.
+    revision: the lldb revision that was tested.
+    build_dir: the build dir that was tested.
+    started: when the run started (default: now).
+    once: skip the run if the same output was recorded with once before,
+      as when importing a log twice.
+    llvm_revision, clang_revision: the llvm and clang revisions it was
+      built from.
+    dirty: whether any checkout had local changes (None if unknown).
+
+  Returns:
+    The run_id of the new run, or with once, of the run recorded before.
+
+  """
+  log_digest = None
+  if once:
+    digest = hashlib.sha1()
+    for _, _, _, output in shard_outputs:
+      digest.update(output if isinstance(output, bytes)
+                    else output.encode("utf-8", "replace"))
+    log_digest = digest.hexdigest()
+  with db:
+    if log_digest:
+      earlier = db.execute("SELECT run_id FROM runs WHERE log_digest = ?",
+                           (log_digest,)).fetchone()
+      if earlier:
+        return earlier[0]
+    run_id = db.execute(
+        "INSERT INTO runs (started, revision, build_dir, log_digest,"
+        " llvm_revision, clang_revision, dirty) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (started or time.time(), revision, build_dir, log_digest,
+         llvm_revision, clang_revision,
+         None if dirty is None else int(dirty))).lastrowid
+    for shard, status, duration, output in shard_outputs:
+      if shard is not None:
+        db.execute("INSERT INTO shards VALUES (?, ?, ?, ?)",
+                   (run_id, shard, status, duration))
+      db.executemany(
+          "INSERT INTO results VALUES (?, ?, ?, ?, ?)",
+          [(run_id, test_id, shard, outcome, reason)
+           for test_id, outcome, reason in ParseResults(output)])
+  return run_id
+
+
+def LatestRun(db):
+  """Return the id of the most recent run, or None."""
+  return db.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+
+
+def OutcomeCounts(db, run_id):
+  """Return a dict of outcome to number of tests for one run."""
+  counts = dict((outcome, 0) for outcome in OUTCOMES)
+  counts.update(db.execute(
+      "SELECT outcome, COUNT(*) FROM results WHERE run_id = ?"
+      " GROUP BY outcome", (run_id,)))
+  return counts
+
+
+def UnsupportedByReason(db, run_id):
+  """Return (skip_reason, count) pairs of one run, most common first."""
+  return db.execute(
+      "SELECT IFNULL(skip_reason, ''), COUNT(*) FROM results"
+      " WHERE run_id = ? AND outcome = 'UNSUPPORTED'"
+      " GROUP BY 1 ORDER BY 2 DESC, 1", (run_id,)).fetchall()
+
+
+def _Percent(count, total):
+  return 100.0 * count / total if total else 0.0
+
+
+def PrintTotals(db, run_id):
+  """Print the run's totals the way lldb_collate_test_results did."""
+  counts = OutcomeCounts(db, run_id)
+  run = counts["PASS"] + counts["XFAIL"] + counts["FAIL"]
+  print("======")
+  print("TOTALS")
+  print("======")
+  for outcome in ("PASS", "XFAIL", "FAIL"):
+    print("%-6s %4d (%5.2f%% of tests run)"
+          % (outcome.lower() + ":", counts[outcome],
+             _Percent(counts[outcome], run)))
+  print("")
+  print("===========")
+  print("UNSUPPORTED")
+  print("===========")
+  groups = {"Darwin-only": 0, "skip linux": 0, "other": 0}
+  for reason, count in UnsupportedByReason(db, run_id):
+    if "requires Darwin" in reason:
+      groups["Darwin-only"] += count
+    elif "skip on linux" in reason:
+      groups["skip linux"] += count
+    else:
+      groups["other"] += count
+  unsupported = counts["UNSUPPORTED"]
+  print("unsupported (total):       %4d" % unsupported)
+  for group in ("Darwin-only", "skip linux", "other"):
+    print("%-26s %4d (%5.2f%% of unsupported tests)"
+          % ("unsupported (%s):" % group, groups[group],
+             _Percent(groups[group], unsupported)))
+
+
+def Xfails(db, run_id):
+  """Return the (case, test) of the run's expected failures."""
+  return [tuple(test_id.rsplit(".", 1)) for (test_id,) in db.execute(
+      "SELECT test_id FROM results WHERE run_id = ? AND outcome = 'XFAIL'"
+      " ORDER BY test_id", (run_id,))]
+
+
+def PrintTrend(db, last):
+  """Print the outcome counts of the last runs, oldest first."""
+  runs = db.execute(
+      "SELECT run_id, started, revision FROM runs"
+      " ORDER BY run_id DESC LIMIT ?", (last,)).fetchall()
+  print("%5s  %-16s  %-12s %6s %6s %6s %6s %6s"
+        % ("run", "started", "revision", "pass", "fail", "error", "xfail",
+           "unsup"))
+  for run_id, started, revision in reversed(runs):
+    counts = OutcomeCounts(db, run_id)
+    print("%5d  %-16s  %-12s %6d %6d %6d %6d %6d"
+          % (run_id, time.strftime("%Y-%m-%d %H:%M", time.localtime(started)),
+             (revision or "")[:12], counts["PASS"], counts["FAIL"],
+             counts["ERROR"], counts["XFAIL"], counts["UNSUPPORTED"]))
+
+
+def ImportLog(db, log_path, revision=None):
+  """Record a dotest log as a run, unless it was imported before.
+
+  Returns:
+    The log's run_id.
+
+  """
+  with open(log_path) as log:
+    return RecordRun(db, [(None, None, None, log.read())],
+                     revision=revision, once=True)
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Query lldb test results.")
+  parser.add_argument(
+      "--db", action="store", default=DB_FILE,
+      help="results database (default: %(default)s in the current dir)")
+  subparsers = parser.add_subparsers(dest="command")
+  import_parser = subparsers.add_parser(
+      "import", help="add a dotest log as a new run")
+  import_parser.add_argument("log")
+  import_parser.add_argument(
+      "--revision", action="store",
+      help="lldb revision the log is from (default: unknown)")
+  for name, help_text in (("totals", "pass/xfail/fail and unsupported counts"),
+                          ("unsupported", "unsupported tests by reason"),
+                          ("xfail", "expected failures, as Class,test")):
+    subparser = subparsers.add_parser(name, help=help_text)
+    group = subparser.add_mutually_exclusive_group()
+    group.add_argument("-r", "--run", action="store", type=int,
+                       help="run id (default: the latest run)")
+    group.add_argument("-l", "--log", action="store",
+                       help="the run of this dotest log, imported if new")
+  trend = subparsers.add_parser("trend", help="outcome counts of recent runs")
+  trend.add_argument("-n", "--last", action="store", type=int, default=10,
+                     help="number of runs (default: 10)")
+  args = parser.parse_args()
+
+  db = Connect(args.db)
+  if args.command == "import":
+    print("%s is run %d" % (args.log, ImportLog(db, args.log, args.revision)))
+    return
+  if args.command == "trend":
+    PrintTrend(db, args.last)
+    return
+
+  if args.log:
+    run_id = ImportLog(db, args.log)
+  else:
+    run_id = args.run or LatestRun(db)
+  if run_id is None:
+    print("Error: no runs in " + args.db)
+    exit(1)
+  if args.command == "totals":
+    PrintTotals(db, run_id)
+  elif args.command == "unsupported":
+    for reason, count in UnsupportedByReason(db, run_id):
+      print("%5d  %s" % (count, reason or "(no reason given)"))
+  else:
+    for case, test in Xfails(db, run_id):
+      print("%s,%s" % (case, test))
+
+
+if __name__ == "__main__":
+  main()
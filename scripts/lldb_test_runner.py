@@ -0,0 +1,313 @@
+#!/usr/bin/env python
+
+"""Run the lldb test suite in parallel shards.
+
+Each directory of the dotest suite that has Test*.py files is a shard:
+dotest builds a directory's test programs in place, so the files of one
+directory can't run at the same time.  Shards run in a pool of workers,
+each dotest in its own temp dir and process group, and a shard that runs
+longer than --timeout is killed.  Shards are started longest first, by
+the durations recorded in the build dir by earlier runs, so the run takes
+about the total time divided by the number of jobs, plus the longest
+shard.
+
+The output of all shards is collected, in suite order, into one log,
+and the results are recorded in the build dir's test results database
+(see lldb_test_results.py).
+
+A failing shard whose failures are all tests that lldb_test_quarantine.py
+found to be flaky is run again; if a retry passes, the shard is reported
+as flaky rather than failing the run.  The first attempt is what gets
+recorded, so the history keeps an unbiased record of the flakiness.
+Test directories it found to have slowed down recently are started by
+their recent duration and get a timeout of at least twice that, so a
+slowdown shows up as a slow shard rather than as a timeout.
+
+Run from the root of a cmake build dir, or see lldb_test_runner.py -h.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import lldb_test_quarantine
+import lldb_test_results
+import lldb_utils
+
+
+DURATIONS_FILE = "lldb-test-durations.json"
+SESSION_DIR = "lldb-test-traces"
+
+# Assumed duration of shards that haven't run before; they go first, as
+# new tests are as likely to be slow as not.
+_UNKNOWN_DURATION = float("inf")
+
+# A shard quarantined as slow may run this many times its recent duration
+# before it is killed, if that is longer than --timeout.
+_SLOW_TIMEOUT_FACTOR = 2.0
+
+_TEST_FILE_RE = re.compile(r"^Test.*\.py$")
+
+
+class ShardResult(object):
+  """The outcome of running dotest on one test directory."""
+
+  def __init__(self, shard, status, duration, timed_out, log):
+    self.shard = shard
+    self.status = status
+    self.duration = duration
+    self.timed_out = timed_out
+    self.log = log
+    # failed, but passed when retried
+    self.flaky = False
+
+
+def ParseCommandLine():
+  """Parse the command line and return a parser results object."""
+  parser = argparse.ArgumentParser(
+      description="Run the lldb test suite in parallel shards.")
+
+  parser.add_argument(
+      "-b", "--build-dir", action="store", dest="build_dir", default=".",
+      help="cmake build dir whose lldb to test (default: current dir)")
+  parser.add_argument(
+      "-j", "--jobs", action="store", dest="jobs", type=int,
+      default=lldb_utils.LocalCpuCount(),
+      help="number of shards to run at once (default: cpu count)")
+  parser.add_argument(
+      "-t", "--timeout", action="store", dest="timeout", type=float,
+      default=900,
+      help="seconds after which a shard is killed (default: 900)")
+  parser.add_argument(
+      "-r", "--retries", action="store", dest="retries", type=int, default=1,
+      help=("times to rerun a failing test directory whose failures are all "
+            "quarantined flaky tests (default: 1)"))
+  parser.add_argument(
+      "-q", "--quarantine", action="store", dest="quarantine",
+      help=("flaky test list from lldb_test_quarantine.py (default: "
+            "lldb-test-quarantine.json in the build dir)"))
+  parser.add_argument(
+      "-p", "--pattern", action="store", dest="pattern",
+      help="only run test files matching this regexp (as dotest -p)")
+  parser.add_argument(
+      "--compiler", action="store", dest="compiler", default="gcc",
+      help="compiler to build the test programs with (default: gcc)")
+  parser.add_argument(
+      "-o", "--log", action="store", dest="log",
+      default="lldb-test.log",
+      help="file to collect the output of all shards in "
+           "(default: lldb-test.log in the build dir)")
+  parser.add_argument(
+      "dotest_args", nargs=argparse.REMAINDER,
+      help="extra arguments for dotest.py, after --")
+
+  args = parser.parse_args()
+  if args.dotest_args and args.dotest_args[0] == "--":
+    args.dotest_args = args.dotest_args[1:]
+  return args
+
+
+def DiscoverShards(test_dir, pattern=None):
+  """Return the test directories to run, relative to test_dir.
+
+  Args:
+    test_dir: the dotest suite, llvm/tools/lldb/test.
+    pattern: if given, only directories with a test file matching it.
+
+  Returns:
+    The sorted list of directories that contain Test*.py files.
+
+  """
+  pattern_re = re.compile(pattern) if pattern else None
+  shards = []
+  for dirpath, dirnames, filenames in os.walk(test_dir):
+    dirnames.sort()
+    tests = [f for f in filenames if _TEST_FILE_RE.match(f)]
+    if pattern_re:
+      tests = [f for f in tests if pattern_re.search(f)]
+    if tests:
+      shards.append(os.path.relpath(dirpath, test_dir))
+  return sorted(shards)
+
+
+def ReadDurations(build_dir):
+  """Return the recorded seconds per shard from earlier runs."""
+  try:
+    with open(os.path.join(build_dir, DURATIONS_FILE)) as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return {}
+
+
+def WriteDurations(build_dir, durations):
+  path = os.path.join(build_dir, DURATIONS_FILE)
+  with open(path + ".tmp", "w") as f:
+    json.dump(durations, f, indent=1, sort_keys=True)
+  os.rename(path + ".tmp", path)
+
+
+def _KillGroup(process, killed):
+  killed.set()
+  try:
+    os.killpg(process.pid, signal.SIGKILL)
+  except OSError:
+    pass
+
+
+def RunShard(shard, args, test_dir, build_dir, timeout):
+  """Run dotest on one test directory in a temp dir of its own.
+
+  dotest's session traces go to lldb-test-traces/<shard> in the build dir,
+  and dotest is killed if it runs longer than timeout seconds.
+
+  Returns:
+    A ShardResult.
+
+  """
+  temp_dir = tempfile.mkdtemp(prefix="lldb-test-")
+  env = dict(os.environ)
+  env["TMPDIR"] = temp_dir
+  command = [sys.executable, "dotest.py",
+             "--executable=" + os.path.join(build_dir, "bin", "lldb"),
+             "--compiler=" + args.compiler,
+             "-s", os.path.join(build_dir, SESSION_DIR, shard)]
+  if args.pattern:
+    command += ["-p", args.pattern]
+  command += args.dotest_args + [shard]
+
+  log_path = os.path.join(temp_dir, "output.log")
+  start = time.time()
+  with open(log_path, "w") as log:
+    # own process group, so a timeout also kills the inferiors
+    process = subprocess.Popen(command, cwd=test_dir, env=env,
+                               stdout=log, stderr=subprocess.STDOUT,
+                               preexec_fn=os.setsid)
+    killed = threading.Event()
+    timer = threading.Timer(timeout, _KillGroup, [process, killed])
+    timer.start()
+    try:
+      status = process.wait()
+    finally:
+      timer.cancel()
+      timer.join()
+  duration = time.time() - start
+  timed_out = killed.is_set()
+
+  with open(log_path) as log:
+    output = log.read()
+  shutil.rmtree(temp_dir, ignore_errors=True)
+  if timed_out:
+    output += "\nTIMEOUT: %s killed after %d seconds\n" % (shard, timeout)
+  return ShardResult(shard, status, duration, timed_out, output)
+
+
+def main():
+  args = ParseCommandLine()
+  build_dir = os.path.abspath(args.build_dir)
+  lldb_exe = os.path.join(build_dir, "bin", "lldb")
+  test_dir = os.path.realpath(
+      os.path.join(build_dir, "..", "llvm", "tools", "lldb", "test"))
+  if not os.path.exists(lldb_exe):
+    print("Error: no lldb in build dir: " + lldb_exe)
+    exit(1)
+
+  shards = DiscoverShards(test_dir, args.pattern)
+  if not shards:
+    print("Error: no tests found in " + test_dir)
+    exit(1)
+
+  quarantine = lldb_test_quarantine.ReadQuarantine(
+      args.quarantine or os.path.join(
+          build_dir, lldb_test_quarantine.QUARANTINE_FILE))
+  flaky_tests = set(quarantine["flaky"])
+  slow = dict((shard, stats["recent"])
+              for shard, stats in quarantine.get("slow", {}).items())
+  timeouts = dict((shard, max(args.timeout,
+                              _SLOW_TIMEOUT_FACTOR * slow.get(shard, 0)))
+                  for shard in shards)
+
+  durations = ReadDurations(build_dir)
+  ordered = sorted(shards,
+                   key=lambda s: -max(durations.get(s, _UNKNOWN_DURATION),
+                                      slow.get(s, 0)))
+  print("Running %d test directories with %d jobs" % (len(shards), args.jobs))
+  extended = [s for s in shards if timeouts[s] > args.timeout]
+  if extended:
+    print("%d slower test directories get longer timeouts" % len(extended))
+
+  lock = threading.Lock()
+  done = []
+
+  def Run(shard):
+    result = RunShard(shard, args, test_dir, build_dir, timeouts[shard])
+    if result.status != 0 and not result.timed_out:
+      failures = set(test_id for test_id, outcome, _
+                     in lldb_test_results.ParseResults(result.log)
+                     if outcome in ("FAIL", "ERROR"))
+      if failures and failures <= flaky_tests:
+        for _ in range(args.retries):
+          if RunShard(shard, args, test_dir, build_dir,
+                      timeouts[shard]).status == 0:
+            result.flaky = True
+            break
+    with lock:
+      done.append(shard)
+      state = ("TIMEOUT" if result.timed_out
+               else "FLAKY" if result.flaky
+               else "ok" if result.status == 0 else "FAILED")
+      print("[%d/%d] %-7s %6.1fs  %s" % (len(done), len(shards), state,
+                                         result.duration, shard))
+    return result
+
+  start = time.time()
+  results = lldb_utils.RunParallel(Run, ordered, args.jobs)
+  elapsed = time.time() - start
+
+  db = lldb_test_results.Connect(
+      os.path.join(build_dir, lldb_test_results.DB_FILE))
+  run_id = lldb_test_results.RecordRun(
+      db, [(r.shard, r.status, r.duration, r.log) for r in results],
+      build_dir=build_dir, started=start,
+      **lldb_test_results.Revisions(test_dir))
+
+  # Keep the durations of shards this run didn't include.  A timed out
+  # shard's is a lower bound, which still schedules it early next time.
+  for result in results:
+    durations[result.shard] = round(result.duration, 1)
+  WriteDurations(build_dir, durations)
+
+  by_shard = dict((r.shard, r) for r in results)
+  log_path = os.path.join(build_dir, args.log)
+  with open(log_path, "w") as log:
+    for shard in shards:
+      log.write(by_shard[shard].log)
+
+  failed = [r for r in results if r.status != 0 and not r.flaky]
+  longest = max(results, key=lambda r: r.duration)
+  print("")
+  print("wall time %.1fs, total test time %.1fs, longest %.1fs (%s)"
+        % (elapsed, sum(r.duration for r in results), longest.duration,
+           longest.shard))
+  print("%d of %d test directories failed or timed out, %d flaky; output in %s"
+        % (len(failed), len(results), sum(r.flaky for r in results),
+           log_path))
+  print("results recorded as run %d in %s"
+        % (run_id, os.path.join(build_dir, lldb_test_results.DB_FILE)))
+  if failed:
+    exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,5 +1,7 @@
 # source this
 
+LLDB_TESTING_UTILS_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
 function lldb_skipped_linux_tests () {
     # Expects to be running from the lldb source dir (llvm/tools/lldb).
     find test -type f -name '*.py' | xargs grep @skipIfLinux 2>/dev/null | grep -v @skipIfLinuxClang 2>/dev/null | awk 'match($1, /^(.+):/, m) {print m[1]}' | sort | uniq
@@ -7,51 +9,19 @@ function lldb_skipped_linux_tests () {
 
 function lldb_run_test () {
     # Expects to  be running from the root of the build dir.
-    local TEST_SOURCE_DIR=`pwd`/../llvm/tools/lldb/test
+    # Runs the test files matching the pattern in $1 (all if none) in
+    # parallel shards; further arguments go to lldb_test_runner.py.
+    # The combined output goes to lldb-test.log.
     # assume cmake dir for now
-    local LLDB_EXE=`pwd`/bin/lldb
-    pushd $TEST_SOURCE_DIR
-    python dotest.py --executable=$LLDB_EXE --compiler=gcc -p $@
-    popd
+    python "$LLDB_TESTING_UTILS_DIR/lldb_test_runner.py" ${1:+-p "$1"} "${@:2}"
 }
 
 function lldb_collate_test_results () {
-    local PASS_COUNT="$(grep '^PASS: LLDB' $1 | wc -l)"
-    local XFAIL_COUNT="$(grep '^XFAIL: LLDB' $1 | wc -l)"
-    local FAIL_COUNT="$(grep '^FAIL: LLDB' $1 | wc -l)"
-
-    local TOTAL_RUN_COUNT=$(expr $PASS_COUNT + $XFAIL_COUNT + $FAIL_COUNT)
-    local PASS_PERCENT=$(echo "( $PASS_COUNT * 100.0 ) / $TOTAL_RUN_COUNT" | bc -l)
-    local XFAIL_PERCENT=$(echo "( $XFAIL_COUNT * 100.0 ) / $TOTAL_RUN_COUNT" | bc -l)
-    local FAIL_PERCENT=$(echo "( $FAIL_COUNT * 100.0 ) / $TOTAL_RUN_COUNT" | bc -l)
-
-    local UNSUPPORTED_COUNT="$(grep '^UNSUPPORTED: LLDB' $1 | wc -l)"
-    local UNSUPPORTED_DARWIN_COUNT="$(grep '^UNSUPPORTED: LLDB' $1 | grep "requires Darwin" | wc -l)"
-    local UNSUPPORTED_SKIP_LINUX_COUNT="$(grep '^UNSUPPORTED: LLDB' $1 | grep "skip on linux" | wc -l)"
-    local UNSUPPORTED_OTHER_COUNT="$(grep '^UNSUPPORTED: LLDB' $1 | grep -v "requires Darwin" | grep -v "skip on linux" | wc -l)"
-
-    local UNSUPPORTED_DARWIN_PERCENT=$(echo "( $UNSUPPORTED_DARWIN_COUNT * 100.0 ) / $UNSUPPORTED_COUNT" | bc -l)
-    local UNSUPPORTED_SKIP_LINUX_PERCENT=$(echo "( $UNSUPPORTED_SKIP_LINUX_COUNT * 100.0 ) / $UNSUPPORTED_COUNT" | bc -l)
-    local UNSUPPORTED_OTHER_PERCENT=$(echo "( $UNSUPPORTED_OTHER_COUNT * 100.0 ) / $UNSUPPORTED_COUNT" | bc -l)
-
-
-    echo "======"
-    echo "TOTALS"
-    echo "======"
-    printf "pass:  %4d (%5.2f%% of tests run)\n" $PASS_COUNT $PASS_PERCENT
-    printf "xfail: %4d (%5.2f%% of tests run)\n" $XFAIL_COUNT $XFAIL_PERCENT
-    printf "fail:  %4d (%5.2f%% of tests run)\n" $FAIL_COUNT $FAIL_PERCENT
-    echo ""
-    echo "==========="
-    echo "UNSUPPORTED"
-    echo "==========="
-    printf "unsupported (total):       %4d\n" $UNSUPPORTED_COUNT
-    printf "unsupported (Darwin-only): %4d (%5.2f%% of unsupported tests)\n" $UNSUPPORTED_DARWIN_COUNT $UNSUPPORTED_DARWIN_PERCENT
-    printf "unsupported (skip linux):  %4d (%5.2f%% of unsupported tests)\n" $UNSUPPORTED_SKIP_LINUX_COUNT $UNSUPPORTED_SKIP_LINUX_PERCENT
-    printf "unsupported (other):       %4d (%5.2f%% of unsupported tests)\n" $UNSUPPORTED_OTHER_COUNT $UNSUPPORTED_OTHER_PERCENT
+    # With a dotest log in $1, report on it (recording it if new); without,
+    # report on the latest run recorded in the build dir's results database.
+    python "$LLDB_TESTING_UTILS_DIR/lldb_test_results.py" totals ${1:+--log "$1"}
 }
 
 function lldb_test_list_xfail () {
-    grep '^XFAIL: LLDB' $1 | awk 'match($0,":: ([A-Za-z0-9_]+) \\(([A-Za-z0-9_\\.]+)\\)", m) { printf "%s,%s\n", m[2], m[1] }'
+    python "$LLDB_TESTING_UTILS_DIR/lldb_test_results.py" xfail ${1:+--log "$1"}
 }
-
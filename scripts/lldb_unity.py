@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""Unity (jumbo) build support for lldb's libraries.
+
+lldb_configure.py --unity uses this to have cmake merge the sources of
+each lldb library directory into batches.  Batch sizes are tuned per
+directory from the per-file compile times that an earlier non-unity
+build recorded in its .ninja_log, so that every batch takes roughly the
+same time.  Sources that break when merged are listed in
+support/lldb_unity_exclude.txt.
+
+Usage:
+  lldb_unity.py plan BASELINE_BUILD_DIR
+      print the batch size chosen for each library directory.
+  lldb_unity.py report BASELINE_BUILD_DIR UNITY_BUILD_DIR
+      compare the total lldb compile time of the two builds.
+
+Unity builds need cmake 3.19 or newer.
+
+"""
+
+
+from __future__ import print_function
+
+import argparse
+import os
+
+import lldb_ninja
+
+
+EXCLUDE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            "support", "lldb_unity_exclude.txt")
+
+# The hook runs its code with cmake_language(DEFER).
+CMAKE_MIN_VERSION = (3, 19)
+
+# Batch size to use for directories without timing data.
+DEFAULT_BATCH_SIZE = 8
+
+# Aim for batches that take about this long, within these bounds.
+_TARGET_BATCH_SECONDS = 30.0
+_MIN_BATCH_SIZE = 2
+_MAX_BATCH_SIZE = 32
+
+_LLDB_PREFIX = "tools/lldb/"
+
+
+def _Median(values):
+  values = sorted(values)
+  middle = len(values) // 2
+  if len(values) % 2:
+    return values[middle]
+  return (values[middle - 1] + values[middle]) / 2.0
+
+
+def PlanBatchSizes(baseline_build_dir):
+  """Choose a unity batch size for each lldb source directory.
+
+  Args:
+    baseline_build_dir: a non-unity ninja build dir whose .ninja_log has
+      the compile time of each lldb source.
+
+  Returns:
+    A dict of source dir (relative to llvm) to batch size.
+
+  """
+  sizes = {}
+  for source_dir, times in lldb_ninja.CompileTimes(
+      baseline_build_dir, _LLDB_PREFIX).items():
+    median = _Median(list(times.values()))
+    size = int(round(_TARGET_BATCH_SECONDS / max(median, 0.1)))
+    # Leave at least two batches per directory to keep cores busy.
+    size = min(size, max(_MIN_BATCH_SIZE, len(times) // 2))
+    sizes[source_dir] = max(_MIN_BATCH_SIZE, min(_MAX_BATCH_SIZE, size))
+  return sizes
+
+
+def ReadExclusions(path=EXCLUDE_FILE):
+  """Return the sources (relative to llvm) listed in an exclusion file."""
+  exclusions = []
+  with open(path) as f:
+    for line in f:
+      line = line.split("#", 1)[0].strip()
+      if line:
+        exclusions.append(line)
+  return exclusions
+
+
+def _CmakeList(values):
+  return " ".join('"%s"' % v.replace(os.sep, "/") for v in values)
+
+
+def CmakeHook(batch_sizes, exclusions):
+  """Return cmake code that turns on unity builds for lldb's libraries.
+
+  The code is meant for CMAKE_PROJECT_INCLUDE.  It defers the work to the
+  end of the top-level directory, when all lldb targets exist, and then
+  walks the lldb directories cmake processed.
+
+  Args:
+    batch_sizes: source dir => batch size, from PlanBatchSizes().
+    exclusions: sources to leave out of unity batches.
+
+  Returns:
+    The cmake code, as a string.
+
+  """
+  lines = [
+      "# lldb unity build (lldb_unity.py)",
+      "function(_lldb_unity_dir dir)",
+      '  file(RELATIVE_PATH rel "${CMAKE_SOURCE_DIR}" "${dir}")',
+      '  if(rel MATCHES "^tools/lldb/(source|tools)(/|$)")',
+      "    list(FIND _lldb_unity_dirs \"${rel}\" index)",
+      "    if(index EQUAL -1)",
+      "      set(batch_size %d)" % DEFAULT_BATCH_SIZE,
+      "    else()",
+      "      list(GET _lldb_unity_sizes ${index} batch_size)",
+      "    endif()",
+      '    get_property(targets DIRECTORY "${dir}" PROPERTY BUILDSYSTEM_TARGETS)',
+      "    foreach(target ${targets})",
+      "      get_target_property(type ${target} TYPE)",
+      '      if(type MATCHES "^(STATIC|SHARED|MODULE|OBJECT)_LIBRARY$" OR'
+      ' type STREQUAL "EXECUTABLE")',
+      "        set_target_properties(${target} PROPERTIES",
+      "          UNITY_BUILD ON UNITY_BUILD_BATCH_SIZE ${batch_size})",
+      "        get_target_property(sources ${target} SOURCES)",
+      "        foreach(source ${sources})",
+      '          get_filename_component(path "${source}" ABSOLUTE'
+      ' BASE_DIR "${dir}")',
+      '          file(RELATIVE_PATH source_rel "${CMAKE_SOURCE_DIR}" "${path}")',
+      '          list(FIND _lldb_unity_exclude "${source_rel}" index)',
+      "          if(NOT index EQUAL -1)",
+      '            set_source_files_properties("${path}" DIRECTORY "${dir}"',
+      "              PROPERTIES SKIP_UNITY_BUILD_INCLUSION ON)",
+      "          endif()",
+      "        endforeach()",
+      "      endif()",
+      "    endforeach()",
+      "  endif()",
+      '  get_property(subdirs DIRECTORY "${dir}" PROPERTY SUBDIRECTORIES)',
+      "  foreach(subdir ${subdirs})",
+      '    _lldb_unity_dir("${subdir}")',
+      "  endforeach()",
+      "endfunction()",
+      "function(_lldb_unity_apply)",
+      '  _lldb_unity_dir("${CMAKE_SOURCE_DIR}")',
+      "endfunction()",
+      "get_property(_lldb_unity_hooked GLOBAL PROPERTY LLDB_UNITY_HOOKED)",
+      "if(NOT _lldb_unity_hooked)",
+      "  set_property(GLOBAL PROPERTY LLDB_UNITY_HOOKED ON)",
+      "  set(_lldb_unity_dirs %s)" % _CmakeList(sorted(batch_sizes)),
+      "  set(_lldb_unity_sizes %s)" % " ".join(
+          str(batch_sizes[d]) for d in sorted(batch_sizes)),
+      "  set(_lldb_unity_exclude %s)" % _CmakeList(exclusions),
+      '  cmake_language(DEFER DIRECTORY "${CMAKE_SOURCE_DIR}"'
+      " CALL _lldb_unity_apply)",
+      "endif()",
+  ]
+  return "\n".join(lines) + "\n"
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description="Plan and evaluate lldb unity builds.")
+  subparsers = parser.add_subparsers(dest="command")
+  plan = subparsers.add_parser(
+      "plan", help="print the batch size for each lldb library directory")
+  plan.add_argument("baseline", help="non-unity ninja build dir")
+  report = subparsers.add_parser(
+      "report", help="compare compile time against a non-unity build")
+  report.add_argument("baseline", help="non-unity ninja build dir")
+  report.add_argument("unity", help="unity ninja build dir")
+  args = parser.parse_args()
+
+  if args.command == "plan":
+    sizes = PlanBatchSizes(args.baseline)
+    for source_dir in sorted(sizes):
+      print("%3d  %s" % (sizes[source_dir], source_dir))
+  else:
+    lldb_ninja.PrintTimeComparison(
+        "unity",
+        lldb_ninja.CompileTimes(args.baseline, _LLDB_PREFIX),
+        lldb_ninja.CompileTimes(args.unity, _LLDB_PREFIX))
+
+
+if __name__ == "__main__":
+  main()
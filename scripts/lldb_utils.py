@@ -7,11 +7,18 @@ PrintRemoveTreeCommandForPath -- print a command to remove a path.
 RequireProdaccess -- abort if prodaccess is not up to date.
 RunInDirectory -- call given command in given directory.
 FullPlatformName -- Return full platform, e.g., linux-x86_64.
+RunParallel -- call a function on many items using a thread pool.
+FileDigest -- Return the SHA-1 hex digest of a file's contents.
+LocalCpuCount -- Return the number of cpus on this machine.
+LocalMemoryBytes -- Return the physical (or available) memory size.
 
 """
 
 
 import calendar
+import hashlib
+import multiprocessing
+import multiprocessing.pool
 import os
 import platform
 import re
@@ -200,3 +207,67 @@ def FullPlatformName():
     return "linux-" + platform.processor()
   else:
     raise TypeError("Unsupported architecture: " + sys.platform)
+
+
+def RunParallel(function, items, jobs=None):
+  """Call function on every item concurrently.
+
+  A thread pool is used, so this suits work that mostly waits on
+  subprocesses, the network or the file system.  Items are handed out
+  one at a time in order, so putting the slowest first shortens the run.
+
+  Args:
+    function: called once per item, with the item as its only argument.
+    items: the items to process.
+    jobs: the maximum number of concurrent calls (default: cpu count).
+
+  Returns:
+    The list of values returned by function, in the same order as items.
+
+  """
+  items = list(items)
+  if not items:
+    return []
+  if not jobs:
+    jobs = multiprocessing.cpu_count()
+  pool = multiprocessing.pool.ThreadPool(min(jobs, len(items)))
+  try:
+    return pool.map(function, items, chunksize=1)
+  finally:
+    pool.close()
+    pool.join()
+
+
+def FileDigest(path):
+  """Return the SHA-1 hex digest of the contents of the given file."""
+  digest = hashlib.sha1()
+  with open(path, "rb") as f:
+    for block in iter(lambda: f.read(1 << 16), b""):
+      digest.update(block)
+  return digest.hexdigest()
+
+
+def LocalCpuCount():
+  """Return the number of cpus on this machine."""
+  return multiprocessing.cpu_count()
+
+
+def LocalMemoryBytes(available=False):
+  """Return the size of this machine's memory in bytes.
+
+  Args:
+    available: if True, return the memory currently available for new
+      processes (MemAvailable on Linux) rather than the total.
+
+  Returns:
+    The memory size in bytes.
+
+  """
+  try:
+    with open("/proc/meminfo") as meminfo:
+      fields = dict(line.split(":", 1) for line in meminfo if ":" in line)
+    field = "MemAvailable" if available and "MemAvailable" in fields \
+            else "MemTotal"
+    return int(fields[field].split()[0]) * 1024
+  except (IOError, OSError, KeyError, ValueError):
+    return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
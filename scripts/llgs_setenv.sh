@@ -15,9 +15,10 @@ if [ "$1" == "-u" ]; then
     unset LLDB_DEBUGSERVER_EXTRA_ARG_3
     unset LLDB_DEBUGSERVER_EXTRA_ARG_4
 else
-    # Set up LLGS environment variables for logging.
+    # Set up LLGS environment variables for logging.  Packets are logged
+    # with time stamps (-T) for lldb_packet_profile.py.
     export LLDB_DEBUGSERVER_EXTRA_ARG_1="-c"
-    export LLDB_DEBUGSERVER_EXTRA_ARG_2="log enable -f /tmp/llgs_packets.log gdb-remote packets process"
+    export LLDB_DEBUGSERVER_EXTRA_ARG_2="log enable -T -f /tmp/llgs_packets.log gdb-remote packets process"
     export LLDB_DEBUGSERVER_EXTRA_ARG_3="-c"
     export LLDB_DEBUGSERVER_EXTRA_ARG_4="log enable -f /tmp/llgs_process.log lldb process thread"
 fi
@@ -11,9 +11,22 @@ import select
 import sys
 import subprocess
 
+import lldb_profiles
+import lldb_unity
+
 _COMMON_SYNC_OPTS = "-avzh --delete"
 _COMMON_EXCLUDE_OPTS = "--exclude=DerivedData --exclude=.svn --exclude=.git --exclude=llvm-build/Release+Asserts"
 
+# cmake code for the profile's unity build, written into the remote build dir
+_HOOKS_FILENAME = "remote_build_hooks.cmake"
+
+# The configure profile (see lldb_profiles.py) used for each configuration
+# unless --profile says otherwise.
+_CONFIGURATION_PROFILES = {
+    "debug": "debug",
+    "release": "release",
+}
+
 def normalize_configuration(config_text):
     if not config_text:
         return "debug"
@@ -48,6 +61,10 @@ def parse_args():
         "--port", "-p",
         help="specify the port ssh should use to connect to the remote side",
         default=DEFAULT_SSH_PORT)
+    parser.add_argument(
+        "--profile",
+        choices=lldb_profiles.HostProfileNames(),
+        help="configure profile to build with (default: by configuration)")
     parser.add_argument(
         "--remote-address", "-r", metavar="REMOTE-ADDR",
         help="specify the dns name or ip address of the remote linux system",
@@ -59,7 +76,7 @@ def parse_args():
     parser.add_argument(
         "--use-gcc",
         action="store_true",
-        help="use gcc/g++ compiler (default: use clang)")
+        help="use gcc/g++ compiler (default: the profile's compiler)")
     parser.add_argument(
         "--user", "-u", help="specify the user name for the remote system",
         default=getpass.getuser())
@@ -95,6 +112,8 @@ def init_with_args(args):
     args.remote_build_dir = os.path.join(
         args.remote_dir,
         "build-%s" % args.configuration)
+    if not args.profile:
+        args.profile = _CONFIGURATION_PROFILES[args.configuration]
 
     # We assume the local lldb directory is really named 'lldb'.
     # This is because on the remote end, the local lldb root dir
@@ -152,23 +171,18 @@ def sync_lldb(args):
 
 def build_cmake_command(args):
     # args.remote_build_dir
-    # args.configuration in ('release', 'debug')
+    # args.profile names the configure profile to use
+    profile = lldb_profiles.GetProfile(args.profile)
 
-    if args.configuration == 'debug-optimized':
-        build_type_name = "RelWithDebInfo"
-    elif args.configuration == 'release':
-        build_type_name = "Release"
+    if profile.use_clang and not args.use_gcc:
+        cc_compiler = "clang"
+        cxx_compiler = "clang++"
     else:
-        build_type_name = "Debug"
-
-    if args.use_gcc:
         cc_compiler = "gcc"
         cxx_compiler = "g++"
-    else:
-        cc_compiler = "clang"
-        cxx_compiler = "clang"
 
-    ld_flags = "\"-lstdc++ -lm\""
+    cxx_flags = "\"%s\"" % lldb_profiles.CompilerFlags(profile)
+    ld_flags = "\"-lstdc++ -lm%s\"" % lldb_profiles.LinkerFlags(profile)
 
     install_dir = os.path.join(
         args.remote_build_dir, "..", "install-{}".format(args.configuration))
@@ -178,19 +192,64 @@ def build_cmake_command(args):
         "-GNinja",
         "-DCMAKE_CXX_COMPILER={}".format(cxx_compiler),
         "-DCMAKE_C_COMPILER={}".format(cc_compiler),
-        # "-DCMAKE_CXX_FLAGS=%s" % cxx_flags,
+        "-DCMAKE_CXX_FLAGS=%s" % cxx_flags,
         "-DCMAKE_SHARED_LINKER_FLAGS=%s" % ld_flags,
         "-DCMAKE_EXE_LINKER_FLAGS=%s" % ld_flags,
         "-DCMAKE_INSTALL_PREFIX:PATH=%s" % install_dir,
-        "-DCMAKE_BUILD_TYPE=%s" % build_type_name,
+        ]
+    if profile.use_ccache:
+        # the remote host's own ccache setup
+        command_line.extend([
+            "-DCMAKE_C_COMPILER_LAUNCHER=ccache",
+            "-DCMAKE_CXX_COMPILER_LAUNCHER=ccache"])
+    if profile.use_unity:
+        # written by maybe_configure
+        command_line.append("-DCMAKE_PROJECT_INCLUDE=%s" % os.path.join(
+            args.remote_build_dir, _HOOKS_FILENAME))
+    # unless the profile asks, assertions follow the build type as before
+    command_line.extend(lldb_profiles.CmakeDefines(
+        profile, set_assertions=profile.IsSet("enable_assertions")))
+    if profile.max_compile_jobs:
+        command_line.append(
+            "-DLLVM_PARALLEL_COMPILE_JOBS=%d" % profile.max_compile_jobs)
+    if profile.max_link_jobs:
+        command_line.append(
+            "-DLLVM_PARALLEL_LINK_JOBS=%d" % profile.max_link_jobs)
+    command_line.extend([
         "-Wno-dev",
         os.path.join("..", "llvm")
-        ]
+        ])
 
     return command_line
 
 
+def write_remote_hooks(args):
+    """Write the profile's unity build cmake code into the remote build dir.
+
+    There is no local baseline build to plan batch sizes from, so unity
+    batches get lldb_unity's default size.
+    """
+    hooks = "# Generated by remote-build.py.\n\n" + lldb_unity.CmakeHook(
+        {}, lldb_unity.ReadExclusions())
+    commandline = [
+        "ssh",
+        "-p", args.port,
+        "%s@%s" % (args.user, args.remote_address),
+        "mkdir", "-p", args.remote_build_dir, "&&",
+        "cat", ">", os.path.join(args.remote_build_dir, _HOOKS_FILENAME)]
+    if args.debug:
+        print("writing remote cmake hooks: {}".format(commandline))
+    proc = subprocess.Popen(commandline, stdin=subprocess.PIPE)
+    proc.communicate(hooks.encode("utf-8"))
+    return proc.returncode
+
+
 def maybe_configure(args):
+    if lldb_profiles.GetProfile(args.profile).use_unity:
+        result = write_remote_hooks(args)
+        if result != 0:
+            return result
+
     commandline = [
         "ssh",
         "-p", args.port,
@@ -15,8 +15,8 @@
 
 from __future__ import print_function
 
+import importlib
 import os
-import pickle
 import re
 import subprocess
 import sys
@@ -27,27 +27,49 @@ except ImportError:
 import time
 
 from pyversion import is_python3
-if is_python3():
-  import urllib.request
-  import urllib.error
-else:
-  import urllib2
-  import imp
-  urllib = imp.new_module('urllib')
-  urllib.request = urllib2
-  urllib.error = urllib2
-
 from signal import SIGTERM
 from error import GitError, UploadError
-from trace import Trace
+
+class _LazyModule(object):
+  """A module that is only imported when one of its attributes is used.
+
+  repo imports this file for every subcommand, and most of them only read
+  a few config values.  The network and serialization stacks (and the
+  repo modules that pull in more of them) are loaded on demand.
+  The first of `names` that can be imported is used.
+  """
+  def __init__(self, *names):
+    self._names = names
+    self._module = None
+
+  def __getattr__(self, attr):
+    if self._module is None:
+      for name in self._names[:-1]:
+        try:
+          self._module = importlib.import_module(name)
+          break
+        except ImportError:
+          pass
+      else:
+        self._module = importlib.import_module(self._names[-1])
+    return getattr(self._module, attr)
+
+pickle = _LazyModule('pickle')
 if is_python3():
-  from http.client import HTTPException
+  _urllib_request = _LazyModule('urllib.request')
+  _urllib_error = _LazyModule('urllib.error')
+  _http_client = _LazyModule('http.client')
 else:
-  from httplib import HTTPException
+  _urllib_request = _LazyModule('urllib2')
+  _urllib_error = _urllib_request
+  _http_client = _LazyModule('httplib')
+_trace = _LazyModule('trace')
+_git_command = _LazyModule('git_command')
 
-from git_command import GitCommand
-from git_command import ssh_sock
-from git_command import terminate_ssh_clients
+if is_python3():
+  _string_types = (str,)
+else:
+  _string_types = (basestring,)
 
 R_HEADS = 'refs/heads/'
 R_TAGS  = 'refs/tags/'
@@ -55,6 +77,17 @@ ID_RE = re.compile(r'^[0-9a-f]{40}$')
 
 REVIEW_CACHE = dict()
 
+# ssh_info answers are also kept on disk, so that later invocations of repo
+# can skip the HTTP round trip to each review server.  Servers that answered
+# NOT_AVAILABLE are remembered for a shorter time.
+REVIEW_DISK_CACHE = os.path.expanduser('~/.repopickle_review')
+REVIEW_CACHE_TTL = 24 * 60 * 60
+REVIEW_CACHE_NEGATIVE_TTL = 60 * 60
+_review_lock = _threading.Lock()
+_review_pending = {}
+# serializes the read-modify-write of REVIEW_DISK_CACHE between threads
+_review_disk_lock = _threading.Lock()
+
 def IsId(rev):
   return ID_RE.match(rev)
 
@@ -263,7 +296,7 @@ class GitConfig(object):
     except OSError:
       return None
     try:
-      Trace(': unpickle %s', self.file)
+      _trace.Trace(': unpickle %s', self.file)
       fd = open(self._pickle, 'rb')
       try:
         return pickle.load(fd)
@@ -323,16 +356,92 @@ class GitConfig(object):
     command = ['config', '--file', self.file]
     command.extend(args)
 
-    p = GitCommand(None,
-                   command,
-                   capture_stdout = True,
-                   capture_stderr = True)
+    p = _git_command.GitCommand(None,
+                               command,
+                               capture_stdout = True,
+                               capture_stderr = True)
     if p.Wait() == 0:
       return p.stdout
     else:
       GitError('git config %s: %s' % (str(args), p.stderr))
 
 
+def _RunInThreads(func, items, jobs):
+  """Call func on every item using up to `jobs` threads.
+
+  The first exception raised by func is re-raised once all threads finish.
+  """
+  items = iter(items)
+  lock = _threading.Lock()
+  errors = []
+
+  def _Worker():
+    while True:
+      lock.acquire()
+      try:
+        item = next(items, _RunInThreads)
+      finally:
+        lock.release()
+      if item is _RunInThreads:
+        return
+      try:
+        func(item)
+      except Exception as e:
+        errors.append(e)
+
+  threads = [_threading.Thread(target=_Worker) for _ in range(max(1, jobs))]
+  for t in threads:
+    t.start()
+  for t in threads:
+    t.join()
+  if errors:
+    raise errors[0]
+
+
+class GitConfigSet(object):
+  """The configurations of many repositories, read and queried together.
+
+  Every repository shares one defaults object (normally the parsed
+  ~/.gitconfig), and the per-repository files are read concurrently, one
+  `git config` process per repository, the first time they are queried.
+  """
+
+  def __init__(self, gitdirs, defaults=None, jobs=8):
+    if defaults is None:
+      defaults = GitConfig.ForUser()
+    self.defaults = defaults
+    self.gitdirs = list(gitdirs)
+    self.configs = [GitConfig.ForRepository(d, defaults = defaults)
+                    for d in self.gitdirs]
+    self._jobs = jobs
+    self._loaded = False
+
+  def _Load(self):
+    if self._loaded:
+      return
+    if self.defaults is not None:
+      # Parse the shared defaults once, before the workers need them.
+      self.defaults.Has('')
+    _RunInThreads(lambda c: c.Has(''), self.configs, self._jobs)
+    self._loaded = True
+
+  def Query(self, names, all_keys=False):
+    """Look up one or more keys in every repository.
+
+    Returns the answer in columns: a dict with a 'gitdir' list naming each
+    repository, and for each key a list holding that repository's value
+    (see GetString) at the same index.
+    """
+    if isinstance(names, _string_types):
+      names = [names]
+    self._Load()
+    columns = {'gitdir': list(self.gitdirs)}
+    for name in names:
+      columns[name] = [c.GetString(name, all_keys = all_keys)
+                       for c in self.configs]
+    return columns
+
+
 class RefSpec(object):
   """A Git refspec line, split into its components:
 
@@ -391,9 +500,38 @@ class RefSpec(object):
 
 _master_processes = []
 _master_keys = set()
+_master_starts = {}
 _ssh_master = True
 _master_keys_lock = None
 
+# How long to wait for a freshly spawned master to answer on its control
+# socket, and the first and last interval between polls while waiting.
+_MASTER_READY_TIMEOUT = 10.0
+_MASTER_POLL_MIN = 0.01
+_MASTER_POLL_MAX = 0.2
+
+class _Pending(object):
+  """The eventual result of work that one thread does on behalf of many.
+
+  The first thread to need the result creates this object and does the
+  work; every other thread that needs the same result calls Wait().
+  """
+  def __init__(self):
+    self._done = _threading.Event()
+    self._result = None
+    self._error = None
+
+  def Finish(self, result=None, error=None):
+    self._result = result
+    self._error = error
+    self._done.set()
+
+  def Wait(self):
+    self._done.wait()
+    if self._error is not None:
+      raise self._error
+    return self._result
+
 def init_ssh():
   """Should be called once at the start of repo to init ssh master handling.
 
@@ -403,86 +541,131 @@ def init_ssh():
   assert _master_keys_lock is None, "Should only call init_ssh once"
   _master_keys_lock = _threading.Lock()
 
-def _open_ssh(host, port=None):
+def _ssh_check(check_command):
+  """Return True if `ssh -O check` finds a master on the control socket."""
+  try:
+    _trace.Trace(': %s', ' '.join(check_command))
+    check_process = subprocess.Popen(check_command,
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE)
+    check_process.communicate() # read output, but ignore it...
+    return check_process.wait() == 0
+  except Exception:
+    # Ignore excpetions.  We we will fall back to the normal command and print
+    # to the log there.
+    return False
+
+def _wait_for_master(p, check_command):
+  """Poll the control socket until the master started as `p` accepts clients.
+
+  Returns False if the master exits before it becomes ready.  If it is still
+  starting when _MASTER_READY_TIMEOUT runs out we give up waiting and let
+  the caller's ssh fall back to a direct connection.
+  """
+  deadline = time.time() + _MASTER_READY_TIMEOUT
+  delay = _MASTER_POLL_MIN
+  while time.time() < deadline:
+    if p.poll() is not None:
+      return False
+    if _ssh_check(check_command):
+      return True
+    time.sleep(delay)
+    delay = min(delay * 2, _MASTER_POLL_MAX)
+  return True
+
+def _start_ssh_master(host, port):
   global _ssh_master
 
-  # Acquire the lock.  This is needed to prevent opening multiple masters for
-  # the same host when we're running "repo sync -jN" (for N > 1) _and_ the
-  # manifest <remote fetch="ssh://xyz"> specifies a different host from the
-  # one that was passed to repo init.
+  # We will make two calls to ssh; this is the common part of both calls.
+  command_base = ['ssh',
+                   '-o','ControlPath %s' % _git_command.ssh_sock(),
+                   host]
+  if port is not None:
+    command_base[1:1] = ['-p', str(port)]
+
+  # Since the key wasn't in _master_keys, we think that master isn't running.
+  # ...but before actually starting a master, we'll double-check.  This can
+  # be important because we can't tell that that 'git@myhost.com' is the same
+  # as 'myhost.com' where "User git" is setup in the user's ~/.ssh/config file.
+  check_command = command_base + ['-O','check']
+  if _ssh_check(check_command):
+    # Our double-check found that the master _was_ infact running.
+    return True
+
+  command = command_base[:1] + \
+            ['-M', '-N'] + \
+            command_base[1:]
+  try:
+    _trace.Trace(': %s', ' '.join(command))
+    p = subprocess.Popen(command)
+  except Exception as e:
+    _ssh_master = False
+    print('\nwarn: cannot enable ssh control master for %s:%s\n%s'
+           % (host,port, str(e)), file=sys.stderr)
+    return False
+
   _master_keys_lock.acquire()
   try:
+    _master_processes.append(p)
+  finally:
+    _master_keys_lock.release()
+  return _wait_for_master(p, check_command)
 
-    # Check to see whether we already think that the master is running; if we
-    # think it's already running, return right away.
-    if port is not None:
-      key = '%s:%s' % (host, port)
-    else:
-      key = host
+def _open_ssh(host, port=None):
+  # Check to see whether we already think that the master is running, or is
+  # being started by another thread.  The lock only guards this bookkeeping;
+  # the (slow) startup itself runs unlocked, so that "repo sync -jN" can
+  # bring up masters for different hosts in parallel while workers that need
+  # the same host all wait on the one startup.
+  if port is not None:
+    key = '%s:%s' % (host, port)
+  else:
+    key = host
 
+  _master_keys_lock.acquire()
+  try:
     if key in _master_keys:
       return True
 
-    if not _ssh_master \
-    or 'GIT_SSH' in os.environ \
-    or sys.platform in ('win32', 'cygwin'):
-      # failed earlier, or cygwin ssh can't do this
-      #
-      return False
-
-    # We will make two calls to ssh; this is the common part of both calls.
-    command_base = ['ssh',
-                     '-o','ControlPath %s' % ssh_sock(),
-                     host]
-    if port is not None:
-      command_base[1:1] = ['-p', str(port)]
-
-    # Since the key wasn't in _master_keys, we think that master isn't running.
-    # ...but before actually starting a master, we'll double-check.  This can
-    # be important because we can't tell that that 'git@myhost.com' is the same
-    # as 'myhost.com' where "User git" is setup in the user's ~/.ssh/config file.
-    check_command = command_base + ['-O','check']
-    try:
-      Trace(': %s', ' '.join(check_command))
-      check_process = subprocess.Popen(check_command,
-                                       stdout=subprocess.PIPE,
-                                       stderr=subprocess.PIPE)
-      check_process.communicate() # read output, but ignore it...
-      isnt_running = check_process.wait()
-
-      if not isnt_running:
-        # Our double-check found that the master _was_ infact running.  Add to
-        # the list of keys.
-        _master_keys.add(key)
-        return True
-    except Exception:
-      # Ignore excpetions.  We we will fall back to the normal command and print
-      # to the log there.
-      pass
+    pending = _master_starts.get(key)
+    if pending is None:
+      if not _ssh_master \
+      or 'GIT_SSH' in os.environ \
+      or sys.platform in ('win32', 'cygwin'):
+        # failed earlier, or cygwin ssh can't do this
+        #
+        return False
+      pending = _Pending()
+      _master_starts[key] = pending
+      owner = True
+    else:
+      owner = False
+  finally:
+    _master_keys_lock.release()
 
-    command = command_base[:1] + \
-              ['-M', '-N'] + \
-              command_base[1:]
-    try:
-      Trace(': %s', ' '.join(command))
-      p = subprocess.Popen(command)
-    except Exception as e:
-      _ssh_master = False
-      print('\nwarn: cannot enable ssh control master for %s:%s\n%s'
-             % (host,port, str(e)), file=sys.stderr)
-      return False
+  if not owner:
+    return pending.Wait()
 
-    _master_processes.append(p)
-    _master_keys.add(key)
-    time.sleep(1)
-    return True
+  started = False
+  try:
+    started = _start_ssh_master(host, port)
   finally:
-    _master_keys_lock.release()
+    # Forget the startup before waking the waiters, so a failed one is
+    # tried again by the next caller rather than failing it too.
+    _master_keys_lock.acquire()
+    try:
+      if started:
+        _master_keys.add(key)
+      del _master_starts[key]
+    finally:
+      _master_keys_lock.release()
+    pending.Finish(started)
+  return started
 
 def close_ssh():
   global _master_keys_lock
 
-  terminate_ssh_clients()
+  _git_command.terminate_ssh_clients()
 
   for p in _master_processes:
     try:
@@ -492,8 +675,9 @@ def close_ssh():
       pass
   del _master_processes[:]
   _master_keys.clear()
+  _master_starts.clear()
 
-  d = ssh_sock(create=False)
+  d = _git_command.ssh_sock(create=False)
   if d:
     try:
       os.rmdir(os.path.dirname(d))
@@ -532,6 +716,136 @@ def _preconnect(url):
 
   return False
 
+def _ReadReviewCache():
+  """Load the on-disk ssh_info cache, or an empty one if it is unusable.
+
+  A cache that doesn't unpickle to a dict (truncated, or written by
+  something else) is deleted, so it is rewritten from scratch.
+  """
+  try:
+    fd = open(REVIEW_DISK_CACHE, 'rb')
+  except (IOError, OSError):
+    return {}
+  try:
+    try:
+      cache = pickle.load(fd)
+    finally:
+      fd.close()
+  except Exception:
+    cache = None
+  if not isinstance(cache, dict):
+    try:
+      os.remove(REVIEW_DISK_CACHE)
+    except OSError:
+      pass
+    return {}
+  return cache
+
+def _SaveReviewCache(url, info):
+  """Record the ssh_info answer for url in the on-disk cache.
+
+  The file is rewritten through a temporary file and a rename, so
+  concurrent repo processes never read a partially written cache, and
+  threads of one process take turns, so they don't drop each other's
+  answers.
+  """
+  _review_disk_lock.acquire()
+  try:
+    cache = _ReadReviewCache()
+    cache[url] = (time.time(), info)
+    tmp = '%s.%d' % (REVIEW_DISK_CACHE, os.getpid())
+    try:
+      fd = open(tmp, 'wb')
+      try:
+        pickle.dump(cache, fd, pickle.HIGHEST_PROTOCOL)
+      finally:
+        fd.close()
+      os.rename(tmp, REVIEW_DISK_CACHE)
+    except (IOError, OSError, pickle.PickleError):
+      if os.path.exists(tmp):
+        os.remove(tmp)
+  finally:
+    _review_disk_lock.release()
+
+def _CachedReviewSshInfo(url):
+  """Return (True, info) for a fresh on-disk entry, else (False, None)."""
+  entry = _ReadReviewCache().get(url)
+  try:
+    when, info = entry
+    if info is None:
+      ttl = REVIEW_CACHE_NEGATIVE_TTL
+    else:
+      ttl = REVIEW_CACHE_TTL
+    if not 0 <= time.time() - when < ttl:
+      return False, None
+  except (TypeError, ValueError):
+    # no entry, or not one _SaveReviewCache wrote
+    return False, None
+  return True, info
+
+def _FetchReviewSshInfo(url, review):
+  """Ask the review server at url for its ssh host and port.
+
+  Returns the "host port" string, or None if the server does not offer
+  ssh.  Only definite answers are written to the on-disk cache.
+  """
+  try:
+    info_url = url + 'ssh_info'
+    info = _urllib_request.urlopen(info_url).read()
+  except _urllib_error.HTTPError as e:
+    raise UploadError('%s: %s' % (review, str(e)))
+  except _urllib_error.URLError as e:
+    raise UploadError('%s: %s' % (review, str(e)))
+  except _http_client.HTTPException as e:
+    raise UploadError('%s: %s' % (review, e.__class__.__name__))
+
+  if not isinstance(info, str):
+    info = info.decode('utf-8')
+  if '<' in info:
+    # If `info` contains '<', we assume the server gave us some sort
+    # of HTML response back, like maybe a login page.  That may change
+    # once we are logged in, so don't remember it.
+    return None
+  if info == 'NOT_AVAILABLE':
+    info = None
+  _SaveReviewCache(url, info)
+  return info
+
+def _ReviewSshInfo(url, review):
+  """Return the ssh_info answer for the review server at url.
+
+  Concurrent lookups of the same server share one request, and answers
+  are reused from the on-disk cache while they are fresh.
+  """
+  _review_lock.acquire()
+  try:
+    pending = _review_pending.get(url)
+    owner = pending is None
+    if owner:
+      pending = _Pending()
+      _review_pending[url] = pending
+  finally:
+    _review_lock.release()
+
+  if not owner:
+    return pending.Wait()
+
+  try:
+    found, info = _CachedReviewSshInfo(url)
+    if not found:
+      info = _FetchReviewSshInfo(url, review)
+  except Exception as e:
+    # Let a later lookup try again rather than repeating this failure.
+    _review_lock.acquire()
+    try:
+      del _review_pending[url]
+    finally:
+      _review_lock.release()
+    pending.Finish(error=e)
+    raise
+  pending.Finish(info)
+  return info
+
 class Remote(object):
   """Configuration options related to a remote.
   """
@@ -596,25 +910,13 @@ class Remote(object):
         self._review_url = u  # Assume it's right
         REVIEW_CACHE[u] = self._review_url
       else:
-        try:
-          info_url = u + 'ssh_info'
-          info = urllib.request.urlopen(info_url).read()
-          if info == 'NOT_AVAILABLE' or '<' in info:
-            # If `info` contains '<', we assume the server gave us some sort
-            # of HTML response back, like maybe a login page.
-            #
-            # Assume HTTP if SSH is not enabled or ssh_info doesn't look right.
-            self._review_url = http_url + 'p/'
-          else:
-            host, port = info.split()
-            self._review_url = self._SshReviewUrl(userEmail, host, port)
-        except urllib.error.HTTPError as e:
-          raise UploadError('%s: %s' % (self.review, str(e)))
-        except urllib.error.URLError as e:
-          raise UploadError('%s: %s' % (self.review, str(e)))
-        except HTTPException as e:
-          raise UploadError('%s: %s' % (self.review, e.__class__.__name__))
-
+        info = _ReviewSshInfo(u, self.review)
+        if info is None:
+          # Assume HTTP if SSH is not enabled or ssh_info doesn't look right.
+          self._review_url = http_url + 'p/'
+        else:
+          host, port = info.split()
+          self._review_url = self._SshReviewUrl(userEmail, host, port)
         REVIEW_CACHE[u] = self._review_url
     return self._review_url + self.projectname
 